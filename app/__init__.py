@@ -5,7 +5,7 @@ App 모듈 초기화
 from .doc_summary import doc_summary
 from .doc_indexing import doc_indexing  
 from .expand_collection_query import expand_collection_query
-from .search_docs import search_docs
+from .search_docs import search_docs, search_collections
 from . import scheduler
 
 __all__ = [
@@ -13,5 +13,6 @@ __all__ = [
     'doc_indexing', 
     'expand_collection_query',
     'search_docs',
+    'search_collections',
     'scheduler'
 ]
\ No newline at end of file
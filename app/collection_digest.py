@@ -0,0 +1,208 @@
+"""
+컬렉션 요약 digest 모듈
+expand_collection_query 프롬프트가 컬렉션 크기에 비례해 커지지 않도록
+컬렉션 별로 계층형 rolling 요약을 유지한다.
+
+- recent: 아직 접히지 않은 최신 요약들 (원문 그대로 프롬프트에 들어감)
+- levels[0]: recent에서 밀려난 요약 DIGEST_FOLD_SIZE개를 한 번 요약한 것들
+- levels[i]: levels[i-1]이 DIGEST_FANOUT개를 넘으면 합쳐 한 단계 위로 올림
+- 최상위 level이 가득 차면 그 level 전체를 하나로 다시 요약 (rolling)
+=> 컬렉션이 아무리 커져도 프롬프트 토큰은 대략
+   DIGEST_RECENT_TOKENS + DIGEST_MAX_LEVELS * DIGEST_FANOUT * (요약 1개 길이) 이하
+
+새 요약이 들어올 때마다 처음 보는 summary_id만 반영하므로 증분 갱신된다.
+요청 목록에 없는 요약은 아직 이 요청에 안 보인 것으로 보고 digest에 그대로 둔다.
+(동시에 들어온 요청들이 서로 다른 목록을 가져와도 digest를 다시 만들지 않음)
+
+접기(LLM 호출)는 요청 경로가 아니라 컬렉션 별 백그라운드 작업에서 수행하고,
+동시에 도는 접기 호출 수는 DIGEST_FOLD_CONCURRENCY로 제한한다.
+접기가 끝나기 전의 요청은 이미 만든 level + 예산 안의 최신 요약만 받는다.
+"""
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.llm.chunking import count_tokens
+from app.llm.inference import inference
+from app.llm.prompt_registry import prompt_registry
+
+
+DIGEST_RECENT_TOKENS = int(os.getenv("DIGEST_RECENT_TOKENS", "3000"))
+DIGEST_KEEP_RECENT = int(os.getenv("DIGEST_KEEP_RECENT", "3"))  # 최신 요약은 항상 원문 유지
+DIGEST_FOLD_SIZE = int(os.getenv("DIGEST_FOLD_SIZE", "8"))
+DIGEST_FANOUT = int(os.getenv("DIGEST_FANOUT", "4"))
+DIGEST_MAX_LEVELS = int(os.getenv("DIGEST_MAX_LEVELS", "3"))
+DIGEST_MAX_COLLECTIONS = int(os.getenv("DIGEST_MAX_COLLECTIONS", "1024"))
+DIGEST_FOLD_CONCURRENCY = int(os.getenv("DIGEST_FOLD_CONCURRENCY", "2"))  # 프로세스 전체 동시 접기 호출 수
+
+# 템플릿은 서버 시작 시 prompt_registry에서 한 번 컴파일됨
+COLLECTION_DIGEST_PROMPT = prompt_registry.register('prompts/collection_digest_261017.jinja')
+DIGEST_MODEL_NAME = os.getenv("DIGEST_MODEL_NAME", "google/gemma-3-27b-it")
+DIGEST_MODEL_SETTINGS = {
+    "temperature": 0.3,
+    "max_tokens": 1000,
+}
+
+SUMMARY_SEPARATOR = "\n------\n"
+
+
+def summary_key(entry: Dict[str, Any]) -> str:
+    """요약 항목의 식별자 (summary_id + 본문 해시 - 같은 id로 내용이 바뀌어도 구분)"""
+    content = hashlib.sha1((entry.get("summary") or "").encode("utf-8")).hexdigest()[:16]
+    return f"{entry.get('summary_id') or ''}:{content}"
+
+
+_fold_semaphore: Optional[asyncio.Semaphore] = None
+
+
+async def _fold(texts: List[str]) -> str:
+    """여러 요약을 하나로 요약 (digest 전용 프롬프트, stage 이름 collection_digest)"""
+    global _fold_semaphore
+    if _fold_semaphore is None:
+        _fold_semaphore = asyncio.Semaphore(DIGEST_FOLD_CONCURRENCY)
+    joined = SUMMARY_SEPARATOR.join(texts)
+    async with _fold_semaphore:
+        result = await inference(
+            prompt=joined,
+            model_name=DIGEST_MODEL_NAME,
+            model_settings=DIGEST_MODEL_SETTINGS,
+            system_prompt=COLLECTION_DIGEST_PROMPT.render(summary_count=len(texts), max_sentences=8),
+            prompt_template=COLLECTION_DIGEST_PROMPT.name,
+            stage="collection_digest",
+            cache=True,  # 같은 요약 묶음을 다시 접을 때 재사용
+        )
+    return result.output
+
+
+class CollectionDigest:
+    """컬렉션 하나의 계층형 rolling 요약"""
+
+    def __init__(self, collection_id: str):
+        self.collection_id = collection_id
+        self.levels: List[List[str]] = []
+        self.recent: List[Tuple[str, str]] = []  # (summary_key, summary)
+        self.seen: Set[str] = set()
+        self._fold_task: Optional[asyncio.Task] = None
+        self.fold_failures = 0
+
+    def _recent_tokens(self) -> int:
+        return sum(count_tokens(summary) for _, summary in self.recent)
+
+    def _needs_fold(self) -> bool:
+        return len(self.recent) > DIGEST_KEEP_RECENT and self._recent_tokens() > DIGEST_RECENT_TOKENS
+
+    def update(self, entries: List[Dict[str, Any]]) -> None:
+        """처음 보는 요약을 recent에 붙이고, 예산을 넘으면 백그라운드 접기를 시작한다"""
+        for entry in entries:
+            key = summary_key(entry)
+            if key in self.seen or not entry.get("summary"):
+                continue
+            self.seen.add(key)
+            self.recent.append((key, entry["summary"]))
+
+        if self._needs_fold() and (self._fold_task is None or self._fold_task.done()):
+            self._fold_task = asyncio.create_task(self._fold_recent())
+
+    async def _fold_recent(self) -> None:
+        """recent가 예산 안에 들 때까지 오래된 것부터 접는다 (컬렉션 당 하나만 실행)"""
+        while self._needs_fold():
+            # 오래된 것부터 DIGEST_FOLD_SIZE개씩 묶음 (접는 동안 recent 뒤에 새 요약이 붙어도 앞부분은 그대로)
+            batches: List[List[str]] = []
+            taken = 0
+            tokens = self._recent_tokens()
+            while len(self.recent) - taken > DIGEST_KEEP_RECENT and tokens > DIGEST_RECENT_TOKENS:
+                n = min(DIGEST_FOLD_SIZE, len(self.recent) - taken - DIGEST_KEEP_RECENT)
+                batch = self.recent[taken:taken + n]
+                taken += n
+                tokens -= sum(count_tokens(summary) for _, summary in batch)
+                batches.append([summary for _, summary in batch])
+
+            # 모든 LLM 호출이 성공한 뒤에 상태를 바꾼다 (실패 시 digest는 그대로, 다음 update에서 재시도)
+            try:
+                folded = await asyncio.gather(*(_fold(batch) for batch in batches))
+                levels = [list(level) for level in self.levels]
+                if not levels:
+                    levels.append([])
+                levels[0].extend(folded)
+                levels = await self._compact(levels)
+            except Exception as e:
+                self.fold_failures += 1
+                print(f"⚠️ [digest] {self.collection_id}: 요약 접기 실패 - {e}")
+                return
+
+            self.levels = levels
+            self.recent = self.recent[taken:]
+
+    @staticmethod
+    async def _compact(levels: List[List[str]]) -> List[List[str]]:
+        """DIGEST_FANOUT을 넘는 level을 한 단계 위로 접음"""
+        i = 0
+        while i < len(levels):
+            while len(levels[i]) > DIGEST_FANOUT:
+                if i + 1 < DIGEST_MAX_LEVELS:
+                    group, levels[i] = levels[i][:DIGEST_FANOUT], levels[i][DIGEST_FANOUT:]
+                    if i + 1 == len(levels):
+                        levels.append([])
+                    levels[i + 1].append(await _fold(group))
+                else:
+                    # 최상위 level은 전체를 하나로 다시 요약
+                    levels[i] = [await _fold(levels[i])]
+            i += 1
+        return levels
+
+    def render(self) -> str:
+        """
+        오래된(상위 level) 요약 -> 최신 요약 순으로 이어 붙인 텍스트
+        아직 접히지 않아 예산을 넘는 recent는 최신 DIGEST_KEEP_RECENT개 + 예산 안의 것만 넣는다.
+        """
+        window: List[str] = []
+        tokens = 0
+        for i, (_, summary) in enumerate(reversed(self.recent)):
+            tokens += count_tokens(summary)
+            if i >= DIGEST_KEEP_RECENT and tokens > DIGEST_RECENT_TOKENS:
+                break
+            window.append(summary)
+        parts = [text for level in reversed(self.levels) for text in level]
+        parts.extend(reversed(window))
+        return SUMMARY_SEPARATOR.join(parts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "summaries": len(self.seen),
+            "levels": [len(level) for level in self.levels],
+            "recent": len(self.recent),
+            "recent_tokens": self._recent_tokens(),
+            "folding": self._fold_task is not None and not self._fold_task.done(),
+            "fold_failures": self.fold_failures,
+        }
+
+
+class DigestStore:
+    """collection_id -> CollectionDigest (LRU 상한)"""
+
+    def __init__(self, max_collections: int = DIGEST_MAX_COLLECTIONS):
+        self.max_collections = max_collections
+        self._digests: "OrderedDict[str, CollectionDigest]" = OrderedDict()
+
+    def get(self, collection_id: str) -> CollectionDigest:
+        digest = self._digests.get(collection_id)
+        if digest is None:
+            digest = self._digests[collection_id] = CollectionDigest(collection_id)
+        self._digests.move_to_end(collection_id)
+        while len(self._digests) > self.max_collections:
+            self._digests.popitem(last=False)
+        return digest
+
+    async def build_context(self, collection_id: Optional[str], entries: List[Dict[str, Any]]) -> str:
+        """요약 목록을 반영한 뒤 프롬프트에 넣을 텍스트 반환"""
+        if not collection_id:
+            return SUMMARY_SEPARATOR.join(entry["summary"] for entry in entries if entry.get("summary"))
+        digest = self.get(collection_id)
+        digest.update(entries)
+        return digest.render()
+
+
+# 프로세스 전역 digest 저장소
+digest_store = DigestStore()
@@ -30,6 +30,8 @@ class DataInfo(BaseModel):
         object.__setattr__(self, '_field_locks', defaultdict(asyncio.Lock))
         # 전역 락 (필요시에만 사용)
         object.__setattr__(self, '_global_lock', asyncio.Lock())
+        # 필드 갱신 이벤트 구독자 (스트리밍 응답 등)
+        object.__setattr__(self, '_field_listeners', [])
 
     async def update(self, process_tasks: List[Callable]):
         """비동기적으로 처리 작업들을 스케쥴링 (최적화된 동시성)"""
@@ -70,7 +72,8 @@ class DataInfo(BaseModel):
         # 해당 필드만 락킹하여 다른 필드와 동시 수정 가능
         async with self._field_locks[field_name]:
             setattr(self, field_name, value)
-            return True
+        self.notify_field_updated(field_name, value)
+        return True
     
     async def parallel_update_fields(self, field_updates: Dict[str, Any]) -> Dict[str, bool]:
         """여러 필드를 병렬로 안전하게 업데이트"""
@@ -87,6 +90,22 @@ class DataInfo(BaseModel):
         results = await asyncio.gather(*tasks)
         return dict(results)
     
+    def add_field_listener(self, listener: Callable[[str, Any], None]) -> None:
+        """필드가 갱신될 때마다 listener(field_name, value) 호출"""
+        self._field_listeners.append(listener)
+
+    def remove_field_listener(self, listener: Callable[[str, Any], None]) -> None:
+        if listener in self._field_listeners:
+            self._field_listeners.remove(listener)
+
+    def notify_field_updated(self, field_name: str, value: Any) -> None:
+        """구독자들에게 필드 갱신 알림 (scheduler가 결과를 반영한 직후 호출)"""
+        for listener in list(self._field_listeners):
+            try:
+                listener(field_name, value)
+            except Exception as e:
+                print(f"⚠️ [DataInfo] listener 오류 ({field_name}): {e}")
+
     def get_field_lock(self, field_name: str) -> asyncio.Lock:
         """특정 필드의 락을 반환 (외부 모듈에서 사용)"""
         return self._field_locks[field_name]
@@ -99,8 +118,10 @@ class ProcessRequest(BaseModel):
     collection_name: str
     collection_memo: str
     user_id: str
-    # 타입을 Dict 구조로 수정
+    # 생략하면 서버가 저장소에서 컬렉션의 기존 요약을 불러옴 (구버전 클라이언트 호환용)
     doc_summarized: Optional[List[Dict[str, str]]] = None
 
 
-
+class BatchProcessRequest(BaseModel):
+    """여러 문서 일괄 처리 요청 - 같은 컬렉션의 문서들은 컬렉션 단위 작업을 공유"""
+    documents: List[ProcessRequest] = Field(min_length=1, max_length=100)
@@ -1,21 +1,67 @@
 """
-데이터베이스 모듈 - 더미 구현
+데이터베이스 모듈
+user_info / index_page 저장소와 write-behind 버퍼 (app/db/repository.py)
+컬렉션 기존 요약 read-through 캐시 (app/db/summary_cache.py)
 """
-import asyncio
+from app.db.repository import (
+    close_db,
+    index_page_repo,
+    init_db,
+    user_info_repo,
+    write_buffer,
+)
+from app.db.summary_cache import summary_cache
+
+
+# DataInfo 필드 -> 테이블 컬럼 (이름이 다른 것만)
+_COLUMN_ALIASES = {
+    "index_page": {"doc_summarized_new": "summary"},
+}
 
 
 async def send_to_db(data_instance, db_config):
     """
-    데이터베이스에 저장하는 더미 함수
+    DataInfo의 필드들을 db_config(테이블 -> 필드 목록)에 따라 저장
+    실제 기록은 write-behind 버퍼가 주기적으로 일괄 upsert 한다.
+    버퍼가 DB_BACKPRESSURE_TIMEOUT 동안 가득 차 있으면 WriteBufferFull
     """
     print(f"💾 [DB] 저장 시작 - User: {data_instance.user_id}")
-    
-    # 짧은 딜레이 시뮬레이션
-    await asyncio.sleep(0.5)
-    
-    # 저장할 데이터 정보 출력
+    # 버퍼가 가득 찼으면(DB 장애 등) flush로 자리가 날 때까지 대기
+    await write_buffer.wait_for_capacity()
+
     for db_name, fields in db_config.items():
+        aliases = _COLUMN_ALIASES.get(db_name, {})
+        values = {aliases.get(f, f): getattr(data_instance, f) for f in fields}
+        if db_name == "user_info":
+            user_info_repo.upsert({
+                "user_id": data_instance.user_id,
+                "collection_id": data_instance.collection_id,
+                "collection_name": data_instance.collection_name,
+                "collection_memo": data_instance.collection_memo,
+                **values,
+            })
+        elif db_name == "index_page":
+            index_page_repo.upsert({
+                "summary_id": data_instance.doc_summarized_new_id,
+                "user_id": data_instance.user_id,
+                "collection_id": data_instance.collection_id,
+                **values,
+            })
+            # 컬렉션 요약 목록이 바뀌었으므로 캐시 무효화
+            summary_cache.invalidate(data_instance.collection_id)
+        else:
+            raise ValueError(f"알 수 없는 저장소: {db_name}")
         print(f"   📁 {db_name}: {fields}")
-    
-    print(f"✅ [DB] 저장 완료 - User: {data_instance.user_id}")
-    return True
\ No newline at end of file
+
+    print(f"✅ [DB] 저장 완료(버퍼) - User: {data_instance.user_id}")
+    return True
+
+
+async def get_user_info(data_instance):
+    """
+    컬렉션의 기존 요약(doc_summarized)을 저장소에서 불러와 채움
+    요청에 doc_summarized가 들어온 경우(구버전 클라이언트)는 그대로 사용
+    """
+    if data_instance.doc_summarized is None:
+        data_instance.doc_summarized = await summary_cache.get(data_instance.collection_id)
+    return data_instance
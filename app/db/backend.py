@@ -0,0 +1,156 @@
+"""
+저장소 backend
+같은 인터페이스(upsert_many / fetch)를 가진 두 가지 구현
+
+- SQLAlchemyBackend: async engine + 공유 커넥션 풀
+  (운영: postgresql+asyncpg://..., 로컬: sqlite+aiosqlite:///...)
+- MemoryBackend: 프로세스 메모리 dict (테스트 / DB 없이 실행할 때)
+
+테이블
+- user_info:  (user_id, collection_id) 기준 upsert
+- index_page: summary_id 기준 upsert, collection_id로 조회
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# 테이블 별 upsert 키
+TABLE_KEYS: Dict[str, Tuple[str, ...]] = {
+    "user_info": ("user_id", "collection_id"),
+    "index_page": ("summary_id",),
+}
+
+
+def row_key(table: str, row: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(row[k] for k in TABLE_KEYS[table])
+
+
+class MemoryBackend:
+    """dict 기반 backend - SQL backend와 같은 upsert 의미(키가 같으면 주어진 컬럼만 갱신)"""
+
+    def __init__(self):
+        self._tables: Dict[str, Dict[Tuple[Any, ...], Dict[str, Any]]] = {name: {} for name in TABLE_KEYS}
+
+    async def init(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+    async def upsert_many(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        store = self._tables[table]
+        now = time.time()
+        for row in rows:
+            key = row_key(table, row)
+            store.setdefault(key, {}).update(row, updated_at=now)
+
+    async def fetch(self, table: str, **filters: Any) -> List[Dict[str, Any]]:
+        return [
+            dict(row) for row in self._tables[table].values()
+            if all(row.get(k) == v for k, v in filters.items())
+        ]
+
+
+class SQLAlchemyBackend:
+    """SQLAlchemy async engine backend (postgresql / sqlite 방언의 ON CONFLICT upsert 사용)"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = None
+        self.tables: Dict[str, Any] = {}
+
+    async def init(self) -> None:
+        # sqlalchemy는 SQL backend를 쓸 때만 필요
+        from sqlalchemy import JSON, Column, Float, Index, MetaData, String, Table, Text
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        metadata = MetaData()
+        self.tables = {
+            "user_info": Table(
+                "user_info", metadata,
+                Column("user_id", String(128), primary_key=True),
+                Column("collection_id", String(128), primary_key=True),
+                Column("collection_name", Text),
+                Column("collection_memo", Text),
+                Column("collection_question", JSON),
+                Column("doc_retrieved", JSON),
+                Column("collection_retrieved", JSON),
+                Column("updated_at", Float),
+            ),
+            "index_page": Table(
+                "index_page", metadata,
+                Column("summary_id", String(160), primary_key=True),
+                Column("user_id", String(128)),
+                Column("collection_id", String(128)),
+                Column("summary", Text),
+                Column("doc_input_question", JSON),
+                Column("updated_at", Float),
+                Index("ix_index_page_collection_id", "collection_id"),
+            ),
+        }
+
+        engine_kwargs: Dict[str, Any] = {"pool_pre_ping": True}
+        if not self.url.startswith("sqlite"):
+            engine_kwargs.update(
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+            )
+        self.engine = create_async_engine(self.url, **engine_kwargs)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    async def close(self) -> None:
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    def _insert(self, table):
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise NotImplementedError(f"upsert를 지원하지 않는 DB: {self.engine.dialect.name}")
+        return insert(table)
+
+    async def upsert_many(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        sa_table = self.tables[table]
+        now = time.time()
+        # 같은 컬럼 구성끼리 묶어 executemany (컬럼이 다르면 갱신 대상도 다름)
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append({**row, "updated_at": now})
+        async with self.engine.begin() as conn:
+            for columns, group in groups.items():
+                stmt = self._insert(sa_table)
+                update_columns = {
+                    c: stmt.excluded[c] for c in (*columns, "updated_at") if c not in TABLE_KEYS[table]
+                }
+                stmt = stmt.on_conflict_do_update(index_elements=list(TABLE_KEYS[table]), set_=update_columns)
+                await conn.execute(stmt, group)
+
+    async def fetch(self, table: str, **filters: Any) -> List[Dict[str, Any]]:
+        from sqlalchemy import select
+
+        sa_table = self.tables[table]
+        stmt = select(sa_table)
+        for column, value in filters.items():
+            stmt = stmt.where(sa_table.c[column] == value)
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return [dict(row) for row in result.mappings()]
+
+
+def create_backend(url: Optional[str]):
+    """DATABASE_URL로 backend 선택 (없거나 memory://면 메모리 backend)"""
+    if not url or url.startswith("memory://"):
+        return MemoryBackend()
+    return SQLAlchemyBackend(url)
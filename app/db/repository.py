@@ -0,0 +1,276 @@
+"""
+user_info / index_page 저장소
+요청마다 생기는 작은 쓰기를 write-behind 버퍼에 모았다가 주기적으로 일괄 upsert 한다.
+
+- 같은 키에 대한 쓰기는 버퍼 안에서 합쳐짐 (나중 값 우선)
+- DB_FLUSH_INTERVAL 초마다, 또는 버퍼가 DB_FLUSH_MAX_ROWS를 넘으면 즉시 flush
+- flush 실패 시 행을 버퍼로 되돌려 다음 주기에 재시도
+  (행마다 DB_FLUSH_MAX_ATTEMPTS번까지, 마지막 시도는 한 행씩 기록하고 그래도 실패하면 dead-letter 로그로 버림)
+- 대기 행이 DB_MAX_PENDING_ROWS 이상이면 send_to_db가 flush로 자리가 날 때까지 대기 (backpressure)
+- 조회는 DB 결과 위에 아직 커밋되지 않은 버퍼 내용(대기 + 기록 중)을 덮어 반환 (자기 쓰기 읽기 보장)
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db.backend import TABLE_KEYS, MemoryBackend, create_backend, row_key
+
+
+DATABASE_URL = os.getenv("DATABASE_URL")  # 예: postgresql+asyncpg://user:pw@host/db, sqlite+aiosqlite:///.cache/pagelink.sqlite3
+DB_FLUSH_INTERVAL = float(os.getenv("DB_FLUSH_INTERVAL", "1.0"))
+DB_FLUSH_MAX_ROWS = int(os.getenv("DB_FLUSH_MAX_ROWS", "500"))
+DB_FLUSH_MAX_ATTEMPTS = int(os.getenv("DB_FLUSH_MAX_ATTEMPTS", "5"))
+DB_MAX_PENDING_ROWS = int(os.getenv("DB_MAX_PENDING_ROWS", "10000"))
+DB_BACKPRESSURE_TIMEOUT = float(os.getenv("DB_BACKPRESSURE_TIMEOUT", "30"))
+
+
+class WriteBufferFull(RuntimeError):
+    """DB_BACKPRESSURE_TIMEOUT 동안 버퍼에 자리가 나지 않음 (DB 장애 등)"""
+
+
+class WriteBehindBuffer:
+    """테이블 별 대기 중인 upsert 행"""
+
+    def __init__(
+        self,
+        backend,
+        flush_interval: float = DB_FLUSH_INTERVAL,
+        max_rows: int = DB_FLUSH_MAX_ROWS,
+        max_attempts: int = DB_FLUSH_MAX_ATTEMPTS,
+        max_pending: int = DB_MAX_PENDING_ROWS,
+    ):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self._pending: Dict[str, "OrderedDict[tuple, Dict[str, Any]]"] = {
+            table: OrderedDict() for table in TABLE_KEYS
+        }
+        # flush 중인 행 - 커밋이 끝날 때까지 조회에 계속 보이도록 유지
+        self._inflight: Dict[str, "OrderedDict[tuple, Dict[str, Any]]"] = {}
+        # (table, key) -> 실패한 flush 횟수
+        self._attempts: Dict[Tuple[str, tuple], int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._space = asyncio.Condition()  # flush 후 자리가 났음을 대기 중인 쓰기에 알림
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.dead_letters = 0
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._pending.values())
+
+    def add(self, table: str, row: Dict[str, Any]) -> None:
+        pending = self._pending[table]
+        key = row_key(table, row)
+        if key in pending:
+            pending[key].update(row)
+        else:
+            pending[key] = dict(row)
+        if len(self) >= self.max_rows and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_for_capacity(self, timeout: float = DB_BACKPRESSURE_TIMEOUT) -> None:
+        """대기 행이 max_pending 미만이 될 때까지 대기 (timeout 초과 시 WriteBufferFull)"""
+        if len(self) < self.max_pending:
+            return
+        if self._wakeup is not None:
+            self._wakeup.set()
+        try:
+            async with self._space:
+                await asyncio.wait_for(self._space.wait_for(lambda: len(self) < self.max_pending), timeout)
+        except asyncio.TimeoutError:
+            raise WriteBufferFull(f"DB 쓰기 버퍼 가득 참 ({len(self)}행, {timeout}s 대기)") from None
+
+    def pending_rows(self, table: str, **filters: Any) -> List[Dict[str, Any]]:
+        """아직 DB에 커밋되지 않은 행 (기록 중인 행 위에 대기 중인 새 쓰기를 덮음)"""
+        merged: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        for rows in (self._inflight.get(table, {}), self._pending[table]):
+            for key, row in rows.items():
+                if all(row.get(k) == v for k, v in filters.items()):
+                    merged[key] = {**merged.get(key, {}), **row}
+        return list(merged.values())
+
+    def has_inflight(self, table: str, **filters: Any) -> bool:
+        """조건에 맞는 행이 지금 flush 중인지"""
+        return any(
+            all(row.get(k) == v for k, v in filters.items())
+            for row in self._inflight.get(table, {}).values()
+        )
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            self._inflight, self._pending = self._pending, {table: OrderedDict() for table in TABLE_KEYS}
+            try:
+                for table, rows in list(self._inflight.items()):
+                    if not rows:
+                        continue
+                    failed = await self._upsert(table, rows)
+                    # 그 사이 들어온 새 쓰기가 우선하도록 실패한 행 위에 덮어씀
+                    newer = self._pending[table]
+                    for key, row in reversed(failed.items()):
+                        newer[key] = {**row, **newer.get(key, {})}
+                        newer.move_to_end(key, last=False)
+                    # 커밋(또는 재시도 대기열로 복귀)된 뒤에만 기록 중 목록에서 제거
+                    del self._inflight[table]
+            finally:
+                self._inflight = {}
+            self.flushes += 1
+        async with self._space:
+            self._space.notify_all()
+
+    async def _upsert(self, table: str, rows: "OrderedDict[tuple, Dict[str, Any]]") -> "OrderedDict[tuple, Dict[str, Any]]":
+        """행들을 기록하고 다음 주기에 재시도할 행을 반환"""
+        try:
+            await self.backend.upsert_many(table, list(rows.values()))
+        except Exception as e:
+            print(f"⚠️ [DB] {table} {len(rows)}건 flush 실패, 다음 주기에 재시도: {e}")
+        else:
+            self.flushed_rows += len(rows)
+            for key in rows:
+                self._attempts.pop((table, key), None)
+            return OrderedDict()
+
+        retry: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        for key, row in rows.items():
+            attempts = self._attempts[(table, key)] = self._attempts.get((table, key), 0) + 1
+            if attempts < self.max_attempts:
+                retry[key] = row
+                continue
+            # 마지막 시도는 한 행씩 - 같은 배치의 다른 행 때문에 버려지지 않도록
+            del self._attempts[(table, key)]
+            try:
+                await self.backend.upsert_many(table, [row])
+                self.flushed_rows += 1
+            except Exception as e:
+                self._dead_letter(table, row, e)
+        return retry
+
+    def _dead_letter(self, table: str, row: Dict[str, Any], error: Exception) -> None:
+        self.dead_letters += 1
+        print(
+            f"🚨 [DB] {table} 행 {self.max_attempts}회 기록 실패, 버림 - {error}\n"
+            f"   dead-letter: {json.dumps(row, ensure_ascii=False, default=str)}"
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if len(self):
+                await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="db-write-behind")
+
+    async def stop(self) -> None:
+        """주기 flush 중단 후 남은 행을 모두 기록"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self),
+            "inflight": sum(len(rows) for rows in self._inflight.values()),
+            "flushed_rows": self.flushed_rows,
+            "flushes": self.flushes,
+            "dead_letters": self.dead_letters,
+        }
+
+
+def _overlay(table: str, stored: List[Dict[str, Any]], pending: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """DB 행 위에 버퍼의 행을 키 기준으로 덮어씀"""
+    merged = {row_key(table, row): row for row in stored}
+    for row in pending:
+        key = row_key(table, row)
+        merged[key] = {**merged.get(key, {}), **row}
+    return list(merged.values())
+
+
+class UserInfoRepository:
+    """컬렉션 단위 결과 (user_id, collection_id 기준)"""
+    table = "user_info"
+
+    def __init__(self, backend, buffer: WriteBehindBuffer):
+        self.backend = backend
+        self.buffer = buffer
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        self.buffer.add(self.table, row)
+
+    async def get(self, user_id: str, collection_id: str) -> Optional[Dict[str, Any]]:
+        filters = {"user_id": user_id, "collection_id": collection_id}
+        # 버퍼를 먼저 읽어야 DB 조회 중에 커밋된 행도 놓치지 않음
+        pending = self.buffer.pending_rows(self.table, **filters)
+        rows = _overlay(self.table, await self.backend.fetch(self.table, **filters), pending)
+        return rows[0] if rows else None
+
+
+class IndexPageRepository:
+    """문서(페이지) 단위 결과 (summary_id 기준)"""
+    table = "index_page"
+
+    def __init__(self, backend, buffer: WriteBehindBuffer):
+        self.backend = backend
+        self.buffer = buffer
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        self.buffer.add(self.table, row)
+
+    @staticmethod
+    def new_summary_id(collection_id: str) -> str:
+        """
+        새 요약 id - {collection_id}_{생성 시각(ns, hex 16자리)}{난수 8자리}
+        동시 요청이나 삭제된 행과 겹치지 않고, 문자열 순서가 생성 순서를 따른다.
+        """
+        return f"{collection_id}_{time.time_ns():016x}{uuid.uuid4().hex[:8]}"
+
+    async def list_by_collection(self, collection_id: str) -> List[Dict[str, Any]]:
+        """컬렉션의 요약들 (summary_id 순 = 추가된 순)"""
+        # 버퍼를 먼저 읽어야 DB 조회 중에 커밋된 행도 놓치지 않음
+        pending = self.buffer.pending_rows(self.table, collection_id=collection_id)
+        rows = _overlay(
+            self.table,
+            await self.backend.fetch(self.table, collection_id=collection_id),
+            pending,
+        )
+        return sorted(rows, key=lambda row: row["summary_id"])
+
+
+# 프로세스 전역 저장소
+backend = create_backend(DATABASE_URL)
+write_buffer = WriteBehindBuffer(backend)
+user_info_repo = UserInfoRepository(backend, write_buffer)
+index_page_repo = IndexPageRepository(backend, write_buffer)
+
+
+async def init_db() -> None:
+    """FastAPI startup 시 호출 - 테이블 준비 및 write-behind 시작"""
+    await backend.init()
+    write_buffer.start()
+    if isinstance(backend, MemoryBackend) and not DATABASE_URL:
+        print(
+            "🚨 [DB] DATABASE_URL이 없어 메모리 backend를 사용합니다 - 저장한 데이터는 재시작하면 사라집니다.\n"
+            "   의도한 것이면 DATABASE_URL=memory:// 로 명시하세요."
+        )
+    print(f"💾 [DB] {type(backend).__name__} 준비 완료")
+
+
+async def close_db() -> None:
+    """FastAPI shutdown 시 호출 - 남은 쓰기 flush 후 커넥션 풀 정리"""
+    await write_buffer.stop()
+    await backend.close()
@@ -0,0 +1,89 @@
+"""
+컬렉션 요약 read-through 캐시
+서비스 서버가 요청마다 doc_summarized 전체를 보내지 않도록 서버가 직접
+index_page 저장소에서 컬렉션의 기존 요약을 읽어 온다.
+
+- collection_id 기준 LRU (USER_INFO_CACHE_MAX_COLLECTIONS개 초과 시 오래된 것부터 제거)
+- 같은 컬렉션의 동시 miss는 DB 조회 1번으로 합침 (single-flight)
+- 우리 파이프라인이 새 요약을 쓰면 해당 컬렉션 항목을 무효화
+- 조회 결과는 다음 경우 반환만 하고 캐시에 넣지 않음
+  - 조회를 시작한 뒤 무효화가 들어온 경우 (조회 시작 전에 세대를 기록해 비교)
+  - 그 컬렉션의 행이 아직 write-behind flush 중인 경우
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, List
+
+from app.db.repository import index_page_repo
+from app.singleflight import SingleFlight
+
+
+USER_INFO_CACHE_MAX_COLLECTIONS = int(os.getenv("USER_INFO_CACHE_MAX_COLLECTIONS", "1024"))
+
+
+class SummaryCache:
+    """collection_id -> 기존 요약 목록 [{"summary", "summary_id"}]"""
+    def __init__(self, max_collections: int = USER_INFO_CACHE_MAX_COLLECTIONS):
+        self.max_collections = max_collections
+        self._items: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+        # 조회 중인 컬렉션 -> 무효화 세대 (조회 시작 시 0, 조회 도중 무효화될 때마다 증가)
+        self._loading: Dict[str, int] = {}
+        self.singleflight = SingleFlight("summary_cache")
+        self.hits = 0
+        self.misses = 0
+        self.skipped_stores = 0
+
+    async def get(self, collection_id: str) -> List[Dict[str, str]]:
+        """컬렉션의 기존 요약 목록 (호출자가 수정해도 되는 복사본)"""
+        summaries = self._items.get(collection_id)
+        if summaries is not None:
+            self._items.move_to_end(collection_id)
+            self.hits += 1
+            return [dict(s) for s in summaries]
+
+        self.misses += 1
+
+        async def load() -> List[Dict[str, str]]:
+            # DB 조회 전에 세대를 기록해야 조회 중의 무효화를 알 수 있음
+            self._loading[collection_id] = 0
+            try:
+                rows = await index_page_repo.list_by_collection(collection_id)
+            finally:
+                generation = self._loading.pop(collection_id)
+            loaded = [
+                {"summary": row["summary"], "summary_id": row["summary_id"]}
+                for row in rows
+                if row.get("summary")
+            ]
+            flushing = index_page_repo.buffer.has_inflight(index_page_repo.table, collection_id=collection_id)
+            if generation == 0 and not flushing:
+                self._store(collection_id, loaded)
+            else:
+                self.skipped_stores += 1
+            return loaded
+
+        summaries = await self.singleflight.do(collection_id, load)
+        return [dict(s) for s in summaries]
+
+    def _store(self, collection_id: str, summaries: List[Dict[str, str]]) -> None:
+        self._items[collection_id] = summaries
+        self._items.move_to_end(collection_id)
+        while len(self._items) > self.max_collections:
+            self._items.popitem(last=False)
+
+    def invalidate(self, collection_id: str) -> None:
+        self._items.pop(collection_id, None)
+        if collection_id in self._loading:
+            self._loading[collection_id] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped_stores": self.skipped_stores,
+            "size": len(self._items),
+        }
+
+
+# 프로세스 전역 요약 캐시
+summary_cache = SummaryCache()
@@ -0,0 +1,163 @@
+"""
+근사 중복 문서 탐지 모듈
+트래킹 파라미터, 재게시, 소소한 수정 등으로 거의 같은 문서가 들어오면
+이전에 처리한 doc_summarized_new / doc_input_question을 재사용한다.
+
+- doc_summarized_new는 문서에만 의존하므로 어디서 처리했든 재사용
+- doc_input_question은 collection_memo로 만든 것이라 같은 유저 + 같은 memo(question_context)에서만 재사용
+
+- 문자 n-gram shingle 기반 bottom-k MinHash 지문
+- 지문 해시값 -> 문서 역색인으로 후보를 찾고 Jaccard 유사도 추정
+- 메모리 상한(LRU)을 가진 증분 인덱스
+"""
+import os
+import re
+import copy
+import heapq
+import hashlib
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+NEAR_DUP_MAX_DOCS = int(os.getenv("NEAR_DUP_MAX_DOCS", "10000"))
+NEAR_DUP_SKETCH_SIZE = int(os.getenv("NEAR_DUP_SKETCH_SIZE", "128"))
+NEAR_DUP_SHINGLE_SIZE = 5
+NEAR_DUP_MAX_CONTEXTS = 16  # 문서 하나에 보관하는 question_context 별 질문 수
+
+_URL_PATTERN = re.compile(r"https?://\S+")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    """유니코드 정규화, 소문자화, URL 제거(트래킹 파라미터 무시), 공백 정리"""
+    text = unicodedata.normalize("NFC", text).lower()
+    text = _URL_PATTERN.sub(" ", text)
+    return _SPACE_PATTERN.sub(" ", text).strip()
+
+
+def _hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def fingerprint(text: str, sketch_size: int = NEAR_DUP_SKETCH_SIZE) -> Tuple[int, ...]:
+    """
+    bottom-k MinHash 지문 생성
+    문자 단위 shingle이므로 한국어도 형태소 분석 없이 동작한다.
+    """
+    normalized = _normalize(text)
+    n = NEAR_DUP_SHINGLE_SIZE
+    if len(normalized) <= n:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + n] for i in range(len(normalized) - n + 1)}
+    return tuple(sorted(heapq.nsmallest(sketch_size, {_hash(s) for s in shingles})))
+
+
+def question_context(user_id: Optional[str], collection_memo: Optional[str]) -> str:
+    """doc_input_question을 재사용해도 되는 범위 (유저 + collection_memo)"""
+    return hashlib.sha1(f"{user_id or ''}\0{collection_memo or ''}".encode("utf-8")).hexdigest()
+
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...], sketch_size: int = NEAR_DUP_SKETCH_SIZE) -> float:
+    """두 bottom-k 지문으로 Jaccard 유사도 추정"""
+    if not a or not b:
+        return 0.0
+    union_sketch = heapq.nsmallest(sketch_size, set(a) | set(b))
+    set_a, set_b = set(a), set(b)
+    both = sum(1 for h in union_sketch if h in set_a and h in set_b)
+    return both / len(union_sketch)
+
+
+class NearDuplicateIndex:
+    """처리 완료된 문서의 지문과 결과를 보관하는 증분 인덱스"""
+
+    def __init__(
+        self,
+        threshold: float = NEAR_DUP_THRESHOLD,
+        max_docs: int = NEAR_DUP_MAX_DOCS,
+        sketch_size: int = NEAR_DUP_SKETCH_SIZE,
+    ):
+        self.threshold = threshold
+        self.max_docs = max_docs
+        self.sketch_size = sketch_size
+        # doc_key -> (지문, 재사용할 결과)
+        self._docs: "OrderedDict[str, Tuple[Tuple[int, ...], Dict[str, Any]]]" = OrderedDict()
+        # 지문 해시값 -> doc_key 집합
+        self._postings: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _remove(self, doc_key: str) -> None:
+        sketch, _ = self._docs.pop(doc_key)
+        for h in sketch:
+            bucket = self._postings.get(h)
+            if bucket is not None:
+                bucket.discard(doc_key)
+                if not bucket:
+                    del self._postings[h]
+
+    def lookup(self, doc_input: str, context: str) -> Optional[Dict[str, Any]]:
+        """
+        유사도 임계값 이상인 기존 문서의 결과를 반환 (없으면 None)
+        doc_input_question은 같은 context에서 만든 것이 있을 때만 포함
+        """
+        sketch = fingerprint(doc_input, self.sketch_size)
+        candidates = Counter()
+        for h in sketch:
+            for doc_key in self._postings.get(h, ()):
+                candidates[doc_key] += 1
+
+        # 공유 해시가 많은 후보부터 유사도 추정
+        min_shared = int(self.threshold * len(sketch) * 0.5)
+        for doc_key, shared in candidates.most_common(10):
+            if shared < min_shared:
+                break
+            similarity = estimate_similarity(sketch, self._docs[doc_key][0], self.sketch_size)
+            if similarity >= self.threshold:
+                self._docs.move_to_end(doc_key)
+                self.hits += 1
+                print(f"♻️ [doc_dedup] 근사 중복 문서 발견 - 유사도 {similarity:.2f}")
+                stored = self._docs[doc_key][1]
+                result = {"doc_summarized_new": stored["doc_summarized_new"]}
+                if context in stored["questions"]:
+                    result["doc_input_question"] = copy.deepcopy(stored["questions"][context])
+                return result
+
+        self.misses += 1
+        return None
+
+    def add(self, doc_input: str, doc_summarized_new: str, doc_input_question: Any, context: str) -> str:
+        """
+        처리 완료된 문서를 인덱스에 등록 (상한 초과 시 가장 오래된 문서 제거)
+        같은 문서가 이미 있으면 다른 context에서 만든 질문은 유지하고 이 context의 질문만 갱신
+        """
+        sketch = fingerprint(doc_input, self.sketch_size)
+        doc_key = hashlib.sha1(_normalize(doc_input).encode("utf-8")).hexdigest()
+        questions: Dict[str, Any] = {}
+        if doc_key in self._docs:
+            questions = self._docs[doc_key][1]["questions"]
+            self._remove(doc_key)
+
+        questions.pop(context, None)
+        questions[context] = copy.deepcopy(doc_input_question)
+        while len(questions) > NEAR_DUP_MAX_CONTEXTS:
+            questions.pop(next(iter(questions)))
+        self._docs[doc_key] = (sketch, {
+            "doc_summarized_new": doc_summarized_new,
+            "questions": questions,
+        })
+        for h in sketch:
+            self._postings.setdefault(h, set()).add(doc_key)
+
+        while len(self._docs) > self.max_docs:
+            self._remove(next(iter(self._docs)))
+        return doc_key
+
+
+# 프로세스 전역 인덱스
+near_duplicate_index = NearDuplicateIndex()
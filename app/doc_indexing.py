@@ -5,15 +5,14 @@ import os
 import asyncio
 import random
 from app.llm.inference import structured_inference
-from jinja2 import Environment, FileSystemLoader
+from app.scheduler import stage
+from app.llm.prompt_registry import prompt_registry
 from pydantic import BaseModel, Field
 from typing import List
 
 
-# 현재 파일의 디렉토리를 기준으로 templates 폴더 설정
-current_dir = os.path.dirname(os.path.abspath(__file__))
-template_dir = os.path.join(current_dir, 'llm')
-env = Environment(loader=FileSystemLoader(template_dir))
+# 템플릿은 서버 시작 시 prompt_registry에서 한 번 컴파일됨
+DOC_INDEXING_PROMPT = prompt_registry.register('prompts/doc_indexing_250830.jinja')
 
 # 기존 str_to_json 함수는 parser 모듈로 이동
 # from app.llm.parser import json_parser as str_to_json  # 하위 호환성
@@ -28,6 +27,7 @@ class QuestionsResponse(BaseModel):
     """여러 질문들을 담는 응답 모델"""
     questions: List[Question] = Field(description="생성된 질문들의 리스트", min_items=2, max_items=6)
 
+@stage(reads=["doc_input", "collection_memo"], writes="doc_input_question")
 async def doc_indexing(data_instance):
     """
     문서 인덱싱 함수 - pydantic-ai 구조화된 출력 사용
@@ -35,8 +35,7 @@ async def doc_indexing(data_instance):
     """
     print(f"🔍 [doc_indexing] 시작 - User: {data_instance.user_id}")
     
-    template = env.get_template('prompts/doc_indexing_250830.jinja')
-    system_prompt = template.render(doc_input=data_instance.doc_input, memopad=data_instance.collection_memo)
+    system_prompt = DOC_INDEXING_PROMPT.render(doc_input=data_instance.doc_input, memopad=data_instance.collection_memo)
     
     # 구조화된 출력을 위한 새로운 inference 함수 사용
     result = await structured_inference(
@@ -51,7 +50,10 @@ async def doc_indexing(data_instance):
             "max_tokens": 1000,
         },
         system_prompt=system_prompt,
-        output_type=QuestionsResponse  # 구조화된 출력 타입 지정
+        output_type=QuestionsResponse,  # 구조화된 출력 타입 지정
+        prompt_template=DOC_INDEXING_PROMPT.name,
+        stage="doc_indexing",
+        cache=True,  # 동일 문서 재처리 시 응답 재사용
     )
 
     # result.output이 이미 QuestionsResponse 객체임
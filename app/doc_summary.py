@@ -4,35 +4,84 @@
 import os
 import asyncio
 import random
+from typing import List
 from app.llm.inference import inference
-from jinja2 import Environment, FileSystemLoader
+from app.llm.chunking import chunk_text, count_tokens
+from app.scheduler import stage
+from app.llm.prompt_registry import prompt_registry
 
 
-# 현재 파일의 디렉토리를 기준으로 templates 폴더 설정
-current_dir = os.path.dirname(os.path.abspath(__file__))
-template_dir = os.path.join(current_dir, 'llm')
-env = Environment(loader=FileSystemLoader(template_dir))
+# 템플릿은 서버 시작 시 prompt_registry에서 한 번 컴파일됨
+DOC_SUMMARY_PROMPT = prompt_registry.register('prompts/doc_summary_250828.jinja')
+MODEL_NAME = "google/gemma-3-27b-it"
+MODEL_SETTINGS = {
+    "temperature": 0.6,
+    "max_tokens": 1000,
+}
+# 긴 문서 map-reduce 요약 설정
+DOC_SUMMARY_CHUNK_TOKENS = int(os.getenv("DOC_SUMMARY_CHUNK_TOKENS", "6000"))
+DOC_SUMMARY_MIN_CHUNKS = int(os.getenv("DOC_SUMMARY_MIN_CHUNKS", "2"))  # chunk 수가 이 이상일 때만 분할 요약
+DOC_SUMMARY_MAP_CONCURRENCY = int(os.getenv("DOC_SUMMARY_MAP_CONCURRENCY", "4"))
 
+
+async def summarize_text(text: str) -> str:
+    """단일 호출 요약"""
+    # 템플릿 렌더링
+    system_prompt = DOC_SUMMARY_PROMPT.render(doc_input=text)
+
+    result = await inference(
+        prompt=text,  # prompt와 system_prompt 순서 수정
+        model_name=MODEL_NAME,
+        model_settings=MODEL_SETTINGS,
+        system_prompt=system_prompt,
+        prompt_template=DOC_SUMMARY_PROMPT.name,
+        stage="doc_summary",
+        cache=True,  # 동일 문서 재처리 시 응답 재사용
+    )
+    return result.output
+
+
+async def map_reduce_summary(chunks: List[str]) -> str:
+    """
+    긴 문서 요약
+    map: chunk 별 요약을 제한된 동시성으로 실행
+    reduce: chunk 요약들을 합쳐 다시 요약 (합친 결과도 길면 반복)
+    """
+    semaphore = asyncio.Semaphore(DOC_SUMMARY_MAP_CONCURRENCY)
+
+    async def summarize_chunk(chunk: str) -> str:
+        async with semaphore:
+            return await summarize_text(chunk)
+
+    summaries = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+    combined = "\n\n".join(summaries)
+    while count_tokens(combined) > DOC_SUMMARY_CHUNK_TOKENS:
+        groups = chunk_text(combined, DOC_SUMMARY_CHUNK_TOKENS)
+        if len(groups) <= 1:
+            break
+        summaries = await asyncio.gather(*(summarize_chunk(group) for group in groups))
+        combined = "\n\n".join(summaries)
+    return await summarize_text(combined)
+
+
+@stage(reads=["doc_input"], writes="doc_summarized_new")
 async def doc_summary(data_instance):
     """
     제어 변수:
     모델, configs, system_prompt
     """
     print(f"📝 [doc_summary] 시작 - User: {data_instance.user_id}")
-    # 템플릿 렌더링
-    template = env.get_template('prompts/doc_summary_250828.jinja')
-    system_prompt = template.render(doc_input=data_instance.doc_input)
-    
-    result = await inference(
-        prompt=data_instance.doc_input,  # prompt와 system_prompt 순서 수정
-        model_name="google/gemma-3-27b-it",
-        model_settings={
-            "temperature": 0.6,
-            "max_tokens": 1000,
-        },
-        system_prompt=system_prompt
-    )
-    
-    summary = result.output
+
+    # 짧은 문서는 기존처럼 한 번에 요약
+    chunks = [data_instance.doc_input]
+    if count_tokens(data_instance.doc_input) > DOC_SUMMARY_CHUNK_TOKENS:
+        chunks = chunk_text(data_instance.doc_input, DOC_SUMMARY_CHUNK_TOKENS)
+
+    if len(chunks) >= DOC_SUMMARY_MIN_CHUNKS:
+        print(f"✂️ [doc_summary] 긴 문서 분할 요약 - {len(chunks)}개 chunk")
+        summary = await map_reduce_summary(chunks)
+    else:
+        summary = await summarize_text(data_instance.doc_input)
+
     print(f"✅ [doc_summary] 완료 - User: {data_instance.user_id}")
-    return summary
\ No newline at end of file
+    return summary
@@ -2,20 +2,19 @@
 컬렉션 쿼리 확장 모듈
 """
 import os
-import re
 import asyncio
 import random
 from app.llm.inference import inference
-from jinja2 import Environment, FileSystemLoader
+from app.llm.parser import tolerant_parser
+from app.scheduler import stage
+from app.collection_digest import digest_store
+from app.llm.prompt_registry import prompt_registry
 from pydantic import BaseModel, Field
 from typing import List
-import json
 
 
-# 현재 파일의 디렉토리를 기준으로 templates 폴더 설정
-current_dir = os.path.dirname(os.path.abspath(__file__))
-template_dir = os.path.join(current_dir, 'llm')
-env = Environment(loader=FileSystemLoader(template_dir))
+# 템플릿은 서버 시작 시 prompt_registry에서 한 번 컴파일됨
+EXPAND_COLLECTION_QUERY_PROMPT = prompt_registry.register('prompts/expand_collection_query_250905.jinja')
 
 class Question(BaseModel):
     """생성된 질문을 나타내는 모델"""
@@ -26,11 +25,10 @@ class QuestionsResponse(BaseModel):
     """여러 질문들을 담는 응답 모델"""
     questions: List[Question] = Field(description="생성된 질문들의 리스트", min_items=2, max_items=6)
 
-def convert_to_json(output):
-    output = re.sub(r'^```(?:json)?\s*', '', output.strip())
-    output = re.sub(r'\s*```$', '', output)
-    return json.loads(output)
-
+@stage(
+    reads=["doc_summarized", "doc_summarized_new", "doc_summarized_new_id", "collection_memo"],
+    writes="collection_question",
+)
 async def expand_collection_query(data_instance):
     """
     문서 인덱싱 함수 - pydantic-ai 구조화된 출력 사용
@@ -38,12 +36,12 @@ async def expand_collection_query(data_instance):
     """
     print(f"🔍 [expand_collection_query] 시작 - User: {data_instance.user_id}")
     
-    template = env.get_template('prompts/expand_collection_query_250905.jinja')
     # doc_summaries 구성
     data_instance.doc_summarized.append({"summary": data_instance.doc_summarized_new, "summary_id": data_instance.doc_summarized_new_id})
-    doc_summaries_joined = "\n------\n".join([summary["summary"] for summary in data_instance.doc_summarized])
+    # 전체 요약을 매번 붙이지 않고 컬렉션 digest(계층 요약) + 최신 요약으로 구성
+    doc_summaries_joined = await digest_store.build_context(data_instance.collection_id, data_instance.doc_summarized)
     # 여기까진 확실히 됨
-    prompt = template.render(doc_summaries=doc_summaries_joined, collection_memo=data_instance.collection_memo)
+    prompt = EXPAND_COLLECTION_QUERY_PROMPT.render(doc_summaries=doc_summaries_joined, collection_memo=data_instance.collection_memo)
     
     # 구조화된 출력을 위한 새로운 inference 함수 사용
     result = await inference(
@@ -59,11 +57,17 @@ async def expand_collection_query(data_instance):
             "max_tokens": 5000,
         },
         system_prompt=None,
+        prompt_template=EXPAND_COLLECTION_QUERY_PROMPT.name,
+        stage="expand_collection_query",
         #output_type=QuestionsResponse  # 구조화된 출력 타입 지정
+        # 스트리밍으로 받다가 질문 JSON이 완성되면 reasoning 꼬리를 기다리지 않고 종료
+        stream=True,
+        json_type=QuestionsResponse,
     )
     #print("🔍🔍questions_response🔍🔍")
     #print(result.output)
-    questions_response = convert_to_json(result.output)
+    # 코드 블록 / 잘린 출력 / 잘못된 escape 등을 로컬에서 복구 후 스키마 검증
+    questions_response = (result.parsed or tolerant_parser(result.output, QuestionsResponse)).model_dump()
     #print(questions_response)
 
     print(f"✅ [doc_indexing] 완료 - User: {data_instance.user_id}")
@@ -0,0 +1,153 @@
+"""
+비동기 작업(job) 큐
+긴 파이프라인을 HTTP 연결 밖에서 처리하기 위한 프로세스 내 작업 큐
+
+- 크기 제한이 있는 asyncio.Queue + 설정 가능한 worker 수
+- 큐가 가득 차면 QueueFullError로 즉시 거절 (호출자가 503 등으로 응답)
+- 완료된 job은 일정 개수까지만 보관 (오래된 것부터 제거)
+"""
+import os
+import time
+import uuid
+import asyncio
+import traceback
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "1000"))
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """작업 큐가 가득 찬 경우"""
+
+
+class Job:
+    """큐에 들어간 작업 하나 - 처리 중인 DataInfo를 통해 필드별 결과 조회 가능"""
+
+    def __init__(self, request: Any):
+        self.job_id = uuid.uuid4().hex
+        self.request = request
+        self.data = None  # 처리 시작 시 DataInfo가 연결됨
+        self.status = JobStatus.QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.trace_id: Optional[str] = None  # 처리 시작 시 발급 (app/tracing.py)
+
+    async def to_dict(self) -> Dict[str, Any]:
+        """상태 API 응답 - 지금까지 갱신된 필드 포함"""
+        fields: Dict[str, Any] = {}
+        updated: Dict[str, bool] = {}
+        if self.data is not None:
+            fields = await self.data.get_updated_fields()
+            updated = await self.data.is_data_updated()
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "trace_id": self.trace_id,
+            "updated": updated,
+            "fields": fields,
+        }
+
+
+class JobQueue:
+    """크기 제한 큐 + worker pool"""
+
+    def __init__(
+        self,
+        handler: Callable[[Job], Awaitable[None]],
+        workers: int = JOB_WORKERS,
+        max_size: int = JOB_QUEUE_SIZE,
+        retention: int = JOB_RETENTION,
+    ):
+        self._handler = handler
+        self._n_workers = workers
+        self._max_size = max_size
+        self._retention = retention
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def start(self) -> None:
+        """worker 시작 (FastAPI startup 시 호출)"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self._n_workers)
+        ]
+        print(f"🧰 [jobs] worker {self._n_workers}개 시작 (큐 크기 {self._max_size})")
+
+    async def stop(self) -> None:
+        """worker 종료 (FastAPI shutdown 시 호출)"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, request: Any) -> Job:
+        """작업 등록 - 큐가 가득 차면 QueueFullError"""
+        if self._queue is None:
+            raise RuntimeError("JobQueue가 시작되지 않았습니다")
+        job = Job(request)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"작업 큐가 가득 찼습니다 ({self._max_size})")
+        self._remember(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def queue_size(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _remember(self, job: Job) -> None:
+        self._jobs[job.job_id] = job
+        # 보관 개수를 넘으면 끝난 job부터 제거
+        while len(self._jobs) > self._retention:
+            oldest_id = next(
+                (jid for jid, j in self._jobs.items() if j.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)),
+                None,
+            )
+            if oldest_id is None:
+                break
+            del self._jobs[oldest_id]
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            try:
+                await self._handler(job)
+                job.status = JobStatus.SUCCEEDED
+            except asyncio.CancelledError:
+                job.status = JobStatus.FAILED
+                job.error = "서버 종료로 취소됨"
+                raise
+            except Exception as e:
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+                print(f"⚠️ [jobs] job {job.job_id} 실패: {e}\n{traceback.format_exc()}")
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
@@ -0,0 +1,210 @@
+"""
+LLM 응답 캐시 모듈
+동일한 (모델, 설정, system prompt, prompt, 출력 타입) 조합의 응답을 재사용
+
+- 1차: 크기 제한이 있는 메모리 LRU
+- 2차: 로컬 디스크 (SQLite, WAL 모드)
+- 항목별 TTL, stage 별 hit/miss 카운터
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Tuple, Type
+from pydantic import BaseModel
+
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ITEMS = int(os.getenv("LLM_CACHE_MAX_ITEMS", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# 빈 문자열이면 디스크 계층 없이 메모리만 사용
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+
+
+class CachedResult:
+    """캐시에서 복원한 결과 - AgentRunResult처럼 `.output`으로 접근"""
+
+    def __init__(self, output: Any):
+        self.output = output
+        self.cached = True
+
+    def usage(self):
+        return None
+
+
+def _type_signature(output_type: Optional[Type[BaseModel]]) -> Optional[str]:
+    """출력 타입의 이름과 스키마 - 모델 정의가 바뀌면 키도 바뀐다"""
+    if output_type is None:
+        return None
+    schema = json.dumps(output_type.model_json_schema(), sort_keys=True, ensure_ascii=False)
+    return f"{output_type.__module__}.{output_type.__qualname__}:{schema}"
+
+
+def make_cache_key(
+    model_name: str,
+    model_settings: Optional[dict],
+    system_prompt: Optional[str],
+    prompt: str,
+    output_type: Optional[Type[BaseModel]] = None,
+) -> str:
+    """요청 내용을 해시하여 캐시 키 생성"""
+    payload = json.dumps(
+        {
+            "model_name": model_name,
+            "model_settings": model_settings or {},
+            "system_prompt": system_prompt,
+            "prompt": prompt,
+            "output_type": _type_signature(output_type),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _DiskStore:
+    """SQLite 기반 디스크 계층 (스레드에서 호출됨)"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            return row[0], row[1]
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMCache:
+    """메모리 LRU + 디스크 2계층 LLM 응답 캐시"""
+
+    def __init__(
+        self,
+        max_items: int = LLM_CACHE_MAX_ITEMS,
+        default_ttl: float = LLM_CACHE_TTL,
+        path: Optional[str] = LLM_CACHE_PATH,
+        enabled: bool = LLM_CACHE_ENABLED,
+    ):
+        self.enabled = enabled
+        self.max_items = max_items
+        self.default_ttl = default_ttl
+        self._path = path
+        self._disk: Optional[_DiskStore] = None
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"memory_hit": 0, "disk_hit": 0, "miss": 0}
+        )
+        self.evictions = 0  # 메모리 LRU에서 밀려난 항목 수
+
+    def __len__(self) -> int:
+        """메모리 계층 항목 수"""
+        return len(self._memory)
+
+    def _get_disk(self) -> Optional[_DiskStore]:
+        if self._disk is None and self._path:
+            self._disk = _DiskStore(self._path)
+        return self._disk
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _serialize(output: Any) -> str:
+        if isinstance(output, BaseModel):
+            return output.model_dump_json()
+        return json.dumps(output, ensure_ascii=False)
+
+    @staticmethod
+    def _deserialize(value: str, output_type: Optional[Type[BaseModel]]) -> Any:
+        if output_type is not None:
+            return output_type.model_validate_json(value)
+        return json.loads(value)
+
+    async def get(
+        self,
+        key: str,
+        output_type: Optional[Type[BaseModel]] = None,
+        stage: str = "default",
+    ) -> Optional[Any]:
+        """캐시 조회 - 없거나 만료되었으면 None"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[1] >= time.time():
+                self._memory.move_to_end(key)
+                self._stats[stage]["memory_hit"] += 1
+                return self._deserialize(entry[0], output_type)
+            del self._memory[key]
+
+        disk = self._get_disk()
+        if disk is not None:
+            row = await asyncio.to_thread(disk.get, key)
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                self._stats[stage]["disk_hit"] += 1
+                return self._deserialize(row[0], output_type)
+
+        self._stats[stage]["miss"] += 1
+        return None
+
+    async def set(self, key: str, output: Any, ttl: Optional[float] = None) -> None:
+        """응답 저장 (메모리 + 디스크)"""
+        value = self._serialize(output)
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+        self._remember(key, value, expires_at)
+        disk = self._get_disk()
+        if disk is not None:
+            await asyncio.to_thread(disk.set, key, value, expires_at)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """stage 별 hit/miss 카운터"""
+        return {stage: dict(counts) for stage, counts in self._stats.items()}
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+# 프로세스 전역 캐시 인스턴스
+llm_cache = LLMCache()
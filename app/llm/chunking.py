@@ -0,0 +1,113 @@
+"""
+토큰 기반 텍스트 분할 모듈
+긴 문서를 모델 컨텍스트에 맞는 chunk로 나눈다.
+
+- 토큰 수는 로컬 tokenizer(tiktoken)로 계산, 인코더와 짧은 문장의 결과만 캐시
+  (문서/chunk 전체를 캐시 키로 잡아 두면 긴 문자열이 프로세스 내내 메모리에 남음)
+  (tiktoken을 쓸 수 없으면 UTF-8 바이트 기반 추정치로 대체)
+- 문단 -> 문장 경계 순으로 분할 (한국어 종결 "다." "요." 및 줄바꿈 포함)
+- 한 문장이 chunk 크기를 넘으면 글자 단위로 강제 분할
+"""
+import os
+import re
+from functools import lru_cache
+from typing import List
+
+from app.llm.rate_limit import estimate_tokens
+
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+_CACHED_TEXT_CHARS = 256  # 이보다 긴 텍스트는 캐시하지 않음 (캐시 메모리 상한 = 항목 수 x 이 길이)
+
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+# 문장 끝 기호 뒤 공백/따옴표, 또는 줄바꿈에서 분할
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?。！？…])[\"'”’)\]]*\s+|\n+")
+
+
+@lru_cache(maxsize=1)
+def _get_encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(f"⚠️ [chunking] tokenizer 로드 실패, 추정치 사용: {e}")
+        return None
+
+
+def _count(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder is None:
+        return estimate_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+_count_short = lru_cache(maxsize=20_000)(_count)
+
+
+def count_tokens(text: str) -> int:
+    """텍스트의 토큰 수 (짧은 텍스트만 캐시)"""
+    if len(text) <= _CACHED_TEXT_CHARS:
+        return _count_short(text)
+    return _count(text)
+
+
+def split_sentences(text: str) -> List[str]:
+    """문단/문장 경계로 분할 (문단 사이에는 빈 문자열을 넣어 경계를 표시)"""
+    units: List[str] = []
+    for paragraph in _PARAGRAPH_PATTERN.split(text):
+        sentences = [s.strip() for s in _SENTENCE_PATTERN.split(paragraph) if s and s.strip()]
+        if sentences:
+            if units:
+                units.append("")
+            units.extend(sentences)
+    return units
+
+
+def _hard_split(sentence: str, max_tokens: int) -> List[str]:
+    """chunk보다 긴 문장을 토큰 수에 맞춰 글자 단위로 분할"""
+    pieces: List[str] = []
+    start = 0
+    while start < len(sentence):
+        # 토큰당 글자 수 비율로 길이를 잡고 넘치면 줄여 나감
+        ratio = len(sentence) / max(count_tokens(sentence), 1)
+        end = min(len(sentence), start + max(1, int(max_tokens * ratio)))
+        while end - start > 1 and count_tokens(sentence[start:end]) > max_tokens:
+            end = start + (end - start) * 9 // 10
+        pieces.append(sentence[start:end])
+        start = end
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    문장 경계를 지키며 max_tokens 이하의 chunk로 분할
+
+    문단이 바뀌는 지점은 chunk 안에서도 빈 줄로 유지한다.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush() -> None:
+        nonlocal current, current_tokens
+        body = " ".join(current).replace(" \n\n ", "\n\n").strip()
+        if body:
+            chunks.append(body)
+        current, current_tokens = [], 0
+
+    for unit in split_sentences(text):
+        if unit == "":
+            if current:
+                current.append("\n\n")
+            continue
+        tokens = count_tokens(unit)
+        if tokens > max_tokens:
+            flush()
+            chunks.extend(_hard_split(unit, max_tokens))
+            continue
+        if current_tokens + tokens > max_tokens:
+            flush()
+        current.append(unit)
+        current_tokens += tokens
+    flush()
+    return chunks
@@ -0,0 +1,166 @@
+"""
+LLM 요청 hedging
+느린 꼬리(tail) 응답 하나가 순차 파이프라인 전체를 붙잡지 않도록,
+모델 별 지연 시간 백분위수를 넘긴 호출에는 backup 요청을 보낸다.
+
+- 모델 별 최근 지연 시간(성공한 호출)을 rolling window로 추적
+- primary가 p{LLM_HEDGE_PERCENTILE} 안에 끝나지 않으면 같은 모델
+  (또는 LLM_HEDGE_ALTERNATES에 지정된 대체 모델)로 backup 요청
+- 먼저 성공한 쪽을 사용하고 나머지는 취소
+- 최근 호출 중 hedge 비율이 LLM_HEDGE_MAX_RATE를 넘으면 hedge하지 않음
+- 모델 별 hedge 승패와 추가 비용(결과를 쓰지 않은 요청이 돈 시간)을 집계해 /metrics로 노출
+
+설정 (환경변수 LLM_HEDGE_ALTERNATES, JSON):
+    {"google/gemma-3-27b-it": "google/gemini-2.5-flash-lite"}
+"""
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import numpy as np
+
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # 이보다 적으면 hedge하지 않음
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.05"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))  # 초
+HEDGE_ALTERNATES: Dict[str, str] = json.loads(os.getenv("LLM_HEDGE_ALTERNATES", "{}"))
+
+
+class _ModelStats:
+    """모델 하나의 지연 시간 window와 hedge 집계"""
+
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0  # backup이 먼저 성공한 횟수
+        self.primary_wins = 0  # hedge했지만 primary가 먼저 성공한 횟수
+        self.extra_seconds = 0.0  # hedge로 생긴 중복 요청 중 결과를 쓰지 않은 쪽이 실행된 시간
+
+    def to_dict(self, percentile: float) -> Dict[str, Any]:
+        return {
+            "samples": len(self.latencies),
+            f"p{percentile:g}": float(np.percentile(self.latencies, percentile)) if self.latencies else None,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "extra_seconds": self.extra_seconds,
+        }
+
+
+class Hedger:
+    """모델 별 지연 시간 추적 + hedged 실행"""
+
+    def __init__(
+        self,
+        enabled: bool = LLM_HEDGE_ENABLED,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        window: int = LLM_HEDGE_WINDOW,
+        max_rate: float = LLM_HEDGE_MAX_RATE,
+        min_delay: float = LLM_HEDGE_MIN_DELAY,
+        alternates: Optional[Dict[str, str]] = None,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.alternates = HEDGE_ALTERNATES if alternates is None else alternates
+        self._models: Dict[str, _ModelStats] = {}
+        # 최근 호출들의 hedge 여부 (hedge 비율 상한 계산용, 전체 모델 공통)
+        self._recent: Deque[bool] = deque(maxlen=window)
+
+    def _stats(self, model_name: str) -> _ModelStats:
+        stats = self._models.get(model_name)
+        if stats is None:
+            stats = self._models[model_name] = _ModelStats(self.window)
+        return stats
+
+    def record(self, model_name: str, latency: float) -> None:
+        """성공한 호출의 지연 시간 기록"""
+        self._stats(model_name).latencies.append(latency)
+
+    def hedge_delay(self, model_name: str) -> Optional[float]:
+        """backup 요청을 보낼 시점 (표본이 부족하면 None)"""
+        latencies = self._stats(model_name).latencies
+        if len(latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, float(np.percentile(latencies, self.percentile)))
+
+    def _allow_hedge(self) -> bool:
+        if not self._recent:
+            return True
+        return sum(self._recent) / len(self._recent) < self.max_rate
+
+    async def run(self, model_name: str, attempt: Callable[[str], Awaitable[Any]]) -> Any:
+        """
+        attempt(model_name)을 실행하고, 지연되면 backup attempt를 경쟁시킨다.
+        먼저 성공한 결과를 반환 (둘 다 실패하면 primary의 예외)
+        """
+        stats = self._stats(model_name)
+        stats.calls += 1
+        delay = self.hedge_delay(model_name) if self.enabled else None
+        if delay is None:
+            self._recent.append(False)
+            return await attempt(model_name)
+
+        primary = asyncio.ensure_future(attempt(model_name))
+        backup: Optional[asyncio.Future] = None
+        winner: Optional[asyncio.Future] = None
+        started = {primary: time.monotonic()}
+        finished: Dict[asyncio.Future, float] = {}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._allow_hedge():
+                self._recent.append(False)
+                return await primary
+
+            self._recent.append(True)
+            stats.hedged += 1
+            backup_model = self.alternates.get(model_name, model_name)
+            print(f"🏇 [hedging] {model_name} {delay:.2f}s 초과 - backup 요청 ({backup_model})")
+            backup = asyncio.ensure_future(attempt(backup_model))
+            started[backup] = time.monotonic()
+            for task in (primary, backup):
+                task.add_done_callback(lambda t: finished.setdefault(t, time.monotonic()))
+
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is backup:
+                            stats.hedge_wins += 1
+                        else:
+                            stats.primary_wins += 1
+                        return task.result()
+            # 둘 다 실패
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+            if backup is not None:
+                # 추가 비용: 결과를 쓰지 않은 요청의 실행 시간 (둘 다 실패하면 backup 쪽)
+                loser = primary if winner is backup else backup
+                stats.extra_seconds += finished.get(loser, time.monotonic()) - started[loser]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_rate": sum(self._recent) / len(self._recent) if self._recent else 0.0,
+            "models": {name: s.to_dict(self.percentile) for name, s in self._models.items()},
+        }
+
+
+# 프로세스 전역 hedger
+hedger = Hedger()
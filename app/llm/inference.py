@@ -2,11 +2,22 @@
 # 1. 모델 별 라우팅
 # 2. API 키 관리
 import os
-from pydantic_ai import Agent
+import time
+import httpx
+from openai import AsyncOpenAI
+from pydantic_ai import Agent, RunContext
 from pydantic_ai.providers.openrouter import OpenRouterProvider
 from pydantic_ai.models.openai import OpenAIChatModel
 from pydantic import BaseModel
-from typing import Type, TypeVar, Any, Optional
+from typing import Type, Any, Awaitable, Callable, Optional, Dict, List, Tuple, Union
+from app.llm.cache import llm_cache, make_cache_key, CachedResult
+from app.llm.rate_limit import rate_limiter, estimate_tokens, RateLimitTimeout
+from app.llm.hedging import hedger
+from app.llm.parser import JSONRepairParser, tolerant_parser
+from app.singleflight import SingleFlight
+from app.resilience import call_with_retry, fallback_models, should_fallback
+from app.metrics import LLM_CACHE_HITS, record_llm_usage, track_llm_call, usage_tokens
+from app.tracing import current_span, span
 
 '''
 이미 완성된 프롬프트를 받아서 인퍼런스
@@ -19,45 +30,454 @@ prompt: str
 
 '''
 
-async def inference(prompt: str, model_name: str, model_settings: dict, system_prompt: Optional[str] = None):
-    model = OpenAIChatModel(
-        model_name,
-        provider=OpenRouterProvider(api_key=os.getenv("OPENROUTER_API_KEY")),
-    )
-    agent_kwargs = {
-        "model": model,
-        "model_settings": model_settings,
-    }
-    if system_prompt: agent_kwargs["system_prompt"] = system_prompt
-    
-    agent = Agent(
-        **agent_kwargs,
-    )
-    result = await agent.run(prompt)
+# 프로세스 전체에서 공유하는 클라이언트 레지스트리
+# - API 키 별 provider 1개 (keep-alive / HTTP2 커넥션 풀 공유)
+# - (model_name, output_type, system prompt 템플릿) 별 Agent 캐시
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+
+_http_client: Optional[httpx.AsyncClient] = None
+_providers: Dict[str, OpenRouterProvider] = {}
+_agents: Dict[Tuple[str, Any, Optional[str], bool], Agent] = {}
+# 동일한 요청이 진행 중이면 같은 결과를 함께 기다림
+llm_singleflight = SingleFlight("llm")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """공유 httpx 클라이언트 반환 (최초 호출 시 생성)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+    return _http_client
+
+
+def get_provider(api_key: Optional[str] = None) -> OpenRouterProvider:
+    """API 키 별로 하나의 provider를 재사용"""
+    api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+    provider = _providers.get(api_key)
+    if provider is None:
+        # 재시도는 app.resilience에서 일괄 처리하므로 SDK 자체 재시도는 끔
+        provider = OpenRouterProvider(openai_client=AsyncOpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=api_key,
+            http_client=get_http_client(),
+            max_retries=0,
+        ))
+        _providers[api_key] = provider
+    return provider
+
+
+def get_agent(
+    model_name: str,
+    output_type: Optional[Type[BaseModel]] = None,
+    prompt_template: Optional[str] = None,
+    with_system_prompt: bool = False,
+) -> Agent:
+    """
+    (model_name, output_type, system prompt 템플릿) 별로 Agent를 캐싱
+
+    렌더링된 system prompt는 요청마다 다르므로 deps로 전달하고,
+    Agent에는 deps를 그대로 system prompt로 돌려주는 함수만 등록한다.
+    """
+    key = (model_name, output_type, prompt_template, with_system_prompt)
+    agent = _agents.get(key)
+    if agent is None:
+        model = OpenAIChatModel(model_name, provider=get_provider())
+        agent_kwargs = {"model": model, "deps_type": Optional[str]}
+        if output_type is not None:
+            agent_kwargs["output_type"] = output_type
+        agent = Agent(**agent_kwargs)
+
+        if with_system_prompt:
+            @agent.system_prompt
+            def _system_prompt(ctx: RunContext[Optional[str]]) -> str:
+                return ctx.deps
+
+        _agents[key] = agent
+    return agent
+
+
+async def init_clients() -> None:
+    """FastAPI startup 시 호출 - provider 생성 및 커넥션 미리 열기"""
+    get_provider()
+    try:
+        # TLS 핸드셰이크를 미리 수행해 첫 요청의 지연을 줄인다
+        await get_http_client().get(f"{OPENROUTER_BASE_URL}/models", timeout=5.0)
+        print("🔌 [inference] OpenRouter 커넥션 준비 완료")
+    except Exception as e:
+        print(f"⚠️ [inference] 커넥션 예열 실패 (요청 시 재시도): {e}")
+
+
+async def close_clients() -> None:
+    """FastAPI shutdown 시 호출 - 커넥션 풀 정리"""
+    global _http_client
+    _agents.clear()
+    _providers.clear()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    llm_cache.close()
+
+
+async def _run(
+    prompt: str,
+    model_name: str,
+    model_settings: dict,
+    system_prompt: Optional[str],
+    output_type: Optional[Type[BaseModel]],
+    prompt_template: Optional[str],
+    stage: Optional[str],
+    cache: bool,
+    cache_ttl: Optional[float],
+):
+    """
+    공통 실행 경로
+    - stage가 opt-in한 경우 응답 캐시를 먼저 확인
+    - 동일한 요청이 진행 중이면 새로 호출하지 않고 합류 (single-flight)
+    - 모델/provider 별 rate limit 몫을 얻은 뒤 호출
+    - 지연 백분위수를 넘기면 backup 요청으로 hedge
+    - 일시적 오류는 재시도, 그래도 실패하면 stage의 fallback 모델로 넘어감
+      (fallback 모델의 응답은 캐시하지 않음)
+    """
+    key = make_cache_key(model_name, model_settings, system_prompt, prompt, output_type)
+    use_cache = cache and llm_cache.enabled
+    if use_cache:
+        output = await llm_cache.get(key, output_type, stage=stage or model_name)
+        if output is not None:
+            print(f"♻️ [inference] 캐시 적중 - {stage or model_name}")
+            LLM_CACHE_HITS.labels(stage or model_name).inc()
+            current_span().set_attribute("llm_cache_hit", True)
+            return CachedResult(output)
+
+    estimated = estimate_tokens(prompt) + estimate_tokens(system_prompt) + int(model_settings.get("max_tokens", 0))
+
+    async def attempt(attempt_model: str):
+        agent = get_agent(
+            attempt_model,
+            output_type=output_type,
+            prompt_template=prompt_template,
+            with_system_prompt=bool(system_prompt),
+        )
+
+        async def once():
+            reservation = await rate_limiter.acquire(attempt_model, estimated)
+            started = time.monotonic()
+            with track_llm_call(attempt_model), span("llm.call", model=attempt_model, stage=stage) as llm_span:
+                result = await agent.run(prompt, deps=system_prompt, model_settings=model_settings)
+                input_tokens, output_tokens = usage_tokens(result.usage)
+                llm_span.set_attributes(input_tokens=input_tokens, output_tokens=output_tokens)
+            hedger.record(attempt_model, time.monotonic() - started)
+            record_llm_usage(attempt_model, result.usage)
+            # usage를 모르면(0) 추정치를 그대로 유지
+            reservation.settle((input_tokens + output_tokens) or None)
+            return result
+
+        # 일시적 오류는 backoff 재시도, 모델 별 circuit breaker
+        return await call_with_retry(f"llm:{attempt_model}", once)
+
+    async def call():
+        last_error: Optional[Exception] = None
+        for candidate in fallback_models(stage, model_name):
+            if last_error is not None:
+                print(f"↪️ [inference] {stage or model_name} fallback -> {candidate} ({last_error})")
+            try:
+                # 응답이 늦으면 backup 요청을 보내 먼저 끝난 쪽을 사용 (hedging)
+                result = await hedger.run(candidate, attempt)
+            except Exception as e:
+                if not (should_fallback(e) or isinstance(e, RateLimitTimeout)):
+                    raise
+                last_error = e
+                continue
+            # 캐시 키는 기본 모델 기준이므로 fallback 모델의 결과는 캐시하지 않음
+            # (기본 모델이 복구된 뒤에도 TTL 동안 fallback 결과가 나가지 않도록)
+            if use_cache and candidate == model_name:
+                await llm_cache.set(key, result.output, ttl=cache_ttl)
+            return result
+        raise last_error
+
+    return await llm_singleflight.do(key, call)
+
+
+class StreamInterrupted(Exception):
+    """스트리밍 도중(이미 토큰을 전달한 뒤) 실패 - 중복 전달을 피하기 위해 재시도하지 않음"""
+
+
+class StreamedResult:
+    """스트리밍 호출 결과 - agent.run() 결과와 같은 .output / usage() 인터페이스"""
+
+    def __init__(self, output: str, parsed: Any = None, stopped_early: bool = False, usage: Any = None):
+        self.output = output
+        self.parsed = parsed  # json_type 검증을 통과한 값 (없으면 None)
+        self.stopped_early = stopped_early
+        self._usage = usage
+
+    def usage(self):
+        return self._usage
+
+
+async def _deliver(on_text: Optional[Callable[[str], Union[None, Awaitable[None]]]], text: str) -> None:
+    """on_text 콜백 호출 (동기/비동기 모두 지원)"""
+    if on_text is None or not text:
+        return
+    maybe = on_text(text)
+    if maybe is not None:
+        await maybe
+
+
+class _StreamSubscriber:
+    """single-flight로 공유되는 스트림의 호출자 하나 - 받은 글자 수를 세어 빠진 부분만 이어서 전달"""
+
+    def __init__(self, on_text: Optional[Callable[[str], Union[None, Awaitable[None]]]]):
+        self.on_text = on_text
+        self.delivered = 0
+
+    async def send(self, text: str) -> None:
+        self.delivered += len(text)
+        await _deliver(self.on_text, text)
+
+    async def catch_up(self, output: str) -> None:
+        """늦게 합류했거나 스트림이 끝난 뒤 합류한 경우 아직 못 받은 나머지를 전달"""
+        if self.delivered < len(output):
+            await self.send(output[self.delivered:])
+
+
+class _StreamFanout:
+    """하나의 실제 스트림 호출을 같은 요청을 보낸 호출자 모두에게 나눠줌"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.subscribers: List[_StreamSubscriber] = []
+
+    async def subscribe(self, subscriber: _StreamSubscriber) -> None:
+        """지금까지 나온 조각을 먼저 보내고 이후 조각을 받도록 등록"""
+        self.subscribers.append(subscriber)
+        await subscriber.send("".join(self.chunks))
+
+    async def emit(self, delta: str) -> None:
+        self.chunks.append(delta)
+        for subscriber in list(self.subscribers):
+            await subscriber.send(delta)
+
+
+# ("stream", 캐시 키) -> 진행 중인 스트림의 fanout
+_stream_fanouts: Dict[Tuple[str, str], _StreamFanout] = {}
+
+
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+
+class _JSONWatcher:
+    """스트리밍 텍스트를 증분 파서에 넣고 완성된 JSON이 검증되는지 확인 (<think> 블록은 건너뜀)"""
+
+    def __init__(self, json_type: Optional[Type[BaseModel]]):
+        self.json_type = json_type
+        self.parser = JSONRepairParser()
+        self._pending = ""
+        self._in_think: Optional[bool] = None  # 아직 판단 전이면 None
+        self.parsed: Any = None
+        self.gave_up = False
+
+    def feed(self, delta: str) -> bool:
+        """완성된 JSON이 검증되면 True"""
+        if self.gave_up:
+            return False
+        self._pending += delta
+        if self._in_think is None:
+            head = self._pending.lstrip()
+            if len(head) < len(_THINK_OPEN) and _THINK_OPEN.startswith(head):
+                return False
+            self._in_think = head.startswith(_THINK_OPEN)
+        if self._in_think:
+            end = self._pending.find(_THINK_CLOSE)
+            if end < 0:
+                # 닫는 태그가 조각 경계에 걸칠 수 있으므로 끝부분만 남김
+                self._pending = self._pending[-len(_THINK_CLOSE):]
+                return False
+            self._pending = self._pending[end + len(_THINK_CLOSE):]
+            self._in_think = False
+        self.parser.feed(self._pending)
+        self._pending = ""
+        if not self.parser.complete:
+            return False
+        try:
+            self.parsed = tolerant_parser(self.parser.close(), self.json_type)
+            return True
+        except Exception:
+            # 완성됐지만 스키마와 맞지 않음 - 끝까지 받은 뒤 전체 텍스트로 다시 파싱
+            self.gave_up = True
+            return False
+
+
+async def _stream_run(
+    prompt: str,
+    model_name: str,
+    model_settings: dict,
+    system_prompt: Optional[str],
+    prompt_template: Optional[str],
+    stage: Optional[str],
+    cache: bool,
+    cache_ttl: Optional[float],
+    json_type: Optional[Type[BaseModel]],
+    on_text: Optional[Callable[[str], Union[None, Awaitable[None]]]],
+) -> StreamedResult:
+    """
+    run_stream 기반 실행 경로
+    - 토큰 조각마다 on_text(delta) 호출 (동기/비동기 함수 모두 가능)
+    - json_type이 주어지면 완성된 JSON이 검증을 통과하는 즉시 스트림을 끊는다
+    - 응답 캐시 / single-flight / rate limit / 재시도 / fallback 모델은 일반 경로와 동일
+      (같은 요청이 진행 중이면 합류해 지금까지의 조각부터 이어 받음)
+    - hedging은 두 스트림의 조각이 섞이므로 적용하지 않음
+    """
+    key = make_cache_key(model_name, model_settings, system_prompt, prompt, None)
+    use_cache = cache and llm_cache.enabled
+    if use_cache:
+        output = await llm_cache.get(key, None, stage=stage or model_name)
+        if output is not None:
+            print(f"♻️ [inference] 캐시 적중 - {stage or model_name}")
+            LLM_CACHE_HITS.labels(stage or model_name).inc()
+            current_span().set_attribute("llm_cache_hit", True)
+            await _deliver(on_text, output)
+            parsed = None
+            if json_type is not None:
+                watcher = _JSONWatcher(json_type)
+                watcher.feed(output)
+                parsed = watcher.parsed
+            return StreamedResult(output, parsed=parsed)
+
+    estimated = estimate_tokens(prompt) + estimate_tokens(system_prompt) + int(model_settings.get("max_tokens", 0))
+
+    flight_key = ("stream", key)
+    fanout = _stream_fanouts.get(flight_key)
+    if fanout is None:
+        fanout = _stream_fanouts[flight_key] = _StreamFanout()
+
+    async def attempt(attempt_model: str) -> StreamedResult:
+        agent = get_agent(
+            attempt_model,
+            prompt_template=prompt_template,
+            with_system_prompt=bool(system_prompt),
+        )
+
+        async def once() -> StreamedResult:
+            reservation = await rate_limiter.acquire(attempt_model, estimated)
+            watcher = _JSONWatcher(json_type) if json_type is not None else None
+            chunks = []
+            stopped_early = False
+            try:
+                with track_llm_call(attempt_model), span("llm.call", model=attempt_model, stage=stage, stream=True) as llm_span:
+                    async with agent.run_stream(prompt, deps=system_prompt, model_settings=model_settings) as stream:
+                        async for delta in stream.stream_text(delta=True, debounce_by=None):
+                            chunks.append(delta)
+                            await fanout.emit(delta)
+                            if watcher is not None and watcher.feed(delta):
+                                stopped_early = True
+                                await stream.cancel()
+                                break
+                        usage = stream.usage
+                    input_tokens, output_tokens = usage_tokens(usage)
+                    llm_span.set_attributes(input_tokens=input_tokens, output_tokens=output_tokens, stopped_early=stopped_early)
+            except Exception as e:
+                if chunks:
+                    raise StreamInterrupted(f"{attempt_model} 스트림 중단: {e}") from e
+                raise
+            record_llm_usage(attempt_model, usage)
+            result = StreamedResult("".join(chunks), stopped_early=stopped_early, usage=usage)
+            if watcher is not None:
+                result.parsed = watcher.parsed
+            # usage를 모르면(0) 추정치를 그대로 유지
+            reservation.settle((input_tokens + output_tokens) or None)
+            return result
+
+        return await call_with_retry(f"llm:{attempt_model}", once)
+
+    async def call() -> StreamedResult:
+        try:
+            last_error: Optional[Exception] = None
+            for candidate in fallback_models(stage, model_name):
+                if last_error is not None:
+                    print(f"↪️ [inference] {stage or model_name} fallback -> {candidate} ({last_error})")
+                try:
+                    result = await attempt(candidate)
+                except Exception as e:
+                    if not (should_fallback(e) or isinstance(e, RateLimitTimeout)):
+                        raise
+                    last_error = e
+                    continue
+                if result.stopped_early:
+                    print(f"✂️ [inference] {stage or model_name} JSON 완성 - 스트림 조기 종료")
+                # fallback 모델의 결과는 기본 모델 키로 캐시하지 않음
+                if use_cache and candidate == model_name:
+                    await llm_cache.set(key, result.output, ttl=cache_ttl)
+                return result
+            raise last_error
+        finally:
+            if _stream_fanouts.get(flight_key) is fanout:
+                del _stream_fanouts[flight_key]
+
+    subscriber = _StreamSubscriber(on_text)
+    await fanout.subscribe(subscriber)
+    try:
+        result = await llm_singleflight.do(flight_key, call)
+    finally:
+        fanout.subscribers.remove(subscriber)
+    # 스트림이 끝나는 시점에 합류한 경우 등 빠진 부분을 채움
+    await subscriber.catch_up(result.output)
     return result
 
 
+async def inference(
+    prompt: str,
+    model_name: str,
+    model_settings: dict,
+    system_prompt: Optional[str] = None,
+    prompt_template: Optional[str] = None,
+    stage: Optional[str] = None,
+    cache: bool = False,
+    cache_ttl: Optional[float] = None,
+    stream: bool = False,
+    on_text: Optional[Callable[[str], Union[None, Awaitable[None]]]] = None,
+    json_type: Optional[Type[BaseModel]] = None,
+):
+    """
+    stream=True면 run_stream으로 토큰을 받아 on_text로 흘려보내고,
+    json_type 검증을 통과하는 JSON이 완성되면 생성을 기다리지 않고 끊는다 (StreamedResult 반환)
+    """
+    if stream:
+        return await _stream_run(
+            prompt, model_name, model_settings, system_prompt,
+            prompt_template, stage, cache, cache_ttl,
+            json_type, on_text,
+        )
+    return await _run(
+        prompt, model_name, model_settings, system_prompt,
+        None, prompt_template, stage, cache, cache_ttl,
+    )
+
+
 async def structured_inference(
-    prompt: str, 
-    model_name: str, 
-    model_settings: dict, 
+    prompt: str,
+    model_name: str,
+    model_settings: dict,
     system_prompt: Optional[str] = None,
-    output_type: Optional[Type[BaseModel]] = None
+    output_type: Optional[Type[BaseModel]] = None,
+    prompt_template: Optional[str] = None,
+    stage: Optional[str] = None,
+    cache: bool = False,
+    cache_ttl: Optional[float] = None,
 ) -> Any:
     """구조화된 출력을 위한 새로운 inference 함수"""
-    model = OpenAIChatModel(
-        model_name,
-        provider=OpenRouterProvider(api_key=os.getenv("OPENROUTER_API_KEY")),
+    # 구조화된 출력 타입 지정
+    return await _run(
+        prompt, model_name, model_settings, system_prompt,
+        output_type, prompt_template, stage, cache, cache_ttl,
     )
-    
-    agent_kwargs = {
-        "model": model,
-        "model_settings": model_settings,
-        "output_type": output_type  # 구조화된 출력 타입 지정
-    }
-    if system_prompt: 
-        agent_kwargs["system_prompt"] = system_prompt
-    
-    agent = Agent(**agent_kwargs)
-    result = await agent.run(prompt)
-    return result
\ No newline at end of file
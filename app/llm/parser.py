@@ -2,9 +2,10 @@
 JSON 파싱 모듈
 pydantic-ai와 기존 문자열 기반 JSON 파싱을 모두 지원
 """
+import copy
 import json
 import re
-from typing import TypeVar, Type, Any, Union
+from typing import TypeVar, Type, Any, List, Optional, Tuple, Union
 from pydantic import BaseModel, ValidationError
 
 T = TypeVar('T', bound=BaseModel)
@@ -74,4 +75,447 @@ def safe_json_parser(json_string: str, output_type: Type[T] = None) -> Union[dic
         return None
 
 # 하위 호환성을 위한 별칭
-str_to_json = json_parser 
\ No newline at end of file
+str_to_json = json_parser 
+
+# ---------------------------------------------------------------------------
+# 관대한(tolerant) JSON 복구 파서
+# LLM 출력의 흔한 오류를 추가 모델 호출 없이 프로세스 안에서 바로잡는다.
+# - 코드 블록/앞뒤 설명 문장 제거 (최상위 값이 닫히면 나머지는 무시)
+# - 잘린 문자열/객체/배열 닫기 (완성되지 않은 key, 값은 버림)
+# - 작은따옴표, 따옴표 없는 key, 잘못된 escape, 문자열 안의 제어 문자 / 따옴표
+# - 빠진 쉼표/콜론, 끝에 붙은 쉼표, Python 리터럴(True/False/None)
+# 조각 단위로 feed할 수 있어 스트리밍 응답에도 쓸 수 있다.
+# ---------------------------------------------------------------------------
+_VALID_ESCAPES = set('"\\/bfnrt')
+_HEX_DIGITS = set("0123456789abcdefABCDEF")
+_NUMBER_CHARS = set("+-0123456789.eE")
+_WORD_LITERALS = {
+    "true": "true", "false": "false", "null": "null",
+    "True": "true", "False": "false", "None": "null",
+    "NaN": "null", "Infinity": "null", "undefined": "null",
+}
+_NUMBER_PATTERN = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_KEY_START_PATTERN = re.compile(r"[A-Za-z_$][\w$\-]*\s*:")
+_ARRAY_VALUE_START_PATTERN = re.compile(r"[\"'{\[\-\d]|(?:true|false|null|True|False|None)\b")
+_STRING_RUN_PATTERN = re.compile(r"[^\"'\\\x00-\x1f]+")
+_QUOTED_KEY_PATTERN = re.compile(r"[\"'][^\"'\n]{0,100}[\"']\s*:")
+# 위 패턴들의 앞부분만 들어온 경우 (청크 경계) - 판단을 미루고 입력을 더 기다림
+_KEY_START_PREFIX = re.compile(r"[A-Za-z_$][\w$\-]*\s*")
+_QUOTED_KEY_PREFIX = re.compile(r"[\"'][^\"'\n]{0,100}(?:[\"']\s*)?")
+_ARRAY_WORDS = ("true", "false", "null", "True", "False", "None")
+_THINK_PATTERN = re.compile(r"<think>.*?(?:</think>|$)", re.DOTALL)
+
+
+class JSONRepairParser:
+    """
+    문자 단위 상태 기계로 JSON을 복구하는 증분 파서
+
+    사용법:
+        parser = JSONRepairParser()
+        parser.feed(chunk)        # 여러 번 호출 가능
+        parser.complete           # 최상위 값이 닫혔는지
+        parser.close()            # 복구된 JSON 문자열
+    """
+
+    def __init__(self):
+        self._raw = ""
+        self._pos = 0
+        self._final = False
+        self._out: List[str] = []
+        # 열린 container: [종류('{' / '['), 상태]
+        # 객체 상태: key -> colon -> value -> next / 배열 상태: value -> next
+        self._stack: List[List[str]] = []
+        self._safe: Tuple[int, List[List[str]]] = (0, [])
+        self._started = False
+        self._in_string = False
+        self._quote = '"'
+        self._string_is_key = False
+        self.complete = False
+        self.repairs: List[str] = []
+
+    # -- 입력 ---------------------------------------------------------------
+    def feed(self, chunk: str) -> "JSONRepairParser":
+        if not self.complete:
+            self._raw += chunk
+            self._advance()
+        return self
+
+    def close(self) -> str:
+        """입력 종료 - 잘린 구조를 닫고 복구된 JSON 문자열 반환"""
+        if not self._final:
+            self._final = True
+            self._advance()
+            self._finish()
+        return "".join(self._out)
+
+    def snapshot(self) -> str:
+        """지금까지 받은 입력만으로 복구한 JSON (파서 상태는 유지)"""
+        return copy.deepcopy(self).close()
+
+    # -- 내부 ---------------------------------------------------------------
+    def _repair(self, note: str) -> None:
+        self.repairs.append(note)
+
+    def _mark_safe(self) -> None:
+        self._safe = (len(self._out), [frame[:] for frame in self._stack])
+
+    def _rollback(self) -> None:
+        length, stack = self._safe
+        del self._out[length:]
+        self._stack = [frame[:] for frame in stack]
+        self._in_string = False
+        self._repair("rollback incomplete token")
+
+    def _value_done(self) -> None:
+        if not self._stack:
+            self.complete = True
+        else:
+            self._stack[-1][1] = "next"
+        self._mark_safe()
+
+    def _skip_ws(self, i: int) -> int:
+        raw = self._raw
+        while i < len(raw) and raw[i].isspace():
+            i += 1
+        return i
+
+    def _advance(self) -> None:
+        raw = self._raw
+        while self._pos < len(raw) and not self.complete:
+            if self._in_string:
+                if not self._string_step():
+                    return
+                continue
+            ch = raw[self._pos]
+            if not self._started:
+                if ch in "{[":
+                    self._started = True
+                else:
+                    self._pos += 1
+                    continue
+            if ch.isspace():
+                self._pos += 1
+                continue
+            if not self._structure_step(ch):
+                return
+
+    def _structure_step(self, ch: str) -> bool:
+        """문자열 밖의 문자 하나(또는 단어/숫자 하나) 처리, 입력이 더 필요하면 False"""
+        frame = self._stack[-1] if self._stack else None
+        state = frame[1] if frame else "value"
+
+        if ch in "}]":
+            closing = "{" if ch == "}" else "["
+            if frame is None:
+                self._pos += 1
+                return True
+            if frame[0] != closing:
+                # 짝이 맞지 않는 괄호는 현재 container를 닫는 것으로 간주
+                self._repair(f"mismatched {ch}")
+                ch = "}" if frame[0] == "{" else "]"
+            if state in ("colon", "value") and frame[0] == "{":
+                self._rollback()
+            elif self._out and self._out[-1] == ",":
+                self._out.pop()
+                self._repair("trailing comma")
+            self._out.append(ch)
+            self._stack.pop()
+            self._pos += 1
+            self._value_done()
+            return True
+
+        if ch == ",":
+            self._pos += 1
+            if state == "next":
+                self._out.append(",")
+                frame[1] = "key" if frame[0] == "{" else "value"
+            else:
+                self._repair("stray comma")
+            return True
+
+        if ch == ":":
+            self._pos += 1
+            if state == "colon":
+                self._out.append(":")
+                frame[1] = "value"
+            else:
+                self._repair("stray colon")
+            return True
+
+        # 값 또는 key의 시작
+        if state == "next":
+            self._out.append(",")
+            frame[1] = "key" if frame[0] == "{" else "value"
+            state = frame[1]
+            self._repair("missing comma")
+        if state == "colon":
+            self._out.append(":")
+            frame[1] = state = "value"
+            self._repair("missing colon")
+
+        if state == "key":
+            if ch in "\"'":
+                self._start_string(ch, is_key=True)
+                return True
+            match = re.match(r"[A-Za-z_$][\w$\-]*", self._raw[self._pos:])
+            if match is None:
+                self._repair(f"skip {ch!r}")
+                self._pos += 1
+                return True
+            if match.end() + self._pos == len(self._raw) and not self._final:
+                return False
+            self._out.append(json.dumps(match.group()))
+            self._pos += match.end()
+            frame[1] = "colon"
+            self._repair("unquoted key")
+            return True
+
+        # state == "value"
+        if ch in "{[":
+            self._out.append(ch)
+            self._stack.append([ch, "key" if ch == "{" else "value"])
+            self._pos += 1
+            self._mark_safe()
+            return True
+        if ch in "\"'":
+            self._start_string(ch, is_key=False)
+            return True
+        return self._scalar_step()
+
+    def _scalar_step(self) -> bool:
+        """숫자 / 리터럴 / 따옴표 없는 문자열"""
+        raw = self._raw
+        end = self._pos
+        if raw[end] in _NUMBER_CHARS:
+            while end < len(raw) and raw[end] in _NUMBER_CHARS:
+                end += 1
+            if end == len(raw) and not self._final:
+                return False
+            token = raw[self._pos:end]
+            match = _NUMBER_PATTERN.match(token.lstrip("+"))
+            if match is None:
+                self._pos = end
+                self._repair(f"bad number {token!r}")
+                return True
+            self._out.append(match.group())
+            self._pos = end
+            self._value_done()
+            return True
+
+        while end < len(raw) and raw[end] not in ",}]\n":
+            end += 1
+        if end == len(raw) and not self._final:
+            return False
+        token = raw[self._pos:end].strip()
+        self._pos = end
+        if token in _WORD_LITERALS:
+            self._out.append(_WORD_LITERALS[token])
+        else:
+            self._out.append(json.dumps(token, ensure_ascii=False))
+            self._repair("unquoted string")
+        self._value_done()
+        return True
+
+    def _start_string(self, quote: str, is_key: bool) -> None:
+        if quote != '"':
+            self._repair("single quotes")
+        self._in_string = True
+        self._quote = quote
+        self._string_is_key = is_key
+        self._out.append('"')
+        self._pos += 1
+
+    def _is_closing_quote(self, i: int) -> Optional[bool]:
+        """i 위치의 따옴표가 문자열을 닫는지 (판단에 입력이 더 필요하면 None)"""
+        raw = self._raw
+        j = self._skip_ws(i + 1)
+        if j == len(raw):
+            return True if self._final else None
+        c = raw[j]
+        if self._string_is_key:
+            return c == ":"
+        if c in "}]":
+            return True
+        in_object = bool(self._stack) and self._stack[-1][0] == "{"
+        if in_object and c in "\"'":
+            # 쉼표 없이 다음 key가 이어지는 경우: "값" "key": ...
+            if _QUOTED_KEY_PATTERN.match(raw, j) is not None:
+                return True
+            return None if self._partial(_QUOTED_KEY_PREFIX, j) else False
+        if c == ",":
+            k = self._skip_ws(j + 1)
+            if k == len(raw):
+                return True if self._final else None
+            if in_object:
+                if raw[k] in "\"'}" or _KEY_START_PATTERN.match(raw, k) is not None:
+                    return True
+                return None if self._partial(_KEY_START_PREFIX, k) else False
+            if raw[k] == "]" or _ARRAY_VALUE_START_PATTERN.match(raw, k) is not None:
+                return True
+            if not self._final and any(word.startswith(raw[k:]) for word in _ARRAY_WORDS):
+                return None
+            return False
+        return False
+
+    def _partial(self, prefix: "re.Pattern", i: int) -> bool:
+        """i부터 입력 끝까지가 아직 덜 들어온 패턴의 앞부분일 수 있는지"""
+        return not self._final and prefix.fullmatch(self._raw, i) is not None
+
+    def _string_step(self) -> bool:
+        raw = self._raw
+        # 특수 문자가 없는 구간은 한 번에 복사
+        run = _STRING_RUN_PATTERN.match(raw, self._pos)
+        if run is not None:
+            self._out.append(run.group())
+            self._pos = run.end()
+            return True
+        ch = raw[self._pos]
+        if ch == self._quote:
+            closing = self._is_closing_quote(self._pos)
+            if closing is None:
+                return False
+            self._pos += 1
+            if closing:
+                self._out.append('"')
+                self._in_string = False
+                if self._string_is_key:
+                    self._stack[-1][1] = "colon"
+                else:
+                    self._value_done()
+            else:
+                self._out.append('\\"' if ch == '"' else ch)
+                self._repair("unescaped quote")
+            return True
+        if ch == "\\":
+            if self._pos + 1 >= len(raw):
+                if not self._final:
+                    return False
+                self._out.append("\\\\")
+                self._pos += 1
+                return True
+            nxt = raw[self._pos + 1]
+            if nxt in _VALID_ESCAPES:
+                self._out.append("\\" + nxt)
+                self._pos += 2
+            elif nxt == "u":
+                digits = raw[self._pos + 2:self._pos + 6]
+                if len(digits) < 4 and not self._final:
+                    return False
+                if len(digits) == 4 and set(digits) <= _HEX_DIGITS:
+                    self._out.append("\\u" + digits)
+                    self._pos += 6
+                else:
+                    self._out.append("\\\\")
+                    self._pos += 1
+                    self._repair("bad unicode escape")
+            elif nxt == "'":
+                self._out.append("'")
+                self._pos += 2
+            else:
+                # 알 수 없는 escape는 역슬래시 자체를 문자로 취급
+                self._out.append("\\\\")
+                self._pos += 1
+                self._repair("bad escape")
+            return True
+        if ch == '"':
+            self._out.append('\\"')
+        elif ch < " ":
+            self._out.append(json.dumps(ch)[1:-1])
+        else:
+            self._out.append(ch)
+        self._pos += 1
+        return True
+
+    def _finish(self) -> None:
+        if not self._started:
+            return
+        if self._in_string:
+            if self._string_is_key:
+                self._rollback()
+            else:
+                self._out.append('"')
+                self._in_string = False
+                self._value_done()
+                self._repair("unterminated string")
+        if self._stack and self._stack[-1][1] not in ("next",) and self._safe[0] != len(self._out):
+            # 값을 기다리던 중에 끝남 (key만 있거나 콜론 뒤에서 잘림)
+            self._rollback()
+        if self._out and self._out[-1] == ",":
+            self._out.pop()
+        while self._stack:
+            kind, _ = self._stack.pop()
+            self._out.append("}" if kind == "{" else "]")
+            self._repair("close truncated " + kind)
+        self.complete = True
+
+
+def repair_json(text: str) -> str:
+    """잘못된 JSON 텍스트를 복구한 JSON 문자열로 변환 (시작 괄호가 없으면 ValueError)"""
+    repaired = JSONRepairParser().feed(text).close()
+    if not repaired:
+        raise ValueError(f"JSON 시작 괄호를 찾을 수 없습니다: {text[:80]!r}")
+    return repaired
+
+
+def _drop_last_item(value: Any) -> bool:
+    """마지막 값 경로에서 가장 깊은 배열의 마지막 원소 제거 (잘린 원소 제거용)"""
+    if isinstance(value, dict) and value:
+        if _drop_last_item(value[next(reversed(value))]):
+            return True
+    elif isinstance(value, list) and value:
+        if _drop_last_item(value[-1]):
+            return True
+        value.pop()
+        return True
+    return False
+
+
+def _validate(parsed: Any, output_type: Optional[Type[T]], truncated: bool) -> Union[Any, T]:
+    """pydantic 검증 - 잘린 출력이면 마지막 원소를 하나씩 버려가며 재시도"""
+    if output_type is None:
+        return parsed
+    try:
+        return output_type.model_validate(parsed)
+    except ValidationError:
+        if not truncated:
+            raise
+    for _ in range(3):
+        if not _drop_last_item(parsed):
+            break
+        try:
+            return output_type.model_validate(parsed)
+        except ValidationError:
+            continue
+    return output_type.model_validate(parsed)
+
+
+def _candidate_starts(text: str, limit: int = 5) -> List[int]:
+    """JSON이 시작될 수 있는 위치 ({ 또는 [) - 앞쪽 설명 문장에 괄호가 섞인 경우 대비"""
+    starts = [i for i, ch in enumerate(text) if ch in "{["]
+    return starts[:limit]
+
+
+def tolerant_parser(json_string: str, output_type: Optional[Type[T]] = None) -> Union[Any, T]:
+    """
+    관대한 JSON 파싱
+    1) 코드 블록만 벗겨서 json.loads (정상 출력은 여기서 끝남)
+    2) 실패하면 JSONRepairParser로 복구 후 파싱
+    output_type이 주어지면 pydantic 검증까지 통과한 첫 후보를 반환한다.
+    """
+    # reasoning 모델의 <think> 블록 제거
+    stripped = _THINK_PATTERN.sub("", json_string)
+    stripped = re.sub(r"^```(?:json)?\s*|\s*```$", "", stripped.strip())
+    last_error: Optional[Exception] = None
+    try:
+        return _validate(json.loads(stripped), output_type, truncated=False)
+    except (json.JSONDecodeError, ValidationError) as e:
+        last_error = e
+
+    for start in _candidate_starts(stripped):
+        parser = JSONRepairParser().feed(stripped[start:])
+        truncated = not parser.complete
+        try:
+            return _validate(json.loads(parser.close()), output_type, truncated)
+        except (json.JSONDecodeError, ValidationError, ValueError) as e:
+            last_error = e
+    raise last_error
@@ -0,0 +1,147 @@
+"""
+프롬프트 템플릿 레지스트리
+모든 stage가 공유하는 Jinja Environment 하나에서 app/llm/prompts의 템플릿을
+서버 시작 시 한 번 컴파일해 두고, 요청마다는 render만 한다.
+
+- 컴파일 결과는 bytecode cache(PROMPT_CACHE_DIR)에 저장해 재시작 시 재사용
+  (캐시 폴더는 load()에서 만들고, 만들 수 없으면(읽기 전용 배포 등) bytecode cache 없이 동작)
+- 파일명의 날짜 접미사(doc_summary_250828.jinja -> "250828")를 버전으로 사용,
+  같은 이름의 여러 버전이 있으면 latest()로 최신 버전 조회
+- 템플릿의 고정 텍스트(변수 제외) 토큰 수를 미리 계산 (프롬프트 예산 계산용)
+- stage가 등록한 템플릿이 없으면 load()에서 바로 실패 (PROMPT_STRICT=false면 경고만)
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, nodes
+
+from app.llm.chunking import count_tokens
+
+
+LLM_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT_DIR = os.path.join(LLM_DIR, "prompts")
+PROMPT_CACHE_DIR = os.getenv("PROMPT_CACHE_DIR", ".cache/jinja")
+PROMPT_STRICT = os.getenv("PROMPT_STRICT", "true").lower() in ("1", "true", "yes")
+
+# doc_summary_250828.jinja -> ("doc_summary", "250828")
+_VERSIONED_NAME = re.compile(r"^(?P<base>.+?)_(?P<version>\d{6})\.jinja$")
+
+
+class MissingPromptError(RuntimeError):
+    """등록된 프롬프트 템플릿 파일이 없음"""
+
+
+@dataclass
+class PromptTemplate:
+    """컴파일된 템플릿 하나"""
+    name: str  # loader 기준 경로 (예: prompts/doc_summary_250828.jinja)
+    base: str
+    version: Optional[str]
+    template: Optional[Template] = None
+    static_tokens: int = 0
+    variables: List[str] = field(default_factory=list)
+
+    def render(self, **context: Any) -> str:
+        if self.template is None:
+            # 시작 시 load()를 거치지 않은 경우 (스크립트 등) 최초 사용 시 컴파일
+            prompt_registry.compile(self)
+        return self.template.render(**context)
+
+
+class PromptRegistry:
+    def __init__(self, prompt_dir: str = PROMPT_DIR, cache_dir: Optional[str] = PROMPT_CACHE_DIR):
+        self.prompt_dir = prompt_dir
+        self.cache_dir = cache_dir
+        # 템플릿 이름은 기존 코드와 같이 app/llm 기준 (prompts/xxx.jinja)
+        # import 시에는 파일시스템에 쓰지 않음 - bytecode cache는 load()에서 연결
+        self.env = Environment(
+            loader=FileSystemLoader(os.path.dirname(prompt_dir)),
+            auto_reload=False,
+        )
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._required: List[str] = []
+
+    @staticmethod
+    def _split_name(name: str):
+        match = _VERSIONED_NAME.match(os.path.basename(name))
+        if match is None:
+            return os.path.basename(name).rsplit(".", 1)[0], None
+        return match.group("base"), match.group("version")
+
+    def _entry(self, name: str) -> PromptTemplate:
+        entry = self._templates.get(name)
+        if entry is None:
+            base, version = self._split_name(name)
+            entry = self._templates[name] = PromptTemplate(name=name, base=base, version=version)
+        return entry
+
+    def register(self, name: str) -> PromptTemplate:
+        """stage 모듈에서 import 시 호출 - 사용할 템플릿을 선언 (load()에서 존재 확인)"""
+        if name not in self._required:
+            self._required.append(name)
+        return self._entry(name)
+
+    def compile(self, entry: PromptTemplate) -> PromptTemplate:
+        source, _, _ = self.env.loader.get_source(self.env, entry.name)
+        ast = self.env.parse(source)
+        # 고정 텍스트만의 토큰 수 (변수 / 제어문 제외)
+        entry.static_tokens = sum(count_tokens(node.data) for node in ast.find_all(nodes.TemplateData))
+        entry.variables = sorted({node.name for node in ast.find_all(nodes.Name) if node.ctx == "load"})
+        entry.template = self.env.get_template(entry.name)
+        return entry
+
+    def _enable_bytecode_cache(self) -> None:
+        if not self.cache_dir or self.env.bytecode_cache is not None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"⚠️ [prompts] bytecode cache 폴더를 만들 수 없어 캐시 없이 컴파일: {e}")
+            return
+        self.env.bytecode_cache = FileSystemBytecodeCache(self.cache_dir)
+
+    def load(self) -> None:
+        """
+        서버 시작 시 호출 - prompts 폴더의 모든 템플릿을 컴파일하고
+        등록된 템플릿이 빠져 있으면 MissingPromptError
+        """
+        self._enable_bytecode_cache()
+        if os.path.isdir(self.prompt_dir):
+            prefix = os.path.basename(self.prompt_dir)
+            for filename in sorted(os.listdir(self.prompt_dir)):
+                if filename.endswith(".jinja"):
+                    self.compile(self._entry(f"{prefix}/{filename}"))
+
+        missing = [name for name in self._required if self._templates[name].template is None]
+        if missing:
+            message = f"프롬프트 템플릿이 없습니다 ({self.prompt_dir}): {', '.join(missing)}"
+            if PROMPT_STRICT:
+                raise MissingPromptError(message)
+            print(f"⚠️ [prompts] {message}")
+        print(f"🧩 [prompts] 템플릿 {sum(t.template is not None for t in self._templates.values())}개 컴파일 완료")
+
+    def get(self, name: str) -> PromptTemplate:
+        entry = self._entry(name)
+        if entry.template is None:
+            self.compile(entry)
+        return entry
+
+    def latest(self, base: str) -> PromptTemplate:
+        """같은 이름의 템플릿 중 가장 최근 날짜 버전"""
+        candidates = [t for t in self._templates.values() if t.base == base and t.template is not None]
+        if not candidates:
+            raise MissingPromptError(f"프롬프트 템플릿이 없습니다: {base}")
+        return max(candidates, key=lambda t: t.version or "")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {"version": t.version, "static_tokens": t.static_tokens, "variables": t.variables}
+            for name, t in self._templates.items()
+            if t.template is not None
+        }
+
+
+# 프로세스 전역 프롬프트 레지스트리
+prompt_registry = PromptRegistry()
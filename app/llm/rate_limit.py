@@ -0,0 +1,182 @@
+"""
+LLM 호출 rate limiter
+모델 별 / provider 별 token bucket으로 분당 요청 수(RPM)와 분당 토큰 수(TPM)를 제한
+
+- 진행 중인 모든 요청이 공유하는 프로세스 전역 limiter
+- 토큰 추정치: prompt 길이 + max_tokens (호출 후 실제 사용량으로 정산)
+- 대기자는 FIFO 순서로 처리, 대기 시간 초과 시 RateLimitTimeout
+
+설정 (환경변수 LLM_RATE_LIMITS, JSON):
+    {
+        "google/gemma-3-27b-it": {"rpm": 60, "tpm": 200000},
+        "provider:openai": {"rpm": 300}
+    }
+키가 없는 모델/provider는 LLM_DEFAULT_RPM / LLM_DEFAULT_TPM을 사용 (0이면 무제한)
+"""
+import os
+import json
+import time
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", "0"))
+LLM_DEFAULT_TPM = float(os.getenv("LLM_DEFAULT_TPM", "0"))
+LLM_RATE_LIMIT_TIMEOUT = float(os.getenv("LLM_RATE_LIMIT_TIMEOUT", "60"))
+RATE_LIMITS: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+
+
+class RateLimitTimeout(Exception):
+    """rate limit 대기 시간 초과"""
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    토큰 수 대략 추정 (UTF-8 바이트 / 3)
+    한글 1음절(3바이트) ≈ 1토큰, 영문은 약간 과대 추정 (보수적)
+    """
+    if not text:
+        return 0
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+class TokenBucket:
+    """분당 rate로 채워지는 bucket (용량 = 1분치)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """amount를 꺼내기까지 기다려야 하는 시간 (0이면 즉시 가능)"""
+        self._refill()
+        # 용량보다 큰 요청은 가득 찼을 때 통과시킨다 (영원히 막히지 않도록)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Limiter:
+    """하나의 키(모델 또는 provider)에 대한 RPM/TPM bucket 쌍"""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        # asyncio.Lock은 대기 순서대로(FIFO) 획득된다
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+
+    async def acquire(self, tokens: int) -> None:
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    wait = max(
+                        self.requests.wait_time(1) if self.requests else 0.0,
+                        self.tokens.wait_time(tokens) if self.tokens else 0.0,
+                    )
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(tokens)
+        finally:
+            self.waiting -= 1
+
+    def refund(self, requests: int, tokens: int) -> None:
+        if self.requests and requests:
+            self.requests.refund(requests)
+        if self.tokens and tokens:
+            self.tokens.refund(tokens)
+
+
+class Reservation:
+    """획득한 rate limit 몫 - 호출 후 실제 토큰 사용량으로 정산"""
+
+    def __init__(self, limiters: List[_Limiter], estimated_tokens: int):
+        self._limiters = limiters
+        self.estimated_tokens = estimated_tokens
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        """추정치보다 적게 쓴 토큰은 bucket에 되돌림"""
+        if actual_tokens is None or actual_tokens >= self.estimated_tokens:
+            return
+        for limiter in self._limiters:
+            limiter.refund(0, self.estimated_tokens - actual_tokens)
+
+
+class RateLimiter:
+    """모델 별 + provider 별 limiter 레지스트리"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        default_rpm: float = LLM_DEFAULT_RPM,
+        default_tpm: float = LLM_DEFAULT_TPM,
+        timeout: float = LLM_RATE_LIMIT_TIMEOUT,
+    ):
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.timeout = timeout
+        self._limiters: Dict[str, Optional[_Limiter]] = {}
+        self.timeouts: Dict[str, int] = {}  # 키 별 대기 시간 초과 횟수
+
+    def _get(self, key: str) -> Optional[_Limiter]:
+        if key not in self._limiters:
+            config = self.limits.get(key, {})
+            rpm = config.get("rpm", self.default_rpm)
+            tpm = config.get("tpm", self.default_tpm)
+            self._limiters[key] = _Limiter(rpm, tpm) if (rpm > 0 or tpm > 0) else None
+        return self._limiters[key]
+
+    @staticmethod
+    def keys_for(model_name: str) -> Tuple[str, str]:
+        """(provider 키, 모델 키) - "google/gemma-3-27b-it" -> ("provider:google", 모델명)"""
+        provider = model_name.split("/", 1)[0] if "/" in model_name else model_name
+        return f"provider:{provider}", model_name
+
+    async def acquire(self, model_name: str, tokens: int, timeout: Optional[float] = None) -> Reservation:
+        """provider -> 모델 순서로 몫을 획득 (시간 초과 시 이미 획득한 몫은 반환)"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        acquired: List[_Limiter] = []
+        for key in self.keys_for(model_name):
+            limiter = self._get(key)
+            if limiter is None:
+                continue
+            try:
+                await asyncio.wait_for(limiter.acquire(tokens), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                for held in acquired:
+                    held.refund(1, tokens)
+                self.timeouts[key] = self.timeouts.get(key, 0) + 1
+                raise RateLimitTimeout(f"rate limit 대기 시간 초과: {key} ({timeout:g}s)")
+            acquired.append(limiter)
+        return Reservation(acquired, tokens)
+
+    def stats(self) -> Dict[str, int]:
+        """키 별 대기 중인 요청 수"""
+        return {key: limiter.waiting for key, limiter in self._limiters.items() if limiter is not None}
+
+
+# 프로세스 전역 rate limiter
+rate_limiter = RateLimiter()
@@ -0,0 +1,351 @@
+"""
+Prometheus 지표
+/metrics 엔드포인트에서 노출 (main.py)
+
+- stage 별 실행 시간 (scheduler stage + question_merging, send_to_db)
+- 모델 별 LLM 호출 시간 / 토큰 사용량 / 추정 비용 (pydantic-ai usage 기준)
+- 검색 backend 별 지연 시간 / 오류
+- 진행 중인 HTTP 요청, LLM 호출, 대기 중인 job 수
+- 각 모듈이 stats()로 집계하는 값 (scrape 시점에 읽음 - ComponentStatsCollector)
+  LLM 캐시 / 검색 캐시 / 요약 캐시 적중, circuit breaker 상태와 재시도, rate limit 대기,
+  DB write-behind 버퍼, tracing 내보내기
+
+추정 비용은 모델 별 100만 토큰당 USD 단가로 계산 (환경변수 LLM_PRICES, JSON으로 덮어쓰기)
+    {"google/gemma-3-27b-it": {"input": 0.09, "output": 0.17}}
+"""
+import os
+import json
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+# 대략적인 기본 단가 (USD / 1M tokens) - 실제 청구 단가는 LLM_PRICES로 맞출 것
+DEFAULT_LLM_PRICES: Dict[str, Dict[str, float]] = {
+    "google/gemma-3-27b-it": {"input": 0.09, "output": 0.17},
+    "google/gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40},
+    "deepseek/deepseek-r1-0528-qwen3-8b": {"input": 0.02, "output": 0.10},
+    "openai/gpt-4.1-mini": {"input": 0.40, "output": 1.60},
+}
+LLM_PRICES: Dict[str, Dict[str, float]] = {**DEFAULT_LLM_PRICES, **json.loads(os.getenv("LLM_PRICES", "{}"))}
+
+# LLM / stage는 수 초 ~ 수십 초, 검색은 수백 ms ~ 수 초
+_SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+_FAST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15)
+
+registry = CollectorRegistry()
+
+STAGE_DURATION = Histogram(
+    "pagelink_stage_duration_seconds", "파이프라인 stage 실행 시간",
+    ["stage", "status"], buckets=_SLOW_BUCKETS, registry=registry,
+)
+LLM_DURATION = Histogram(
+    "pagelink_llm_request_duration_seconds", "LLM 호출 시간",
+    ["model", "status"], buckets=_SLOW_BUCKETS, registry=registry,
+)
+LLM_TOKENS = Counter(
+    "pagelink_llm_tokens_total", "LLM 토큰 사용량",
+    ["model", "kind"], registry=registry,
+)
+LLM_COST = Counter(
+    "pagelink_llm_cost_usd_total", "LLM 추정 비용 (USD)",
+    ["model"], registry=registry,
+)
+LLM_CACHE_HITS = Counter(
+    "pagelink_llm_cache_hits_total", "LLM 응답 캐시 적중",
+    ["stage"], registry=registry,
+)
+LLM_IN_FLIGHT = Gauge(
+    "pagelink_llm_in_flight", "진행 중인 LLM 호출",
+    ["model"], registry=registry,
+)
+SEARCH_DURATION = Histogram(
+    "pagelink_search_duration_seconds", "검색 backend 호출 시간",
+    ["backend", "status"], buckets=_FAST_BUCKETS, registry=registry,
+)
+SEARCH_ERRORS = Counter(
+    "pagelink_search_errors_total", "검색 backend 오류",
+    ["backend", "error"], registry=registry,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "pagelink_http_requests_in_flight", "처리 중인 HTTP 요청",
+    ["path"], registry=registry,
+)
+HTTP_DURATION = Histogram(
+    "pagelink_http_request_duration_seconds", "HTTP 요청 처리 시간",
+    ["path", "method", "status"], buckets=_SLOW_BUCKETS, registry=registry,
+)
+JOBS_QUEUED = Gauge(
+    "pagelink_jobs_queued", "대기 중인 비동기 job 수", registry=registry,
+)
+
+
+def usage_tokens(usage: Any) -> Tuple[int, int]:
+    """pydantic-ai usage에서 (입력, 출력) 토큰 수 (버전에 따라 필드명이 다름)"""
+    if usage is None:
+        return 0, 0
+    usage = usage() if callable(usage) else usage
+    if usage is None:
+        return 0, 0
+    input_tokens = getattr(usage, "input_tokens", None) or getattr(usage, "request_tokens", None) or 0
+    output_tokens = getattr(usage, "output_tokens", None) or getattr(usage, "response_tokens", None) or 0
+    return int(input_tokens), int(output_tokens)
+
+
+def estimate_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    price = LLM_PRICES.get(model_name)
+    if price is None:
+        return 0.0
+    return (input_tokens * price.get("input", 0.0) + output_tokens * price.get("output", 0.0)) / 1_000_000
+
+
+def record_llm_usage(model_name: str, usage: Any) -> None:
+    input_tokens, output_tokens = usage_tokens(usage)
+    LLM_TOKENS.labels(model_name, "input").inc(input_tokens)
+    LLM_TOKENS.labels(model_name, "output").inc(output_tokens)
+    LLM_COST.labels(model_name).inc(estimate_cost(model_name, input_tokens, output_tokens))
+
+
+@contextmanager
+def track_llm_call(model_name: str):
+    """LLM 호출 1회의 시간 / 진행 중 gauge 기록"""
+    in_flight = LLM_IN_FLIGHT.labels(model_name)
+    in_flight.inc()
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    except asyncio.CancelledError:
+        # hedging에서 진 요청 등은 오류와 구분
+        status = "cancelled"
+        raise
+    finally:
+        in_flight.dec()
+        LLM_DURATION.labels(model_name, status).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_search(backend: str):
+    """검색 backend 호출 1회의 시간 / 오류 기록"""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except Exception as e:
+        SEARCH_ERRORS.labels(backend, type(e).__name__).inc()
+        raise
+    finally:
+        SEARCH_DURATION.labels(backend, status).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """stage 실행 시간 기록"""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        STAGE_DURATION.labels(stage, status).observe(time.perf_counter() - start)
+
+
+def observe_stage(stage: str, seconds: float, status: str = "ok") -> None:
+    STAGE_DURATION.labels(stage, status).observe(seconds)
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _counter(name: str, doc: str, labels: Sequence[str] = ()) -> CounterMetricFamily:
+    return CounterMetricFamily(name, doc, labels=list(labels))
+
+
+def _gauge(name: str, doc: str, labels: Sequence[str] = ()) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, doc, labels=list(labels))
+
+
+class ComponentStatsCollector:
+    """
+    다른 모듈의 stats() 값을 scrape 시점에 읽어 지표로 노출
+    해당 모듈들이 이 모듈을 import하므로 순환을 피하려 collect 안에서 import 한다.
+    """
+
+    def describe(self) -> List[Any]:
+        return []
+
+    def collect(self) -> Iterator[Any]:
+        yield from self._llm_cache()
+        yield from self._hedging()
+        yield from self._singleflight()
+        yield from self._resilience()
+        yield from self._rate_limit()
+        yield from self._caches()
+        yield from self._db()
+        yield from self._vector_index()
+        yield from self._tracing()
+
+    @staticmethod
+    def _llm_cache() -> Iterator[Any]:
+        from app.llm.cache import llm_cache
+
+        lookups = _counter("pagelink_llm_cache_lookups", "LLM 응답 캐시 조회 (result: memory_hit / disk_hit / miss)", ["stage", "result"])
+        for stage, counts in llm_cache.stats().items():
+            for result, value in counts.items():
+                lookups.add_metric([stage, result], value)
+        yield lookups
+        evictions = _counter("pagelink_llm_cache_evictions", "LLM 응답 캐시 메모리 LRU 제거")
+        evictions.add_metric([], llm_cache.evictions)
+        yield evictions
+        items = _gauge("pagelink_llm_cache_memory_items", "LLM 응답 캐시 메모리 항목 수")
+        items.add_metric([], len(llm_cache))
+        yield items
+
+    @staticmethod
+    def _hedging() -> Iterator[Any]:
+        from app.llm.hedging import hedger
+
+        stats = hedger.stats()
+        calls = _counter("pagelink_llm_hedge_calls", "hedging을 거친 LLM 호출", ["model"])
+        hedged = _counter("pagelink_llm_hedged", "backup 요청을 보낸 호출", ["model"])
+        wins = _counter("pagelink_llm_hedge_wins", "hedge한 호출에서 먼저 성공한 쪽 (winner: backup / primary)", ["model", "winner"])
+        extra = _counter("pagelink_llm_hedge_extra_seconds", "hedge로 생긴 중복 요청 중 결과를 쓰지 않은 쪽의 실행 시간", ["model"])
+        delay = _gauge("pagelink_llm_hedge_delay_seconds", "현재 backup 요청 기준 지연 시간 (표본이 부족하면 없음)", ["model"])
+        for model, model_stats in stats["models"].items():
+            calls.add_metric([model], model_stats["calls"])
+            hedged.add_metric([model], model_stats["hedged"])
+            wins.add_metric([model, "backup"], model_stats["hedge_wins"])
+            wins.add_metric([model, "primary"], model_stats["primary_wins"])
+            extra.add_metric([model], model_stats["extra_seconds"])
+            model_delay = hedger.hedge_delay(model)
+            if model_delay is not None:
+                delay.add_metric([model], model_delay)
+        rate = _gauge("pagelink_llm_hedge_rate", "최근 호출 중 hedge 비율")
+        rate.add_metric([], stats["hedge_rate"])
+        yield from (calls, hedged, wins, extra, delay, rate)
+
+    @staticmethod
+    def _singleflight() -> Iterator[Any]:
+        from app.singleflight import all_stats
+
+        calls = _counter("pagelink_singleflight_calls", "실제로 실행된 호출", ["name"])
+        shared = _counter("pagelink_singleflight_shared", "진행 중인 같은 호출에 합류해 절약된 호출", ["name"])
+        in_flight = _gauge("pagelink_singleflight_in_flight", "진행 중인 병합 대상 호출", ["name"])
+        for name, stats in all_stats().items():
+            calls.add_metric([name], stats["calls"])
+            shared.add_metric([name], stats["shared"])
+            in_flight.add_metric([name], stats["in_flight"])
+        yield from (calls, shared, in_flight)
+
+    @staticmethod
+    def _resilience() -> Iterator[Any]:
+        from app import resilience
+
+        state = _gauge("pagelink_circuit_breaker_state", "circuit breaker 상태 (0 closed, 1 half_open, 2 open)", ["endpoint"])
+        failures = _gauge("pagelink_circuit_breaker_failures", "연속 실패 수", ["endpoint"])
+        opens = _counter("pagelink_circuit_breaker_opens", "circuit open 전환 횟수", ["endpoint"])
+        retries = _counter("pagelink_retries", "외부 호출 재시도 횟수", ["endpoint"])
+        for endpoint, breaker in resilience.stats().items():
+            state.add_metric([endpoint], _BREAKER_STATES[breaker["state"]])
+            failures.add_metric([endpoint], breaker["failures"])
+            opens.add_metric([endpoint], breaker["opens"])
+            retries.add_metric([endpoint], breaker["retries"])
+        yield from (state, failures, opens, retries)
+
+    @staticmethod
+    def _rate_limit() -> Iterator[Any]:
+        from app.llm.rate_limit import rate_limiter
+
+        waiting = _gauge("pagelink_rate_limit_waiting", "rate limit 대기 중인 LLM 요청", ["key"])
+        for key, value in rate_limiter.stats().items():
+            waiting.add_metric([key], value)
+        yield waiting
+        timeouts = _counter("pagelink_rate_limit_timeouts", "rate limit 대기 시간 초과", ["key"])
+        for key, value in rate_limiter.timeouts.items():
+            timeouts.add_metric([key], value)
+        yield timeouts
+
+    @staticmethod
+    def _caches() -> Iterator[Any]:
+        from app.db.summary_cache import summary_cache
+        from app.retrieve.api_search.search_cache import search_cache
+
+        lookups = _counter("pagelink_cache_lookups", "검색 / 컬렉션 요약 캐시 조회", ["cache", "result"])
+        size = _gauge("pagelink_cache_items", "캐시 항목 수", ["cache"])
+        for name, stats in (("search", search_cache.stats()), ("summary", summary_cache.stats())):
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            size.add_metric([name], stats["size"])
+        yield from (lookups, size)
+        skipped = _counter("pagelink_summary_cache_skipped_stores", "조회 중 무효화 / flush 중이라 캐시에 넣지 않은 조회")
+        skipped.add_metric([], summary_cache.stats()["skipped_stores"])
+        yield skipped
+
+    @staticmethod
+    def _db() -> Iterator[Any]:
+        from app.db.repository import write_buffer
+
+        stats = write_buffer.stats()
+        rows = _gauge("pagelink_db_buffer_rows", "write-behind 버퍼 행 수 (state: pending / inflight)", ["state"])
+        rows.add_metric(["pending"], stats["pending"])
+        rows.add_metric(["inflight"], stats["inflight"])
+        flushed = _counter("pagelink_db_flushed_rows", "DB에 기록된 행 수")
+        flushed.add_metric([], stats["flushed_rows"])
+        flushes = _counter("pagelink_db_flushes", "write-behind flush 횟수")
+        flushes.add_metric([], stats["flushes"])
+        dead = _counter("pagelink_db_dead_letter_rows", "재시도 횟수를 넘겨 버린 행 수")
+        dead.add_metric([], stats["dead_letters"])
+        yield from (rows, flushed, flushes, dead)
+
+    @staticmethod
+    def _vector_index() -> Iterator[Any]:
+        from app.retrieve.local_search.vector_search import vector_store
+
+        stats = vector_store.index.stats()
+        size = _gauge("pagelink_vector_index_size", "로컬 벡터 인덱스 유효 벡터 수", ["mode"])
+        size.add_metric([stats.mode], stats.size)
+        memory = _gauge("pagelink_vector_index_memory_bytes", "벡터 / 중심점 / 리스트 메모리 사용량")
+        memory.add_metric([], stats.memory_bytes)
+        build = _gauge("pagelink_vector_index_build_seconds", "마지막 IVF 빌드 소요 시간")
+        build.add_metric([], stats.build_seconds)
+        refreshes = _counter("pagelink_vector_index_refreshes", "백그라운드 재임베딩 / IVF 재빌드 횟수")
+        refreshes.add_metric([], vector_store.refreshes)
+        yield from (size, memory, build, refreshes)
+        if stats.recall is not None:
+            recall = _gauge("pagelink_vector_index_recall", "마지막 IVF 빌드 직후 brute force 대비 recall@10")
+            recall.add_metric([], stats.recall)
+            yield recall
+
+    @staticmethod
+    def _tracing() -> Iterator[Any]:
+        from app.tracing import tracer
+
+        stats = tracer.stats()
+        traces = _counter("pagelink_traces", "샘플링된 trace (state: finished / exported)", ["state"])
+        traces.add_metric(["finished"], stats["finished"])
+        traces.add_metric(["exported"], stats["exported"])
+        errors = _counter("pagelink_trace_export_errors", "trace 내보내기 실패")
+        errors.add_metric([], stats["export_errors"])
+        pending = _gauge("pagelink_trace_export_pending", "내보내기 대기 중인 trace")
+        pending.add_metric([], stats["pending"])
+        yield from (traces, errors, pending)
+
+
+registry.register(ComponentStatsCollector())
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """/metrics 응답 본문과 content type"""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,225 @@
+"""
+외부 호출(LLM / 웹 검색) 공통 복원력 계층
+
+- 예외 분류: 일시적 오류(429, 5xx, 연결 오류) / 시간 초과 / 재시도 무의미(4xx, 입력 오류)
+- 일시적 오류는 jitter가 들어간 지수 backoff로 재시도 (429의 Retry-After 존중)
+- 시간 초과는 비용이 크므로 재시도 횟수를 따로 제한
+- endpoint 별 circuit breaker: 연속 실패가 쌓이면 일정 시간 즉시 실패 (죽은 upstream에 돈/시간을 쓰지 않음)
+- stage 별 fallback 모델 체인 (환경변수 LLM_FALLBACK_MODELS, JSON)
+    {"doc_summary": ["google/gemini-2.5-flash-lite"], "expand_collection_query": ["openai/gpt-4.1-mini"]}
+"""
+import os
+import json
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_MAX_TIMEOUT_RETRIES = int(os.getenv("RETRY_MAX_TIMEOUT_RETRIES", "1"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "10"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RECOVERY_TIME = float(os.getenv("BREAKER_RECOVERY_TIME", "30"))
+FALLBACK_MODELS: Dict[str, List[str]] = json.loads(os.getenv("LLM_FALLBACK_MODELS", "{}"))
+
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# 라이브러리를 직접 import하지 않고 클래스 이름으로 분류 (openai, ddgs, pydantic-ai 공통)
+_TIMEOUT_NAMES = {"APITimeoutError", "TimeoutException", "ReadTimeout", "ConnectTimeout"}
+_TRANSIENT_NAMES = {"APIConnectionError", "RatelimitException", "ModelAPIError", "RemoteProtocolError"}
+
+
+class ErrorKind(str, Enum):
+    TRANSIENT = "transient"
+    TIMEOUT = "timeout"
+    FATAL = "fatal"
+
+
+class CircuitOpenError(Exception):
+    """circuit breaker가 열려 있어 호출하지 않음"""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None and isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+    return status if isinstance(status, int) else None
+
+
+def classify(exc: BaseException) -> ErrorKind:
+    """예외를 재시도 관점에서 분류"""
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return ErrorKind.TIMEOUT
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & _TIMEOUT_NAMES:
+        return ErrorKind.TIMEOUT
+    status = _status_code(exc)
+    if status is not None:
+        return ErrorKind.TRANSIENT if status in _RETRYABLE_STATUS else ErrorKind.FATAL
+    if isinstance(exc, httpx.TransportError) or names & _TRANSIENT_NAMES:
+        return ErrorKind.TRANSIENT
+    return ErrorKind.FATAL
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """429 응답의 Retry-After 헤더 (초)"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = RETRY_MAX_ATTEMPTS
+    max_timeout_retries: int = RETRY_MAX_TIMEOUT_RETRIES
+    base_delay: float = RETRY_BASE_DELAY
+    max_delay: float = RETRY_MAX_DELAY
+
+    def backoff(self, attempt: int) -> float:
+        """full jitter 지수 backoff (attempt는 1부터)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    closed -> (연속 실패 threshold회) -> open -> (recovery_time 경과) -> half-open
+    half-open에서는 시험 호출 1개만 허용, 성공하면 closed / 실패하면 다시 open
+
+    before_call()이 돌려준 probe 여부를 결과 보고(record_*/release)에 그대로 넘긴다.
+    시험 호출 자리는 그 시험 호출만 비울 수 있고, open 되기 전에 시작한 호출의
+    늦은 결과는 상태를 바꾸지 않는다.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, recovery_time: float = BREAKER_RECOVERY_TIME):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self.retries = 0  # 이 endpoint에서 재시도한 횟수
+        self.opens = 0  # closed/half-open -> open 전환 횟수
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.recovery_time:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """호출 허용 여부 확인 - 이 호출이 half-open 시험 호출이면 True"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            raise CircuitOpenError(f"circuit open: {self.name}")
+        if state == "half_open":
+            self._probing = True
+            return True
+        return False
+
+    def _open(self) -> None:
+        self.opens += 1
+        self.opened_at = time.monotonic()
+        print(f"🚧 [resilience] circuit open - {self.name} ({self.recovery_time:g}s)")
+
+    def record_success(self, probe: bool = False) -> None:
+        if probe:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+        elif self.opened_at is None:
+            self.failures = 0
+
+    def record_failure(self, probe: bool = False) -> None:
+        if probe:
+            self._probing = False
+            self._open()
+        elif self.opened_at is None:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._open()
+
+    def release(self, probe: bool = False) -> None:
+        """판정 없이 끝난 호출(취소, 입력 오류 등) 정리 - 시험 호출이었으면 자리를 비움"""
+        if probe:
+            self._probing = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        breaker = _breakers[endpoint] = CircuitBreaker(endpoint)
+    return breaker
+
+
+async def call_with_retry(
+    endpoint: str,
+    fn: Callable[[], Awaitable[Any]],
+    policy: Optional[RetryPolicy] = None,
+) -> Any:
+    """
+    endpoint의 circuit breaker를 거쳐 fn()을 호출하고, 분류에 따라 재시도
+    재시도를 소진하거나 재시도 무의미한 오류면 마지막 예외를 그대로 올린다.
+    """
+    policy = policy or RetryPolicy()
+    breaker = get_breaker(endpoint)
+    timeouts = 0
+    for attempt in range(1, policy.max_attempts + 1):
+        probe = breaker.before_call()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.release(probe)
+            raise
+        except Exception as e:
+            kind = classify(e)
+            if kind is ErrorKind.FATAL:
+                breaker.release(probe)
+                raise
+            breaker.record_failure(probe)
+            timeouts += kind is ErrorKind.TIMEOUT
+            if (
+                attempt == policy.max_attempts
+                or breaker.state != "closed"
+                or (kind is ErrorKind.TIMEOUT and timeouts > policy.max_timeout_retries)
+            ):
+                raise
+            delay = _retry_after(e) or policy.backoff(attempt)
+            breaker.retries += 1
+            print(f"🔁 [resilience] {endpoint} {kind.value} 오류, {delay:.2f}s 후 재시도 ({attempt}/{policy.max_attempts}): {e}")
+            await asyncio.sleep(min(delay, policy.max_delay))
+            continue
+        breaker.record_success(probe)
+        return result
+
+
+def fallback_models(stage: Optional[str], model_name: str) -> List[str]:
+    """stage의 모델 체인 (기본 모델 + 설정된 fallback, 중복 제거)"""
+    chain = [model_name] + FALLBACK_MODELS.get(stage or "", [])
+    return list(dict.fromkeys(chain))
+
+
+def should_fallback(exc: BaseException) -> bool:
+    """다음 모델로 넘어갈 만한 오류인지 (입력 자체가 잘못된 경우는 제외)"""
+    return isinstance(exc, CircuitOpenError) or classify(exc) is not ErrorKind.FATAL
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {"state": b.state, "failures": b.failures, "retries": b.retries, "opens": b.opens}
+        for name, b in _breakers.items()
+    }
@@ -1,10 +1,31 @@
 import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from ddgs import DDGS
 from pydantic import BaseModel, Field
 from typing import List
+from app.resilience import call_with_retry
+from app.metrics import track_search
+from app.tracing import span
 load_dotenv()
 
+# DDGS는 동기 API만 제공하므로 전용 스레드 풀에서 실행
+# (기본 executor를 공유하지 않아 검색 폭주가 다른 블로킹 작업을 막지 않음)
+DDGS_MAX_WORKERS = int(os.getenv("DDGS_MAX_WORKERS", "4"))
+_executor = ThreadPoolExecutor(max_workers=DDGS_MAX_WORKERS, thread_name_prefix="ddgs")
+# 스레드 별 DDGS 인스턴스 재사용 (세션 유지)
+_local = threading.local()
+
+
+def _get_ddgs() -> DDGS:
+    ddgs = getattr(_local, "ddgs", None)
+    if ddgs is None:
+        ddgs = DDGS()
+        _local.ddgs = ddgs
+    return ddgs
+
 class SearchResult(BaseModel):
     """자연어 검색 결과를 나타내는 pydantic 모델"""
     urls: List[str] = Field(description="검색 결과로 반환된 URL 목록")
@@ -12,6 +33,7 @@ class SearchResult(BaseModel):
     model: str = Field(description="사용된 AI 모델")
     advanced: bool = Field(description="고급 검색 모드 사용 여부")
     total_results: int = Field(description="반환된 결과 수")
+    kind: str = Field(default="url", description="urls 항목 종류 - url(웹 문서) 또는 local(로컬 인덱스 summary_id)")
 
 class SearchRequest(BaseModel):
     """검색 요청을 나타내는 pydantic 모델"""
@@ -22,7 +44,7 @@ def from_ddgs(query: str, advanced: bool = False) -> SearchResult:
     max_results = 3
     if advanced: max_results = 5
 
-    results = DDGS().text(
+    results = _get_ddgs().text(
         query, 
         max_results=max_results,
         #language="ko",
@@ -34,4 +56,19 @@ def from_ddgs(query: str, advanced: bool = False) -> SearchResult:
         model="ddgs",
         advanced=advanced,
         total_results=len(urls)
-    )
\ No newline at end of file
+    )
+
+
+async def afrom_ddgs(query: str, advanced: bool = False) -> SearchResult:
+    """from_ddgs의 비동기 버전 - 전용 executor에서 실행 (재시도 / circuit breaker 적용)"""
+    loop = asyncio.get_running_loop()
+    with track_search("ddgs"), span("search", backend="ddgs", query=query, advanced=advanced):
+        return await call_with_retry(
+            "search:ddgs",
+            lambda: loop.run_in_executor(_executor, from_ddgs, query, advanced),
+        )
+
+
+def shutdown() -> None:
+    """서버 종료 시 전용 executor 정리"""
+    _executor.shutdown(wait=False, cancel_futures=True)
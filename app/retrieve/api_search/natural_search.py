@@ -1,14 +1,48 @@
 import os
+import asyncio
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
-from pydantic import BaseModel, HttpUrl, Field
+from openai import OpenAI, AsyncOpenAI
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from app.resilience import call_with_retry
+from app.metrics import track_search
+from app.tracing import span
 load_dotenv()
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+# 동시에 보내는 Perplexity 검색 요청 수 상한
+OPENROUTER_SEARCH_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_SEARCH_MAX_CONCURRENCY", "8"))
+
+# 클라이언트는 첫 사용 시 생성 (import 시점에 API 키가 없어도 되도록)
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        _client = OpenAI(base_url=OPENROUTER_BASE_URL, api_key=os.getenv("OPENROUTER_API_KEY"))
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """커넥션 풀을 공유하는 비동기 클라이언트"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            max_retries=0,  # 재시도는 app.resilience에서 처리
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OPENROUTER_SEARCH_MAX_CONCURRENCY * 2,
+                    max_keepalive_connections=OPENROUTER_SEARCH_MAX_CONCURRENCY,
+                ),
+            ),
+        )
+    return _async_client
 
 class SearchResult(BaseModel):
     """자연어 검색 결과를 나타내는 pydantic 모델"""
@@ -17,33 +51,28 @@ class SearchResult(BaseModel):
     model: str = Field(description="사용된 AI 모델")
     advanced: bool = Field(description="고급 검색 모드 사용 여부")
     total_results: int = Field(description="반환된 결과 수")
+    kind: str = Field(default="url", description="urls 항목 종류 - url(웹 문서) 또는 local(로컬 인덱스 summary_id)")
 
 class SearchRequest(BaseModel):
     """검색 요청을 나타내는 pydantic 모델"""
     query: str = Field(description="검색할 쿼리 문자열")
     advanced: bool = Field(default=False, description="고급 검색 모드 사용 여부")
 
-def from_openrouter(query: str, advanced: bool = False) -> SearchResult:
-    model = "perplexity/sonar"
-    if advanced: model += ":online"
-    
-    completion = client.chat.completions.create(
-        extra_body={},
-        model=model,
-        max_tokens=1,
-        messages=[
-            {
-            "role": "user",
-            "content": [
-                    {
-                        "type": "text",
-                        "text": query
-                    },
-                ]
-            }
-        ]
-    )
-    annotations = completion.choices[0].message.annotations
+def _build_messages(query: str) -> list:
+    return [
+        {
+        "role": "user",
+        "content": [
+                {
+                    "type": "text",
+                    "text": query
+                },
+            ]
+        }
+    ]
+
+def _to_search_result(completion, query: str, model: str, advanced: bool) -> SearchResult:
+    annotations = completion.choices[0].message.annotations or []
     urls = [a.url_citation.url for a in annotations]
     return SearchResult(
         urls=urls,
@@ -53,6 +82,47 @@ def from_openrouter(query: str, advanced: bool = False) -> SearchResult:
         total_results=len(urls)
     )
 
+def from_openrouter(query: str, advanced: bool = False) -> SearchResult:
+    model = "perplexity/sonar"
+    if advanced: model += ":online"
+    
+    completion = get_client().chat.completions.create(
+        extra_body={},
+        model=model,
+        max_tokens=1,
+        messages=_build_messages(query),
+    )
+    return _to_search_result(completion, query, model, advanced)
+
+async def afrom_openrouter(query: str, advanced: bool = False) -> SearchResult:
+    """from_openrouter의 비동기 버전 - 동시 요청 수를 제한 (재시도 / circuit breaker 적용)"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(OPENROUTER_SEARCH_MAX_CONCURRENCY)
+
+    model = "perplexity/sonar"
+    if advanced: model += ":online"
+
+    async def create():
+        async with _semaphore:
+            return await get_async_client().chat.completions.create(
+                extra_body={},
+                model=model,
+                max_tokens=1,
+                messages=_build_messages(query),
+            )
+
+    with track_search(model), span("search", backend=model, query=query, advanced=advanced):
+        completion = await call_with_retry(f"search:{model}", create)
+    return _to_search_result(completion, query, model, advanced)
+
+async def aclose() -> None:
+    """서버 종료 시 비동기 클라이언트 정리"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
 """
 Output result example:
 SearchResult(
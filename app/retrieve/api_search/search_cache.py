@@ -0,0 +1,107 @@
+"""
+웹 검색 결과 TTL 캐시
+같은 컬렉션에서 반복되는 쿼리의 외부 호출(DuckDuckGo / OpenRouter)을 줄인다.
+
+- 키: (정규화된 쿼리, 백엔드, advanced)
+- 크기 상한을 넘으면 가장 오래 사용되지 않은 항목부터 제거 (LRU)
+- 빈 결과는 짧은 TTL로 캐싱 (negative caching)
+- 같은 키의 검색이 진행 중이면 합류 (single-flight)
+"""
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.singleflight import SingleFlight
+
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_NEGATIVE_TTL = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "300"))
+SEARCH_CACHE_MAX_ITEMS = int(os.getenv("SEARCH_CACHE_MAX_ITEMS", "2048"))
+
+
+def normalize_query(query: str) -> str:
+    """유니코드 NFC 정규화, 대소문자 통일, 공백 정리"""
+    return " ".join(unicodedata.normalize("NFC", query).casefold().split())
+
+
+class SearchCache:
+    """검색 결과(SearchResult) 캐시"""
+
+    def __init__(
+        self,
+        ttl: float = SEARCH_CACHE_TTL,
+        negative_ttl: float = SEARCH_CACHE_NEGATIVE_TTL,
+        max_items: int = SEARCH_CACHE_MAX_ITEMS,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple[str, str, bool], Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.singleflight = SingleFlight("search")
+
+    @staticmethod
+    def make_key(backend: str, query: str, advanced: bool) -> Tuple[str, str, bool]:
+        return (backend, normalize_query(query), advanced)
+
+    def get(self, backend: str, query: str, advanced: bool) -> Optional[Any]:
+        key = self.make_key(backend, query, advanced)
+        entry = self._items.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, expires_at = entry
+        if expires_at < time.time():
+            del self._items[key]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        # 캐시된 결과의 쿼리 표기는 요청한 쿼리로 맞춰서 반환
+        return result.model_copy(update={"query": query})
+
+    def set(self, backend: str, query: str, advanced: bool, result: Any) -> None:
+        key = self.make_key(backend, query, advanced)
+        ttl = self.ttl if result.urls else self.negative_ttl
+        self._items[key] = (result, time.time() + ttl)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    async def cached(
+        self,
+        backend: str,
+        query: str,
+        advanced: bool,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        캐시에 있으면 반환, 없으면 fetch() 결과를 저장 후 반환 (예외는 캐싱하지 않음)
+        같은 키의 fetch가 진행 중이면 새로 호출하지 않고 그 결과를 함께 기다린다.
+        """
+        result = self.get(backend, query, advanced)
+        if result is not None:
+            return result
+
+        async def fetch_and_store():
+            fetched = await fetch()
+            self.set(backend, query, advanced, fetched)
+            return fetched
+
+        result = await self.singleflight.do(self.make_key(backend, query, advanced), fetch_and_store)
+        return result.model_copy(update={"query": query})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._items),
+            **{f"singleflight_{k}": v for k, v in self.singleflight.stats().items()},
+        }
+
+
+# 프로세스 전역 검색 캐시 (백엔드 공용)
+search_cache = SearchCache()
@@ -0,0 +1,152 @@
+"""
+하이브리드 검색 결과 융합 (Weighted Reciprocal Rank Fusion)
+
+여러 검색기(DDGS 쿼리 여러 개, Perplexity, 로컬 BM25/Vector)의 순위 리스트를
+하나의 순위 리스트로 합친다.
+
+score(item) = Σ_retriever weight(model) / (RRF_K + rank)
+
+- 항목마다 종류(kind)를 유지: url(웹 문서) / local(로컬 인덱스 summary_id)
+  종류가 다르면 같은 문자열이어도 다른 항목으로 취급
+- url 항목만 정규화(스킴/호스트 소문자화, www 제거, 트래킹 파라미터/fragment 제거) 후 중복 제거
+- 점수 누적은 NumPy 벡터 연산, 상위 k 추출은 heap
+"""
+import os
+import heapq
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+
+RRF_K = int(os.getenv("RRF_K", "60"))
+RRF_TOP_K = int(os.getenv("RRF_TOP_K", "20"))
+
+# 검색기(SearchResult.model) 별 가중치 - 접두어 매칭 ("perplexity/sonar:online" -> "perplexity")
+RRF_WEIGHTS: Dict[str, float] = {
+    "ddgs": 1.0,
+    "perplexity": 1.2,
+    "bm25": 0.8,
+    "vector": 0.6,
+}
+
+_TRACKING_PREFIXES = ("utm_",)
+_TRACKING_PARAMS = frozenset({"fbclid", "gclid", "yclid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid"})
+
+
+class FusedResult(BaseModel):
+    """융합된 순위 리스트의 항목 하나"""
+    id: str = Field(description="URL 또는 summary_id (처음 등장한 표기)")
+    kind: str = Field(description="url 또는 local")
+    score: float = Field(description="RRF 점수")
+    sources: List[str] = Field(default_factory=list, description="이 항목을 반환한 검색기(model) 목록")
+
+
+def canonicalize_url(url: str) -> str:
+    """중복 제거용 URL 정규화 (스킴/호스트가 없으면 그대로 반환)"""
+    url = url.strip()
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return url
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not (key.lower().startswith(_TRACKING_PREFIXES) or key.lower() in _TRACKING_PARAMS)
+    ))
+    path = parts.path.rstrip("/") or "/"
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def retriever_weight(model: str, weights: Optional[Dict[str, float]] = None) -> float:
+    weights = weights or RRF_WEIGHTS
+    for prefix, weight in weights.items():
+        if model.startswith(prefix):
+            return weight
+    return 1.0
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[str]],
+    weights: Optional[Sequence[float]] = None,
+    k: int = RRF_K,
+    top_k: int = RRF_TOP_K,
+    kinds: Optional[Sequence[str]] = None,
+    sources: Optional[Sequence[str]] = None,
+) -> List[FusedResult]:
+    """
+    가중 RRF로 여러 순위 리스트를 하나로 합침
+
+    Args:
+        ranked_lists: 검색기 별 순위 리스트 (앞쪽이 상위)
+        weights: 리스트 별 가중치 (없으면 모두 1.0)
+        k: RRF 상수
+        top_k: 반환할 최대 개수
+        kinds: 리스트 별 항목 종류 (없으면 모두 url)
+        sources: 리스트 별 검색기 이름 (FusedResult.sources에 기록)
+
+    Returns:
+        List[FusedResult]: 중복이 제거된 최종 순위 리스트 (각 항목은 처음 등장한 표기를 사용)
+    """
+    if weights is None:
+        weights = [1.0] * len(ranked_lists)
+    if kinds is None:
+        kinds = ["url"] * len(ranked_lists)
+
+    position: Dict[tuple, int] = {}
+    originals: List[tuple] = []
+    item_sources: List[List[str]] = []
+    list_index, item_index, ranks = [], [], []
+    for li, items in enumerate(ranked_lists):
+        kind = kinds[li]
+        seen = set()
+        for rank, item in enumerate(items, start=1):
+            key = (kind, canonicalize_url(item) if kind == "url" else item)
+            # 같은 리스트 안의 중복은 최상위 순위만 반영
+            if key in seen:
+                continue
+            seen.add(key)
+            if key not in position:
+                position[key] = len(originals)
+                originals.append((item, kind))
+                item_sources.append([])
+            if sources is not None and sources[li] not in item_sources[position[key]]:
+                item_sources[position[key]].append(sources[li])
+            list_index.append(li)
+            item_index.append(position[key])
+            ranks.append(rank)
+
+    if not originals:
+        return []
+
+    contributions = np.asarray(weights, dtype=np.float64)[list_index] / (k + np.asarray(ranks, dtype=np.float64))
+    scores = np.bincount(np.asarray(item_index), weights=contributions, minlength=len(originals))
+    # 동점이면 먼저 등장한 항목 우선
+    top = heapq.nlargest(top_k, range(len(originals)), key=lambda i: (scores[i], -i))
+    return [
+        FusedResult(id=originals[i][0], kind=originals[i][1], score=float(scores[i]), sources=item_sources[i])
+        for i in top
+    ]
+
+
+def fuse_search_results(
+    search_results: Sequence,
+    weights: Optional[Dict[str, float]] = None,
+    k: int = RRF_K,
+    top_k: int = RRF_TOP_K,
+) -> List[FusedResult]:
+    """SearchResult 리스트를 검색기 가중치를 반영해 하나의 순위 리스트로 융합 (항목 종류 유지)"""
+    results = [r for r in search_results if r is not None and getattr(r, "urls", None)]
+    return reciprocal_rank_fusion(
+        [r.urls for r in results],
+        [retriever_weight(r.model, weights) for r in results],
+        k=k,
+        top_k=top_k,
+        kinds=[getattr(r, "kind", "url") for r in results],
+        sources=[r.model for r in results],
+    )
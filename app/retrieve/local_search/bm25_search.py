@@ -0,0 +1,119 @@
+"""
+프로세스 내 BM25 역색인
+이미 생성한 데이터(doc_summarized_new, doc_input_question 질문/답변, collection_memo)를
+색인해 웹 검색 없이도 알고 있는 페이지를 찾는다.
+
+- 증분 추가/삭제
+- 질의 시 역색인 posting만 순회하고 heap으로 top-k 추출
+- 문서 metadata(user_id, collection_id) 조건으로 검색 범위 제한
+"""
+import os
+import math
+import heapq
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+from app.retrieve.local_search.tokenizer import tokenize
+
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+
+# 색인 시 저장한 metadata를 받아 검색 대상 여부를 반환하는 조건
+MetadataFilter = Callable[[Dict[str, Any]], bool]
+
+
+class LocalHit(BaseModel):
+    """로컬 검색 결과 한 건"""
+    doc_id: str = Field(description="문서 식별자 (summary_id)")
+    score: float = Field(description="검색 점수")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="색인 시 저장한 부가 정보")
+
+
+class BM25Index:
+    """증분 갱신 가능한 BM25 역색인"""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc_id: tf}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # doc_id -> (문서 길이, term 목록, metadata)
+        self._docs: Dict[str, Tuple[int, Tuple[str, ...], Dict[str, Any]]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """문서 추가 (같은 doc_id가 있으면 교체)"""
+        if doc_id in self._docs:
+            self.delete(doc_id)
+        term_freqs = Counter(tokenize(text))
+        length = sum(term_freqs.values())
+        for term, tf in term_freqs.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._docs[doc_id] = (length, tuple(term_freqs), metadata or {})
+        self._total_length += length
+
+    def delete(self, doc_id: str) -> bool:
+        """문서 삭제"""
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return False
+        length, terms, _ = entry
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_length -= length
+        return True
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        exclude: Iterable[str] = (),
+        where: Optional[MetadataFilter] = None,
+    ) -> List[LocalHit]:
+        """BM25 점수 상위 k개 문서 (where가 있으면 metadata 조건을 만족하는 문서만)"""
+        n_docs = len(self._docs)
+        if n_docs == 0:
+            return []
+        avg_length = self._total_length / n_docs
+        excluded = set(exclude)
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                length = self._docs[doc_id][0]
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(
+            k,
+            (
+                (score, doc_id) for doc_id, score in scores.items()
+                if doc_id not in excluded and (where is None or where(self._docs[doc_id][2]))
+            ),
+        )
+        return [
+            LocalHit(doc_id=doc_id, score=score, metadata=self._docs[doc_id][2])
+            for score, doc_id in top
+        ]
+
+
+# 프로세스 전역 인덱스
+bm25_index = BM25Index()
@@ -0,0 +1,77 @@
+"""
+로컬 임베딩 함수
+외부 API 없이(오프라인) 동작하는 hashing + TF-IDF 벡터라이저
+
+벡터 인덱스는 `Callable[[List[str]], np.ndarray]` 형태의 임베딩 함수를 받으므로
+다른 임베딩 모델로 교체할 수 있다.
+"""
+import copy
+import math
+import hashlib
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from app.retrieve.local_search.tokenizer import tokenize
+
+
+EmbeddingFunction = Callable[[List[str]], np.ndarray]
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(term: str, dim: int) -> Tuple[int, float]:
+    """term -> (차원 인덱스, 부호) - signed hashing으로 충돌 편향 완화"""
+    digest = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+    return digest % dim, (1.0 if (digest >> 63) & 1 else -1.0)
+
+
+class HashingVectorizer:
+    """
+    hashing trick 기반 TF-IDF 벡터라이저
+
+    - 어휘 사전 없이 고정 차원으로 투영 (메모리 일정)
+    - IDF는 partial_fit으로 본 문서 빈도로 점진 갱신 (문서 빈도도 df_buckets개 칸으로 hashing해 메모리 일정)
+    - 출력은 L2 정규화된 float32 (코사인 유사도 = 내적)
+
+    IDF가 바뀌면 이전에 만든 벡터와 가중치가 어긋나므로
+    VectorStore가 문서 수가 늘 때마다 저장된 벡터를 다시 만든다.
+    """
+
+    def __init__(self, dim: int = 1024, df_buckets: int = 1 << 18):
+        self.dim = dim
+        self.df_buckets = df_buckets
+        self._df = np.zeros(df_buckets, dtype=np.int64)
+        self._n_docs = 0
+
+    @property
+    def n_docs(self) -> int:
+        return self._n_docs
+
+    def partial_fit(self, texts: List[str]) -> "HashingVectorizer":
+        for text in texts:
+            for term in set(tokenize(text)):
+                self._df[_bucket(term, self.df_buckets)[0]] += 1
+            self._n_docs += 1
+        return self
+
+    def snapshot(self) -> "HashingVectorizer":
+        """현재 IDF로 고정된 사본 (다른 스레드에서 재임베딩할 때 사용)"""
+        frozen = copy.copy(self)
+        frozen._df = self._df.copy()
+        return frozen
+
+    def _idf(self, term: str) -> float:
+        df = int(self._df[_bucket(term, self.df_buckets)[0]])
+        return math.log((1 + self._n_docs) / (1 + df)) + 1.0
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term, tf in Counter(tokenize(text)).items():
+                index, sign = _bucket(term, self.dim)
+                matrix[row, index] += sign * (1.0 + math.log(tf)) * self._idf(term)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
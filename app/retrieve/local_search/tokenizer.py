@@ -0,0 +1,70 @@
+"""
+로컬 검색용 토크나이저
+한국어 조사/어미를 간단히 분리하고, 복합어 대응을 위해 음절 bigram을 함께 생성
+
+형태소 분석기 없이 동작하며 단어 단위 분석 결과는 LRU 캐시로 재사용한다.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple
+
+
+_TOKEN_PATTERN = re.compile(r"[가-힣]+|[a-z0-9]+(?:[._+-][a-z0-9]+)*")
+_HANGUL_PATTERN = re.compile(r"^[가-힣]+$")
+
+# 자주 쓰이는 조사/어미 (긴 것부터 매칭)
+_SUFFIXES = sorted(
+    [
+        "으로부터", "에서부터", "에게서", "으로서", "으로써", "이라고", "이라는", "이라며",
+        "에서는", "에서도", "에게는", "까지는", "부터는", "에서의", "으로는", "으로도",
+        "에서", "에게", "한테", "까지", "부터", "처럼", "보다", "으로", "라고", "라는",
+        "이나", "이며", "이고", "이다", "하고", "에는", "에도", "와의", "과의", "로서",
+        "로써", "마저", "조차", "밖에", "들은", "들이", "들을", "들의", "했다", "한다",
+        "하는", "하여", "해서", "된다", "되는", "였다", "이었",
+        "은", "는", "이", "가", "을", "를", "에", "의", "도", "로", "와", "과",
+        "만", "나", "며", "고", "들",
+    ],
+    key=len,
+    reverse=True,
+)
+
+STOPWORDS = frozenset({
+    "그리고", "그러나", "하지만", "또한", "및", "등", "것", "수", "이", "그", "저",
+    "the", "a", "an", "of", "to", "in", "and", "or", "is", "are", "for", "on", "with",
+})
+
+
+def _strip_suffix(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=100_000)
+def analyze_word(word: str) -> Tuple[str, ...]:
+    """단어 하나를 색인어 튜플로 변환 (캐시됨)"""
+    if word in STOPWORDS or word in _SUFFIXES:
+        # 영문/숫자 뒤에 붙어 분리된 조사("gpt-5와"의 "와") 포함
+        return ()
+    if not _HANGUL_PATTERN.match(word):
+        return (word,)
+
+    stem = _strip_suffix(word)
+    if stem in STOPWORDS:
+        return ()
+    terms = [stem]
+    # 복합어("인공지능규제") 부분 매칭을 위한 음절 bigram
+    if len(stem) > 2:
+        terms.extend(stem[i:i + 2] for i in range(len(stem) - 1))
+    return tuple(terms)
+
+
+def tokenize(text: str) -> List[str]:
+    """텍스트를 색인어 리스트로 변환"""
+    text = unicodedata.normalize("NFC", text).lower()
+    terms: List[str] = []
+    for word in _TOKEN_PATTERN.findall(text):
+        terms.extend(analyze_word(word))
+    return terms
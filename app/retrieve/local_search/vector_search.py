@@ -0,0 +1,393 @@
+"""
+로컬 벡터 인덱스
+float32 벡터를 연속된 배열에 저장하고 배치 top-k 코사인 검색을 수행
+
+- 작은 규모: NumPy 행렬곱 + argpartition 전수 검색 (brute force)
+- IVF_THRESHOLD 이상: k-means 중심점으로 분할한 IVF 인덱스 (nprobe개 리스트만 탐색)
+- 빌드 시간, 메모리 사용량, brute force 대비 recall 보고
+- k-means 학습과 재임베딩은 이벤트 루프 밖(스레드)에서 수행하고 결과만 교체
+"""
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from app.retrieve.local_search.bm25_search import LocalHit, MetadataFilter
+from app.retrieve.local_search.embedding import EmbeddingFunction, HashingVectorizer
+
+
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "1024"))
+IVF_THRESHOLD = int(os.getenv("VECTOR_IVF_THRESHOLD", "20000"))
+IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+IVF_KMEANS_ITERS = 10
+IVF_RECALL_SAMPLE = int(os.getenv("VECTOR_IVF_RECALL_SAMPLE", "32"))  # 빌드 후 recall 측정에 쓰는 질의 수
+VECTOR_REFRESH_MIN_DOCS = int(os.getenv("VECTOR_REFRESH_MIN_DOCS", "256"))  # 이 문서 수부터 문서 수가 2배가 될 때마다 재임베딩
+_INITIAL_CAPACITY = 1024
+
+
+class IndexStats(BaseModel):
+    """인덱스 상태 보고"""
+    size: int = Field(description="유효 벡터 수")
+    mode: str = Field(description="brute_force 또는 ivf")
+    memory_bytes: int = Field(description="벡터/중심점/리스트 메모리 사용량")
+    build_seconds: float = Field(description="마지막 IVF 빌드 소요 시간")
+    n_lists: int = Field(default=0, description="IVF 리스트 수")
+    recall: Optional[float] = Field(default=None, description="마지막 IVF 빌드 직후 brute force 대비 recall@10")
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """행별 상위 k개 열 인덱스 (점수 내림차순)"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class VectorIndex:
+    """append 친화적인 연속 배열 기반 벡터 인덱스"""
+
+    def __init__(
+        self,
+        dim: int = VECTOR_DIM,
+        ivf_threshold: int = IVF_THRESHOLD,
+        nprobe: int = IVF_NPROBE,
+    ):
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._vectors = np.zeros((_INITIAL_CAPACITY, dim), dtype=np.float32)
+        self._alive = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._count = 0
+        # IVF 상태
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._built_size = 0
+        self.build_seconds = 0.0
+        self.last_recall: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    @property
+    def mode(self) -> str:
+        return "ivf" if self._centroids is not None else "brute_force"
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[: self._count] = self._vectors[: self._count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._count] = self._alive[: self._count]
+        self._vectors, self._alive = vectors, alive
+        if self._assignments is not None:
+            assignments = np.full(capacity, -1, dtype=np.int32)
+            assignments[: self._count] = self._assignments[: self._count]
+            self._assignments = assignments
+
+    def add(
+        self,
+        doc_ids: Sequence[str],
+        vectors: np.ndarray,
+        metadata: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        """벡터 배치 추가 (같은 doc_id는 기존 것을 삭제 후 추가)"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(doc_ids), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        for doc_id in doc_ids:
+            self.delete(doc_id)
+        start = self._count
+        self._grow(start + len(doc_ids))
+        self._vectors[start: start + len(doc_ids)] = vectors
+        self._alive[start: start + len(doc_ids)] = True
+        for offset, doc_id in enumerate(doc_ids):
+            self._row_of[doc_id] = start + offset
+            self._ids.append(doc_id)
+            self._metadata.append(dict(metadata[offset]) if metadata else {})
+        self._count += len(doc_ids)
+
+        if self._centroids is not None:
+            # 빌드 이후 추가분은 가장 가까운 중심점의 리스트에 증분 할당
+            labels = np.argmax(vectors @ self._centroids.T, axis=1)
+            self._assignments[start: self._count] = labels
+            new_rows = np.arange(start, self._count)
+            for label in np.unique(labels):
+                self._lists[label] = np.concatenate([self._lists[label], new_rows[labels == label]])
+
+    def needs_ivf(self) -> bool:
+        """IVF (재)빌드가 필요한지 - 임계값 이상이고 마지막 빌드 이후 2배로 늘었을 때"""
+        return len(self) >= self.ivf_threshold and len(self) >= 2 * max(self._built_size, 1)
+
+    def delete(self, doc_id: str) -> bool:
+        row = self._row_of.pop(doc_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        return True
+
+    def snapshot(self) -> Tuple[np.ndarray, List[str], np.ndarray, int]:
+        """(유효 행 번호, doc_id, 벡터 사본, 현재 행 수) - 스레드에서 학습할 입력"""
+        rows = np.flatnonzero(self._alive[: self._count])
+        return rows, [self._ids[row] for row in rows], self._vectors[rows].copy(), self._count
+
+    @staticmethod
+    def train_ivf(data: np.ndarray, n_lists: Optional[int] = None, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """k-means로 중심점을 학습하고 (중심점, 각 벡터의 리스트 번호) 반환 - 인덱스 상태를 건드리지 않음"""
+        n_lists = n_lists or max(1, int(np.sqrt(len(data))))
+        rng = np.random.default_rng(seed)
+
+        # 학습은 표본으로 수행 (리스트 당 최대 64개)
+        sample = data[rng.choice(len(data), size=min(len(data), n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(IVF_KMEANS_ITERS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        return centroids, np.argmax(data @ centroids.T, axis=1)
+
+    def install(
+        self,
+        rows: np.ndarray,
+        count: int,
+        vectors: Optional[np.ndarray] = None,
+        centroids: Optional[np.ndarray] = None,
+        labels: Optional[np.ndarray] = None,
+        build_seconds: float = 0.0,
+    ) -> None:
+        """
+        snapshot 시점의 행들에 대해 스레드에서 만든 결과를 반영
+        - vectors: 다시 만든 벡터 (그 사이 삭제/교체된 행은 건너뜀)
+        - centroids/labels: 새 IVF (snapshot 이후 추가된 행은 여기서 가장 가까운 중심점에 할당)
+        """
+        alive = self._alive[rows]
+        if vectors is not None:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._vectors[rows[alive]] = (vectors / norms)[alive]
+        if centroids is None:
+            return
+
+        assignments = np.full(self._vectors.shape[0], -1, dtype=np.int32)
+        assignments[rows] = labels
+        if self._count > count:
+            assignments[count: self._count] = np.argmax(self._vectors[count: self._count] @ centroids.T, axis=1)
+        # 리스트 별 행 번호 (역리스트)
+        live = np.flatnonzero(self._alive[: self._count])
+        live_labels = assignments[live]
+        order = np.argsort(live_labels, kind="stable")
+        boundaries = np.searchsorted(live_labels[order], np.arange(1, len(centroids)))
+        self._lists = np.split(live[order], boundaries)
+        self._centroids, self._assignments = centroids, assignments
+        self._built_size = len(live)
+        self.build_seconds = build_seconds
+
+        # 저장된 벡터 일부를 질의로 써서 brute force 대비 recall 측정
+        sample = np.random.default_rng(0).choice(live, size=min(len(live), IVF_RECALL_SAMPLE), replace=False)
+        self.last_recall = self.recall(self._vectors[sample], k=10)
+        stats = self.stats()
+        print(
+            f"🧭 [vector_search] IVF 빌드 완료 - {stats.size}개, 리스트 {stats.n_lists}개, "
+            f"{stats.build_seconds:.2f}s, recall@10 {self.last_recall:.3f}, {stats.memory_bytes / 2**20:.1f}MiB"
+        )
+
+    def build_ivf(self, n_lists: Optional[int] = None, seed: int = 0) -> None:
+        """현재 스레드에서 바로 IVF 빌드 (서버에서는 VectorStore.refresh로 스레드에서 수행)"""
+        started = time.perf_counter()
+        rows, _, data, count = self.snapshot()
+        centroids, labels = self.train_ivf(data, n_lists, seed)
+        self.install(rows, count, centroids=centroids, labels=labels, build_seconds=time.perf_counter() - started)
+
+    def _allowed_rows(self, where: Optional[MetadataFilter]) -> np.ndarray:
+        """검색 대상 행 mask (삭제되지 않았고 metadata 조건을 만족)"""
+        allowed = self._alive[: self._count].copy()
+        if where is not None:
+            allowed &= np.fromiter((where(m) for m in self._metadata), dtype=bool, count=self._count)
+        return allowed
+
+    def _search_rows(
+        self, queries: np.ndarray, k: int, exact: bool, where: Optional[MetadataFilter] = None
+    ) -> List[List[tuple]]:
+        n = self._count
+        allowed = self._allowed_rows(where)
+        results: List[List[tuple]] = []
+        if exact or self._centroids is None:
+            scores = queries @ self._vectors[:n].T
+            scores[:, ~allowed] = -np.inf
+            top = _top_k(scores, k)
+            for qi in range(len(queries)):
+                results.append([(int(r), float(scores[qi, r])) for r in top[qi] if np.isfinite(scores[qi, r])])
+            return results
+
+        nprobe = min(self.nprobe, len(self._centroids))
+        probe_lists = _top_k(queries @ self._centroids.T, nprobe)
+        for qi in range(len(queries)):
+            candidates = np.concatenate([self._lists[label] for label in probe_lists[qi]])
+            candidates = candidates[allowed[candidates]]
+            if len(candidates) == 0:
+                results.append([])
+                continue
+            scores = self._vectors[candidates] @ queries[qi]
+            top = _top_k(scores[None, :], k)[0]
+            results.append([(int(candidates[t]), float(scores[t])) for t in top])
+        return results
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        exact: bool = False,
+        where: Optional[MetadataFilter] = None,
+    ) -> List[List[LocalHit]]:
+        """배치 질의 - 질의마다 코사인 유사도 상위 k개 (where가 있으면 metadata 조건을 만족하는 벡터만)"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+        if len(self) == 0:
+            return [[] for _ in range(len(queries))]
+        return [
+            [LocalHit(doc_id=self._ids[row], score=score, metadata=self._metadata[row]) for row, score in hits]
+            for hits in self._search_rows(queries, k, exact, where)
+        ]
+
+    def recall(self, queries: np.ndarray, k: int = 10) -> float:
+        """현재 모드(IVF) 결과의 brute force 대비 recall@k"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        approx = self.search(queries, k)
+        exact = self.search(queries, k, exact=True)
+        found = total = 0
+        for approx_hits, exact_hits in zip(approx, exact):
+            truth = {hit.doc_id for hit in exact_hits}
+            found += len(truth & {hit.doc_id for hit in approx_hits})
+            total += len(truth)
+        return found / total if total else 1.0
+
+    def stats(self) -> IndexStats:
+        memory = self._vectors.nbytes + self._alive.nbytes
+        if self._centroids is not None:
+            memory += self._centroids.nbytes + self._assignments.nbytes
+            memory += sum(rows.nbytes for rows in self._lists)
+        return IndexStats(
+            size=len(self),
+            mode=self.mode,
+            memory_bytes=int(memory),
+            build_seconds=self.build_seconds,
+            n_lists=0 if self._centroids is None else len(self._centroids),
+            recall=self.last_recall,
+        )
+
+
+class VectorStore:
+    """
+    임베딩 함수 + 벡터 인덱스 (텍스트 단위 인터페이스)
+    IVF가 필요하거나 IDF가 크게 바뀌면(문서 수 2배) 백그라운드에서 재임베딩 + IVF 재빌드
+    """
+
+    def __init__(self, embed: Optional[EmbeddingFunction] = None, index: Optional[VectorIndex] = None):
+        self.embed = embed if embed is not None else HashingVectorizer(dim=VECTOR_DIM)
+        self.index = index if index is not None else VectorIndex(dim=VECTOR_DIM)
+        self._texts: Dict[str, str] = {}
+        self._refreshed_docs = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+
+    def add_texts(
+        self,
+        doc_ids: Sequence[str],
+        texts: Sequence[str],
+        metadata: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        if hasattr(self.embed, "partial_fit"):
+            self.embed.partial_fit(list(texts))
+        self.index.add(doc_ids, self.embed(list(texts)), metadata)
+        self._texts.update(zip(doc_ids, texts))
+        self.schedule_refresh()
+
+    def search_texts(
+        self, queries: Sequence[str], k: int = 10, where: Optional[MetadataFilter] = None
+    ) -> List[List[LocalHit]]:
+        return self.index.search(self.embed(list(queries)), k, where=where)
+
+    def delete(self, doc_id: str) -> bool:
+        self._texts.pop(doc_id, None)
+        return self.index.delete(doc_id)
+
+    def _needs_refresh(self) -> bool:
+        if self.index.needs_ivf():
+            return True
+        n_docs = getattr(self.embed, "n_docs", None)
+        return n_docs is not None and n_docs >= VECTOR_REFRESH_MIN_DOCS and n_docs >= 2 * self._refreshed_docs
+
+    def schedule_refresh(self) -> None:
+        """필요하면 백그라운드 refresh 시작 (이미 진행 중이면 무시, 이벤트 루프 밖이면 바로 수행)"""
+        if not self._needs_refresh() or (self._refresh_task is not None and not self._refresh_task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            snapshot = self._snapshot()
+            self._apply(snapshot, self._rebuild(*snapshot[1:]))
+            return
+        self._refresh_task = loop.create_task(self.refresh())
+
+    def _snapshot(self) -> tuple:
+        rows, doc_ids, vectors, count = self.index.snapshot()
+        embed = self.embed.snapshot() if hasattr(self.embed, "snapshot") else None
+        texts = [self._texts.get(doc_id, "") for doc_id in doc_ids] if embed is not None else []
+        use_ivf = self.index.needs_ivf() or self.index.mode == "ivf"
+        return (rows, count, getattr(self.embed, "n_docs", 0)), embed, texts, vectors, use_ivf
+
+    @staticmethod
+    def _rebuild(embed, texts: List[str], vectors: np.ndarray, use_ivf: bool) -> tuple:
+        """스레드에서 실행 - 현재 IDF로 재임베딩하고 필요하면 k-means 학습"""
+        started = time.perf_counter()
+        if embed is not None and texts:
+            vectors = embed(texts)
+        else:
+            embed = None
+        centroids = labels = None
+        if use_ivf and len(vectors):
+            centroids, labels = VectorIndex.train_ivf(vectors)
+        return (vectors if embed is not None else None), centroids, labels, time.perf_counter() - started
+
+    def _apply(self, snapshot: tuple, result: tuple) -> None:
+        (rows, count, n_docs), *_ = snapshot
+        vectors, centroids, labels, seconds = result
+        self.index.install(rows, count, vectors, centroids, labels, seconds)
+        self._refreshed_docs = n_docs
+        self.refreshes += 1
+
+    async def refresh(self) -> None:
+        """재임베딩 + IVF 학습은 스레드에서, 결과 반영만 이벤트 루프에서"""
+        snapshot = self._snapshot()
+        try:
+            result = await asyncio.to_thread(self._rebuild, *snapshot[1:])
+        except Exception as e:
+            print(f"⚠️ [vector_search] 인덱스 refresh 실패 - {e}")
+            return
+        self._apply(snapshot, result)
+
+
+# 프로세스 전역 벡터 스토어
+vector_store = VectorStore()
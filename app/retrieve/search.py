@@ -11,4 +11,96 @@ BM25 기반 / Vector 기반 / API 기반
 - DB에 등록
 - 재검색
 
-"""
\ No newline at end of file
+구현 위치:
+- API 기반: api_search/ (keyword_search, natural_search)
+- BM25 기반: local_search/bm25_search.py
+- Vector 기반: local_search/vector_search.py (임베딩: local_search/embedding.py)
+- 후처리(RRF 융합): fusion.py
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.metrics import track_search
+from app.tracing import span
+from app.retrieve.api_search.keyword_search import SearchResult
+from app.retrieve.local_search.bm25_search import bm25_index
+from app.retrieve.local_search.vector_search import vector_store
+
+
+def build_page_text(
+    summary: Optional[str],
+    questions: Optional[Any] = None,
+    collection_memo: Optional[str] = None,
+) -> str:
+    """색인할 텍스트 구성: 요약 + 질문/답변 + 컬렉션 메모"""
+    parts = [summary or ""]
+    if isinstance(questions, dict):
+        for q in questions.get("questions", []):
+            parts.append(q.get("question", ""))
+            parts.append(q.get("answer", ""))
+    if collection_memo:
+        parts.append(collection_memo)
+    return "\n".join(p for p in parts if p)
+
+
+def index_page(data_instance) -> None:
+    """처리 완료된 DataInfo를 로컬 인덱스(BM25, Vector)에 등록"""
+    metadata = {"collection_id": data_instance.collection_id, "user_id": data_instance.user_id}
+    doc_ids, texts = [], []
+
+    # 이전 요약들은 아직 색인되지 않은 것만 등록
+    for prior in data_instance.doc_summarized or []:
+        summary_id = prior.get("summary_id")
+        if summary_id and summary_id != data_instance.doc_summarized_new_id and summary_id not in bm25_index:
+            doc_ids.append(summary_id)
+            texts.append(build_page_text(prior.get("summary")))
+
+    if data_instance.doc_summarized_new_id and data_instance.doc_summarized_new:
+        doc_ids.append(data_instance.doc_summarized_new_id)
+        texts.append(build_page_text(
+            data_instance.doc_summarized_new,
+            data_instance.doc_input_question,
+            data_instance.collection_memo,
+        ))
+
+    if not doc_ids:
+        return
+    for doc_id, text in zip(doc_ids, texts):
+        bm25_index.add(doc_id, text, metadata)
+    vector_store.add_texts(doc_ids, texts, [metadata] * len(doc_ids))
+
+
+def search_local(queries: Sequence[str], user_id: str, collection_id: str, k: int = 5) -> List[SearchResult]:
+    """
+    로컬 인덱스에서 이미 알고 있는 페이지 검색 (쿼리 별 BM25 + 배치 벡터 검색)
+    같은 유저의 다른 컬렉션 페이지만 대상 (다른 유저의 페이지, 현재 컬렉션의 페이지는 제외)
+    결과는 URL이 아니라 summary_id 목록
+    """
+    def in_scope(metadata: Dict[str, Any]) -> bool:
+        return metadata.get("user_id") == user_id and metadata.get("collection_id") != collection_id
+
+    results: List[SearchResult] = []
+
+    with track_search("bm25"), span("search", backend="bm25", queries=list(queries)):
+        for query in queries:
+            hits = bm25_index.search(query, k=k, where=in_scope)
+            if hits:
+                results.append(_to_search_result([hit.doc_id for hit in hits], query, "bm25"))
+
+    if len(vector_store.index):
+        with track_search("vector"), span("search", backend="vector", queries=list(queries)):
+            for query, hits in zip(queries, vector_store.search_texts(queries, k=k, where=in_scope)):
+                doc_ids = [hit.doc_id for hit in hits if hit.score > 0]
+                if doc_ids:
+                    results.append(_to_search_result(doc_ids, query, "vector"))
+    return results
+
+
+def _to_search_result(doc_ids: List[str], query: str, model: str) -> SearchResult:
+    return SearchResult(
+        urls=doc_ids,
+        query=query,
+        model=model,
+        advanced=False,
+        total_results=len(doc_ids),
+        kind="local",
+    )
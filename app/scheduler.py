@@ -1,148 +1,324 @@
+import os
+import time
 import asyncio
 import traceback
-from typing import List, Union, Callable, Dict, Any
+from dataclasses import dataclass, replace
+from typing import List, Union, Callable, Dict, Any, Optional, Sequence, Tuple
 from collections import defaultdict
 
+from app.metrics import observe_stage, track_stage
+from app.tracing import span
+
+
+@dataclass
+class StageSpec:
+    """stage 선언 정보 - 읽는 DataInfo 필드와 쓰는 필드"""
+    name: str
+    func: Callable
+    reads: Tuple[str, ...] = ()
+    writes: Optional[str] = None
+    max_concurrency: Optional[int] = None
+    after: Tuple[str, ...] = ()  # 필드 의존성 외에 명시적으로 선행해야 하는 stage
+
+    @property
+    def semaphore(self) -> Optional[asyncio.Semaphore]:
+        """stage 전역 동시 실행 제한 (요청 간 공유)"""
+        if not self.max_concurrency:
+            return None
+        if self.name not in _stage_semaphores:
+            _stage_semaphores[self.name] = asyncio.Semaphore(self.max_concurrency)
+        return _stage_semaphores[self.name]
+
+
+# stage명 -> 동시 실행 제한 세마포어 (모든 요청이 공유)
+_stage_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+@dataclass
+class StageTiming:
+    name: str
+    start: float
+    end: float
+    skipped: bool = False
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class ScheduleReport:
+    """스케쥴 실행 결과 - stage 별 시간과 critical path"""
+    timings: Dict[str, StageTiming]
+    dependencies: Dict[str, Tuple[str, ...]]
+
+    def critical_path(self) -> List[StageTiming]:
+        """가장 늦게 끝난 stage부터 가장 늦게 끝난 선행 stage를 거슬러 올라간 경로"""
+        if not self.timings:
+            return []
+        current = max(self.timings.values(), key=lambda t: t.end)
+        path = [current]
+        while True:
+            deps = [self.timings[d] for d in self.dependencies.get(current.name, ()) if d in self.timings]
+            if not deps:
+                break
+            current = max(deps, key=lambda t: t.end)
+            path.append(current)
+        return list(reversed(path))
+
+    def format_critical_path(self) -> str:
+        path = self.critical_path()
+        if not path:
+            return "(비어 있음)"
+        origin = min(t.start for t in self.timings.values())
+        total = max(t.end for t in self.timings.values()) - origin
+        steps = " -> ".join(
+            f"{t.name}({'skip' if t.skipped else f'{t.duration:.2f}s'})" for t in path
+        )
+        return f"{steps} | 전체 {total:.2f}s"
+
+
+# stage 선언이 없는 함수(구버전 호출 방식)를 위한 함수명-필드 매핑
+_LEGACY_FIELD_MAPPING = {
+    'doc_summary': 'doc_summarized_new',
+    'doc_indexing': 'doc_input_question',
+    'expand_collection_query': 'collection_question',
+    'search_docs': 'doc_retrieved'
+}
+
+
+def stage(
+    reads: Sequence[str] = (),
+    writes: Optional[str] = None,
+    max_concurrency: Optional[int] = None,
+):
+    """
+    stage 선언 데코레이터
+
+    Args:
+        reads: stage가 읽는 DataInfo 필드 (이 필드를 쓰는 stage가 끝나야 시작)
+        writes: 반환값을 저장할 DataInfo 필드
+        max_concurrency: 모든 요청을 합친 stage 동시 실행 수 상한
+                         (환경변수 STAGE_MAX_CONCURRENCY_<STAGE명>으로 덮어쓰기 가능)
+
+    Example:
+        @stage(reads=["collection_question"], writes="doc_retrieved", max_concurrency=8)
+        async def search_docs(data_instance): ...
+    """
+    def decorator(func: Callable) -> Callable:
+        env_limit = os.getenv(f"STAGE_MAX_CONCURRENCY_{func.__name__.upper()}")
+        func.__stage__ = StageSpec(
+            name=func.__name__,
+            func=func,
+            reads=tuple(reads),
+            writes=writes,
+            max_concurrency=int(env_limit) if env_limit else max_concurrency,
+        )
+        return func
+    return decorator
+
+
+def _spec_of(task: Callable, after: Tuple[str, ...] = ()) -> StageSpec:
+    spec = getattr(task, "__stage__", None)
+    if spec is None:
+        spec = StageSpec(name=task.__name__, func=task, writes=_LEGACY_FIELD_MAPPING.get(task.__name__))
+    if after:
+        spec = replace(spec, after=tuple(after))
+    return spec
+
+
+def _flatten(process_tasks: List[Union[Callable, List]]) -> List[StageSpec]:
+    """
+    작업 목록을 StageSpec 리스트로 변환
+    - Callable: stage 선언(reads/writes)에 따라 배치
+    - List[Callable]: 구버전 순차 체인 - 체인 내 앞 작업을 명시적 선행 stage로 추가
+    """
+    specs: List[StageSpec] = []
+    for task in process_tasks:
+        if callable(task):
+            specs.append(_spec_of(task))
+        elif isinstance(task, list):
+            previous: Tuple[str, ...] = ()
+            for chained in task:
+                specs.append(_spec_of(chained, after=previous))
+                previous = (chained.__name__,)
+        else:
+            raise ValueError(f"지원하지 않는 작업 타입: {type(task)}")
+    return specs
+
+
+def build_dag(specs: List[StageSpec]) -> Dict[str, Tuple[str, ...]]:
+    """
+    stage 선언으로 의존성 그래프 생성 (stage명 -> 선행 stage명들)
+
+    어떤 stage도 쓰지 않는 필드는 입력 데이터로 간주한다.
+    """
+    producers: Dict[str, str] = {}
+    names = set()
+    for spec in specs:
+        if spec.name in names:
+            raise ValueError(f"중복된 stage: {spec.name}")
+        names.add(spec.name)
+        if spec.writes:
+            if spec.writes in producers:
+                raise ValueError(f"필드 '{spec.writes}'를 쓰는 stage가 여러 개: {producers[spec.writes]}, {spec.name}")
+            producers[spec.writes] = spec.name
+
+    dependencies = {}
+    for spec in specs:
+        deps = {producers[f] for f in spec.reads if f in producers and producers[f] != spec.name}
+        deps.update(a for a in spec.after if a in names)
+        dependencies[spec.name] = tuple(sorted(deps))
+
+    # 순환 의존성 검사 (DFS)
+    state: Dict[str, int] = {}
+    def visit(name: str, trail: List[str]) -> None:
+        if state.get(name) == 1:
+            raise ValueError(f"순환 의존성: {' -> '.join(trail + [name])}")
+        if state.get(name) == 2:
+            return
+        state[name] = 1
+        for dep in dependencies[name]:
+            visit(dep, trail + [name])
+        state[name] = 2
+    for name in dependencies:
+        visit(name, [])
+    return dependencies
+
 
 async def scheduler(
-    process_tasks: List[Union[Callable, List]], 
-    data_instance, 
+    process_tasks: List[Union[Callable, List]],
+    data_instance,
     lock_manager: Dict[str, asyncio.Lock] = None
-) -> None:
+) -> ScheduleReport:
     """
     비동기 처리 스케쥴링을 담당하는 함수
-    
+
+    각 stage가 선언한 reads/writes로 DAG를 만들고,
+    입력 필드가 준비되는 즉시 해당 stage를 시작한다.
+    출력 필드에 이미 값이 있는 stage(근사 중복 재사용 등)는 건너뛴다.
+
     Args:
         process_tasks: 처리할 작업들의 리스트
-                    - Callable: 독립적으로 실행할 함수
-                    - List[Callable]: 순차적으로 실행할 함수들의 체인
+                    - Callable: stage 선언에 따라 실행 (@stage 데코레이터)
+                    - List[Callable]: 순차적으로 실행할 함수들의 체인 (구버전 호환)
         data_instance: DataInfo 인스턴스 (처리 대상)
         lock_manager: 필드별 락 매니저 (동시성 제어용)
-    
+
+    Returns:
+        ScheduleReport: stage 별 실행 시간과 critical path
+
     Example:
-        process_tasks = [
-            [doc_summary, expand_collection_query, search_docs],  # 순차 실행
-            doc_indexing  # 독립 실행
-        ]
+        process_tasks = [doc_summary, doc_indexing, expand_collection_query, search_docs]
     """
     if lock_manager is None:
         lock_manager = defaultdict(asyncio.Lock)
-    
-    # 독립 작업과 순차 작업 분리
-    independent_tasks = []
-    sequential_chains = []
-    
-    for task in process_tasks:
-        if callable(task):
-            # 단일 함수 -> 독립 작업
-            independent_tasks.append(task)
-        elif isinstance(task, list):
-            # 함수 리스트 -> 순차 작업 체인
-            sequential_chains.append(task)
-        else:
-            raise ValueError(f"지원하지 않는 작업 타입: {type(task)}")
-    
-    # 모든 작업을 비동기로 시작
-    all_tasks = []
-    
-    # 독립 작업들을 병렬로 실행
-    for task in independent_tasks:
-        all_tasks.append(_execute_single_task(task, data_instance, lock_manager))
-    
-    # 순차 작업 체인들을 병렬로 실행 (각 체인 내부는 순차)
-    for chain in sequential_chains:
-        all_tasks.append(_execute_sequential_chain(chain, data_instance, lock_manager))
-    
-    # 모든 작업이 완료될 때까지 대기
-    if all_tasks:
-        await asyncio.gather(*all_tasks)
-
-
-async def _execute_single_task(
-    task: Callable, 
-    data_instance, 
-    lock_manager: Dict[str, asyncio.Lock]
+
+    specs = _flatten(process_tasks)
+    dependencies = build_dag(specs)
+    timings: Dict[str, StageTiming] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_stage(spec: StageSpec) -> None:
+        deps = [tasks[d] for d in dependencies[spec.name]]
+        if deps:
+            await asyncio.gather(*deps)
+        await _execute_stage(spec, data_instance, lock_manager, timings)
+
+    # stage task들은 생성 시점의 context를 이어받으므로 scheduler span 아래에 기록됨
+    with span("scheduler", stages=[spec.name for spec in specs]):
+        for spec in specs:
+            tasks[spec.name] = asyncio.create_task(run_stage(spec), name=f"stage:{spec.name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+    report = ScheduleReport(timings=timings, dependencies=dependencies)
+    print(f"🧵 [scheduler] critical path: {report.format_critical_path()}")
+    return report
+
+
+async def _execute_stage(
+    spec: StageSpec,
+    data_instance,
+    lock_manager: Dict[str, asyncio.Lock],
+    timings: Dict[str, StageTiming],
 ) -> None:
-    """단일 작업을 비동기로 실행"""
+    """단일 stage를 실행하고 결과를 data_instance에 반영"""
+    if spec.writes and getattr(data_instance, spec.writes, None) is not None:
+        now = time.perf_counter()
+        timings[spec.name] = StageTiming(spec.name, now, now, skipped=True)
+        print(f"⏭️ [scheduler] '{spec.name}' 건너뜀 - '{spec.writes}' 이미 존재")
+        _notify(data_instance, spec.writes, getattr(data_instance, spec.writes))
+        observe_stage(spec.name, 0.0, status="skipped")
+        with span(f"stage:{spec.name}", skipped=True):
+            pass
+        return
+
+    semaphore = spec.semaphore
     try:
-        # 작업 실행 (필요에 따라 락 사용)
-        result = await task(data_instance)
-        
+        queued = time.perf_counter()
+        if semaphore is not None:
+            await semaphore.acquire()
+        start = time.perf_counter()
+        try:
+            with track_stage(spec.name), span(f"stage:{spec.name}", writes=spec.writes) as stage_span:
+                stage_span.set_attribute("queued_seconds", round(start - queued, 6))
+                result = await spec.func(data_instance)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        timings[spec.name] = StageTiming(spec.name, start, time.perf_counter())
+
         # 결과가 있으면 data_instance에 반영
         if result is not None:
-            await _update_data_instance(data_instance, task.__name__, result, lock_manager)
-            
-    except Exception as e:
-        #print(f"작업 '{task.__name__}' 실행 중 오류 발생: {e}")
-        # 디버깅 임시 코드
-        error_details = traceback.format_exc()
-        print(f"작업 '{task.__name__}' 실행 중 오류 발생:")
-        print(f"오류 메시지: {e}")
-        print(f"상세 스택 트레이스:\n{error_details}")
-        raise
+            await _update_data_instance(data_instance, spec, result, lock_manager)
 
-
-async def _execute_sequential_chain(
-    chain: List[Callable], 
-    data_instance, 
-    lock_manager: Dict[str, asyncio.Lock]
-) -> None:
-    """순차 작업 체인을 실행 (체인 내부는 순차, 다른 체인과는 병렬)"""
-    try:
-        #for task in chain:
-        # 디버깅 임시 코드
-        for i, task in enumerate(chain):
-            print(f"순차 체인에서 작업 {i+1}/{len(chain)} 실행 중: {task.__name__}")
-            # 체인 내에서는 순차적으로 실행
-            result = await task(data_instance)
-            
-            # 결과가 있으면 data_instance에 반영
-            if result is not None:
-                await _update_data_instance(data_instance, task.__name__, result, lock_manager)
-                
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        #print(f"순차 체인 실행 중 오류 발생: {e}")
         # 디버깅 임시 코드
         error_details = traceback.format_exc()
-        current_task_name = task.__name__ if 'task' in locals() else "알 수 없음"
-        current_step = i + 1 if 'i' in locals() else "알 수 없음"
-        
-        print(f"순차 체인 실행 중 오류 발생:")
-        print(f"오류 발생 위치: 체인의 {current_step}번째 작업 '{current_task_name}'")
+        print(f"작업 '{spec.name}' 실행 중 오류 발생:")
         print(f"오류 메시지: {e}")
         print(f"상세 스택 트레이스:\n{error_details}")
         raise
 
 
 async def _update_data_instance(
-    data_instance, 
-    task_name: str, 
-    result: Any, 
+    data_instance,
+    spec: StageSpec,
+    result: Any,
     lock_manager: Dict[str, asyncio.Lock]
 ) -> None:
     """
     작업 결과를 data_instance에 안전하게 업데이트
-    
-    각 함수명에 따라 적절한 필드에 결과를 저장
+
+    stage가 선언한 writes 필드에 결과를 저장
     """
-    # 함수명과 필드명 매핑
-    field_mapping = {
-        'doc_summary': 'doc_summarized_new',
-        'doc_indexing': 'doc_input_question', 
-        'expand_collection_query': 'collection_question',
-        'search_docs': 'doc_retrieved'
-    }
-    
-    field_name = field_mapping.get(task_name)
+    field_name = spec.writes
     if field_name:
         # 해당 필드의 락을 사용하여 안전하게 업데이트
         async with lock_manager[field_name]:
             setattr(data_instance, field_name, result)
+        _notify(data_instance, field_name, result)
     else:
-        print(f"알 수 없는 작업명: {task_name}")
+        print(f"알 수 없는 작업명: {spec.name}")
+
+
+def _notify(data_instance, field_name: str, value: Any) -> None:
+    """필드 완료 hook - DataInfo의 구독자(스트리밍 응답 등)에게 전달"""
+    notify = getattr(data_instance, "notify_field_updated", None)
+    if notify is not None:
+        notify(field_name, value)
 
 
 # 편의를 위한 기본 스케쥴러 함수 (기존 호출 방식 유지)
-async def default_scheduler(process_tasks: List, data_instance) -> None:
+async def default_scheduler(process_tasks: List, data_instance) -> ScheduleReport:
     """기본 스케쥴러 - 기존 main.py의 호출 방식과 호환"""
-    await scheduler(process_tasks, data_instance)
\ No newline at end of file
+    return await scheduler(process_tasks, data_instance)
@@ -2,19 +2,21 @@
 문서 검색 모듈
 """
 import asyncio
-import os
-from jinja2 import Environment, FileSystemLoader
+from app.llm.prompt_registry import prompt_registry
 from pydantic import BaseModel, Field
 from typing import List
 
-from app.retrieve.api_search.natural_search import from_openrouter
-from app.retrieve.api_search.keyword_search import from_ddgs
+from app.retrieve.api_search.keyword_search import afrom_ddgs
+from app.retrieve.search import search_local
+from app.retrieve.fusion import fuse_search_results
+from app.retrieve.api_search.search_cache import search_cache
 from app.llm.inference import structured_inference
+from app.scheduler import stage
+from app.metrics import track_stage
+from app.tracing import span
 
-# 현재 파일의 디렉토리를 기준으로 templates 폴더 설정
-current_dir = os.path.dirname(os.path.abspath(__file__))
-template_dir = os.path.join(current_dir, 'llm')
-env = Environment(loader=FileSystemLoader(template_dir))
+# 템플릿은 서버 시작 시 prompt_registry에서 한 번 컴파일됨
+QUESTION_MERGING_PROMPT = prompt_registry.register('prompts/question_merging_250911.jinja')
     
 class QueriesResponse(BaseModel):
     """여러 질문들을 담는 응답 모델"""
@@ -27,23 +29,25 @@ async def question_merging(question_list: List[str]):
     """
     print(f"🔍 [question_merging] 시작 - User: {question_list}")
     
-    template = env.get_template('prompts/question_merging_250911.jinja')
-    prompt = template.render(question_list=question_list)
+    prompt = QUESTION_MERGING_PROMPT.render(question_list=question_list)
     
     # 구조화된 출력을 위한 새로운 inference 함수 사용
-    result = await structured_inference(
-        prompt=prompt,
-        # structured output은 제한된 모델만 가능:
-        # - gpt-4 계열, gemini-2.5 계열
-        # - 불가능한 모델: gpt-5 계열, grok-3 계열
-        #model_name="google/gemini-2.5-flash-lite",
-        model_name="openai/gpt-4.1-mini",
-        model_settings={
-            "temperature": 0.8,
-            "max_tokens": 1000,
-        },
-        output_type=QueriesResponse  # 구조화된 출력 타입 지정
-    )
+    with track_stage("question_merging"), span("question_merging", questions=len(question_list)):
+        result = await structured_inference(
+            prompt=prompt,
+            # structured output은 제한된 모델만 가능:
+            # - gpt-4 계열, gemini-2.5 계열
+            # - 불가능한 모델: gpt-5 계열, grok-3 계열
+            #model_name="google/gemini-2.5-flash-lite",
+            model_name="openai/gpt-4.1-mini",
+            model_settings={
+                "temperature": 0.8,
+                "max_tokens": 1000,
+            },
+            output_type=QueriesResponse,  # 구조화된 출력 타입 지정
+            prompt_template=QUESTION_MERGING_PROMPT.name,
+            stage="question_merging",
+        )
 
     # result.output이 이미 QuestionsResponse 객체임
     queries_response = result.output
@@ -59,19 +63,25 @@ async def search_single_question(question: str):
     """단일 질문에 대한 검색 수행"""
     try:
         # 검색 엔진 선택: 아래 중 하나의 주석을 해제하여 사용
-        loop = asyncio.get_event_loop()
         
         # 옵션 1: 자연어 검색 (Perplexity/OpenRouter 기반)
-        #search_result = await loop.run_in_executor(None, from_openrouter, question, True)
+        #search_result = await search_cache.cached(
+        #    "openrouter", question, True,
+        #    lambda: afrom_openrouter(question, True),
+        #)
         
         # 옵션 2: 키워드 검색 (DuckDuckGo 기반)
-        search_result = await loop.run_in_executor(None, from_ddgs, question, True)
+        search_result = await search_cache.cached(
+            "ddgs", question, True,
+            lambda: afrom_ddgs(question, True),
+        )
         
         return search_result
     except Exception as e:
         print(f"⚠️ [search_docs] 검색 실패: {question} - {str(e)}")
         return []
 
+@stage(reads=["collection_question"], writes="doc_retrieved")
 async def search_docs(data_instance):
     """
     문서 검색 함수
@@ -100,6 +110,23 @@ async def search_docs(data_instance):
     
     # 병렬 실행
     results = await asyncio.gather(*search_tasks)
+
+    # 쿼리/검색기 별 순위 리스트를 RRF로 융합, 웹 문서(URL)만 doc_retrieved로
+    doc_retrieved = [r.id for r in fuse_search_results(results) if r.kind == "url"]
     
-    print(f"✅ [search_docs] 완료 - User: {data_instance.user_id}, 결과: {len(results)}개")
-    return results
+    print(f"✅ [search_docs] 완료 - User: {data_instance.user_id}, 결과: {len(doc_retrieved)}개")
+    return doc_retrieved
+
+@stage(reads=["collection_question"], writes="collection_retrieved")
+async def search_collections(data_instance):
+    """
+    같은 유저의 다른 컬렉션에서 관련 페이지 검색 (로컬 BM25/Vector 인덱스)
+    웹 검색 결과(URL)와 섞지 않고 summary_id 목록을 collection_retrieved에 기록
+    """
+    if not data_instance.collection_question:
+        return []
+    questions = [q.get('question') for q in data_instance.collection_question.get('questions') if q.get('question')]
+    results = search_local(questions, user_id=data_instance.user_id, collection_id=data_instance.collection_id)
+    collection_retrieved = [r.id for r in fuse_search_results(results) if r.kind == "local"]
+    print(f"📚 [search_collections] 완료 - User: {data_instance.user_id}, 결과: {len(collection_retrieved)}개")
+    return collection_retrieved
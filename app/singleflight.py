@@ -0,0 +1,71 @@
+"""
+Single-flight 호출 병합
+같은 키의 호출이 진행 중이면 새로 호출하지 않고 진행 중인 결과를 함께 기다린다.
+(동시에 들어온 같은 문서의 LLM 호출, 같은 검색 쿼리 등)
+
+- 실제 호출은 별도 Task로 실행되어 한 호출자가 취소되어도 다른 호출자에게 영향 없음
+- 기다리는 호출자가 모두 취소되면 그때 실제 호출도 취소 (그 뒤 같은 키로 들어온 호출은 새로 실행)
+- 병합으로 절약된 호출 수 카운터 (생성된 인스턴스는 이름으로 등록되어 /metrics로 노출)
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+# 이름 -> 인스턴스 (지표 수집용)
+_instances: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """키 별로 진행 중인 호출을 하나로 병합"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.calls = 0  # 실제로 실행된 호출 수
+        self.shared = 0  # 진행 중인 호출에 합류해 절약된 호출 수
+        _instances[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+        else:
+            self.shared += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                # 마지막 호출자가 빠지면 실제 호출도 취소
+                # 취소한 task에 새 호출자가 합류하지 않도록 완료 콜백을 기다리지 않고 바로 키에서 뺀다
+                if self._waiters[key] <= 0:
+                    del self._inflight[key]
+                    del self._waiters[key]
+                    task.cancel()
+            raise
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        # 기다리는 호출자가 없어도 "exception was never retrieved" 경고가 나지 않도록
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+def all_stats() -> Dict[str, Dict[str, int]]:
+    """등록된 모든 SingleFlight의 stats (이름 별)"""
+    return {name: flight.stats() for name, flight in _instances.items()}
@@ -0,0 +1,389 @@
+"""
+요청 단위 tracing
+/process 요청 하나가 느릴 때 어느 stage / 어느 외부 호출(LLM, 검색)이 느렸는지 보기 위한 가벼운 span 기록
+
+- 요청마다 trace id 발급 (W3C traceparent 헤더가 오면 그 trace id / 샘플링 여부를 이어받음)
+- span: 이름, 시작/종료 시각, 속성(model, 토큰 수, query 등), 오류 상태, 부모 span
+  현재 span은 contextvar로 전달되므로 asyncio task(stage, hedging 요청)에도 그대로 이어진다.
+- head sampling: trace 시작 시 TRACE_SAMPLE_RATE 확률로만 기록, 나머지는 span 생성 비용만 남음
+- trace의 모든 span이 끝나면 내보냄 (스트리밍 응답처럼 root가 먼저 끝나도 나머지 span을 기다림)
+    TRACE_EXPORTER=none : 메모리에 최근 trace만 보관 (GET /traces/{trace_id})
+    TRACE_EXPORTER=json : TRACE_JSON_PATH에 한 줄에 trace 하나씩 JSON으로 추가
+    TRACE_EXPORTER=otlp : OTLP/HTTP(JSON)로 collector에 전송 (TRACE_OTLP_ENDPOINT)
+"""
+import os
+import json
+import time
+import random
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none | json | otlp
+TRACE_JSON_PATH = os.getenv("TRACE_JSON_PATH", ".cache/traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "pagelink-retrieve-server")
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "512"))            # trace 하나에 기록할 최대 span 수
+TRACE_KEEP_RECENT = int(os.getenv("TRACE_KEEP_RECENT", "100"))        # 메모리에 보관할 최근 trace 수
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2.0"))
+TRACE_EXPORT_MAX_QUEUE = int(os.getenv("TRACE_EXPORT_MAX_QUEUE", "1000"))
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "30"))     # 이보다 오래 걸린 trace는 요약 출력
+
+# 속성 값이 너무 길면 잘라서 기록 (query, 프롬프트 일부 등)
+_MAX_ATTRIBUTE_LENGTH = 256
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > _MAX_ATTRIBUTE_LENGTH:
+        return value[:_MAX_ATTRIBUTE_LENGTH] + "…"
+    if isinstance(value, (list, tuple)):
+        return [_clip(v) for v in value[:32]]
+    return value
+
+
+class Span:
+    """시작/종료 시각과 속성을 가진 작업 구간 하나"""
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = {k: _clip(v) for k, v in attributes.items() if v is not None}
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = _clip(value)
+
+    def set_attributes(self, **attributes: Any) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.span_ended()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "end": self.end_ns / 1e9 if self.end_ns is not None else None,
+            "duration": round(self.duration, 6),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """샘플링되지 않았거나 trace 밖에서 열린 span - 아무것도 기록하지 않음"""
+    span_id = None
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+    def set_attributes(self, **attributes: Any) -> None:
+        return None
+
+    def record_error(self, error: BaseException) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _UnsampledSpan(_NoopSpan):
+    """샘플링되지 않은 요청 - trace id만 가짐"""
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+
+
+class Trace:
+    """요청 하나의 span 모음 - 열린 span이 모두 닫히면 tracer로 넘어가 내보내짐"""
+
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.name = name
+        self.spans: List[Span] = []
+        self.open_spans = 0
+        self.dropped_spans = 0
+
+    def new_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Optional[Span]:
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped_spans += 1
+            return None
+        span = Span(self, name, parent_id, attributes)
+        self.spans.append(span)
+        self.open_spans += 1
+        return span
+
+    def span_ended(self) -> None:
+        self.open_spans -= 1
+        if self.open_spans == 0:
+            tracer.finish(self)
+
+    @property
+    def duration(self) -> float:
+        if not self.spans:
+            return 0.0
+        end = max(s.end_ns or s.start_ns for s in self.spans)
+        return (end - min(s.start_ns for s in self.spans)) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration": round(self.duration, 6),
+            "dropped_spans": self.dropped_spans,
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+# 현재 task의 span (새 task는 생성 시점의 값을 이어받음)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span():
+    """현재 span (없으면 아무것도 기록하지 않는 span)"""
+    return _current_span.get() or _NOOP_SPAN
+
+
+def parse_traceparent(header: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+    """W3C traceparent (00-{trace_id}-{parent_id}-{flags}) -> (trace_id, parent_id, sampled)"""
+    if not header:
+        return None, None, None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None, None
+    try:
+        sampled = bool(int(parts[3], 16) & 0x01)
+    except ValueError:
+        return None, None, None
+    return parts[1], parts[2], sampled
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any):
+    """
+    요청 단위 trace 시작 (root span)
+    이미 trace 안이면 그 trace의 하위 span으로 동작한다.
+    샘플링되지 않으면 trace id만 있는 span을 돌려준다 (응답 헤더용).
+    """
+    if _current_span.get() is not None:
+        with span(name, **attributes) as s:
+            yield s
+        return
+
+    trace_id, parent_id, sampled = parse_traceparent(traceparent)
+    if trace_id is None:
+        trace_id = _new_id(16)
+    if sampled is None:
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        yield _UnsampledSpan(trace_id)
+        return
+
+    trace = Trace(trace_id, name)
+    root = trace.new_span(name, parent_id, attributes)
+    with _activate(root) as s:
+        yield s
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """현재 trace 안에 하위 span 생성 (trace 밖이거나 샘플링되지 않았으면 기록하지 않음)"""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    child = parent.trace.new_span(name, parent.span_id, attributes)
+    if child is None:
+        yield _NOOP_SPAN
+        return
+    with _activate(child) as s:
+        yield s
+
+
+@contextmanager
+def _activate(s: Span):
+    token = _current_span.set(s)
+    try:
+        yield s
+    except asyncio.CancelledError:
+        # hedging에서 진 요청, 클라이언트 연결 종료 등은 오류와 구분
+        s.status = "cancelled"
+        raise
+    except Exception as e:
+        s.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON 본문 (ExportTraceServiceRequest)"""
+    spans = []
+    for trace in traces:
+        for s in trace.spans:
+            otlp_span = {
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": _otlp_attributes(
+                    {**s.attributes, "cancelled": True} if s.status == "cancelled" else s.attributes
+                ),
+                # STATUS_CODE_OK = 1, STATUS_CODE_ERROR = 2, 취소는 UNSET(0)
+                "status": {"code": {"ok": 1, "error": 2}.get(s.status, 0), "message": s.error or ""},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class Tracer:
+    """끝난 trace 보관 및 주기적 내보내기"""
+
+    def __init__(self, exporter: str = TRACE_EXPORTER):
+        self.exporter = exporter
+        self.recent: "OrderedDict[str, Trace]" = OrderedDict()
+        self._pending: Deque[Trace] = deque(maxlen=TRACE_EXPORT_MAX_QUEUE)
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.finished = 0
+        self.exported = 0
+        self.export_errors = 0
+
+    def finish(self, trace: Trace) -> None:
+        self.finished += 1
+        self.recent[trace.trace_id] = trace
+        while len(self.recent) > TRACE_KEEP_RECENT:
+            self.recent.popitem(last=False)
+        if self.exporter != "none":
+            self._pending.append(trace)
+        if trace.duration >= TRACE_SLOW_SECONDS:
+            slowest = sorted(trace.spans[1:], key=lambda s: s.duration, reverse=True)[:3]
+            summary = ", ".join(f"{s.name} {s.duration:.1f}s" for s in slowest)
+            print(f"🐢 [trace] {trace.name} {trace.duration:.1f}s (trace_id={trace.trace_id}) - {summary}")
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        trace = self.recent.get(trace_id)
+        return trace.to_dict() if trace is not None else None
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch = list(self._pending)
+        self._pending.clear()
+        try:
+            if self.exporter == "json":
+                await asyncio.to_thread(self._write_json, batch)
+            elif self.exporter == "otlp":
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=5.0)
+                response = await self._client.post(TRACE_OTLP_ENDPOINT, json=to_otlp(batch))
+                response.raise_for_status()
+            self.exported += len(batch)
+        except Exception as e:
+            # tracing은 best-effort - 실패한 배치는 버림
+            self.export_errors += 1
+            print(f"⚠️ [trace] {len(batch)}개 trace 내보내기 실패 ({self.exporter}): {e}")
+
+    @staticmethod
+    def _write_json(batch: List[Trace]) -> None:
+        directory = os.path.dirname(TRACE_JSON_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(TRACE_JSON_PATH, "a", encoding="utf-8") as f:
+            for trace in batch:
+                f.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(TRACE_EXPORT_INTERVAL)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None and self.exporter != "none":
+            self._task = asyncio.create_task(self._run(), name="trace-exporter")
+            print(f"🔎 [trace] {self.exporter} exporter 시작 (샘플링 {TRACE_SAMPLE_RATE:.0%})")
+
+    async def stop(self) -> None:
+        """주기 내보내기 중단 후 남은 trace 모두 내보냄"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "finished": self.finished,
+            "exported": self.exported,
+            "pending": len(self._pending),
+            "export_errors": self.export_errors,
+        }
+
+
+# 프로세스 전역 tracer
+tracer = Tracer()
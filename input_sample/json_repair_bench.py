@@ -0,0 +1,48 @@
+"""
+JSON 복구 파서 회귀 벤치마크
+malformed_json_corpus.jsonl의 LLM 출력 사례를 tolerant_parser로 복구해
+기대값과 비교하고 사례별 처리 시간을 출력한다.
+
+실행: python input_sample/json_repair_bench.py
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.llm.parser import tolerant_parser  # noqa: E402
+
+CORPUS_PATH = Path(__file__).parent / "malformed_json_corpus.jsonl"
+REPEAT = 200
+
+
+def main() -> int:
+    cases = [json.loads(line) for line in CORPUS_PATH.read_text(encoding="utf-8").splitlines() if line.strip()]
+    failed = 0
+    for case in cases:
+        try:
+            result = tolerant_parser(case["input"])
+        except Exception as e:
+            result = f"<{type(e).__name__}: {e}>"
+        ok = result == case["expected"]
+        failed += not ok
+
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            try:
+                tolerant_parser(case["input"])
+            except Exception:
+                pass
+        elapsed_us = (time.perf_counter() - started) / REPEAT * 1e6
+
+        print(f"{'✅' if ok else '❌'} {case['name']:<24} {elapsed_us:8.1f}µs")
+        if not ok:
+            print(f"   기대: {case['expected']}\n   결과: {result}")
+
+    print(f"\n{len(cases) - failed}/{len(cases)} 통과")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,96 @@
+import json
+import time
 import asyncio
 import uvicorn
 import logging
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
-from app.data_model import DataInfo, ProcessRequest
-from app.db import send_to_db
+from app.data_model import DataInfo, ProcessRequest, BatchProcessRequest
+from app.db import send_to_db, get_user_info, init_db, close_db, index_page_repo
+from app.llm.inference import init_clients, close_clients
+from app.llm.prompt_registry import prompt_registry
+from app.doc_dedup import near_duplicate_index, question_context
+from app.retrieve.api_search import keyword_search, natural_search
+from app.retrieve.search import index_page
+from app.jobs import Job, JobQueue, QueueFullError
+from app.metrics import HTTP_DURATION, HTTP_IN_FLIGHT, JOBS_QUEUED, render_latest, track_stage
+from app.tracing import span, start_trace, tracer
 from app import scheduler   # 의존성을 고려한 비동기 처리 스케쥴링
 from app import (
     doc_summary,  # `doc_summarided_new` 갱신
     doc_indexing,  # `doc_input_question` 갱신
     expand_collection_query,  # `collection_question` 갱신
     search_docs,  # `doc_retrieved` 갱신
+    search_collections,  # `collection_retrieved` 갱신
     )
 load_dotenv()
 
-app = FastAPI()
 
-async def process_user_data(request: ProcessRequest) -> DataInfo:
-    """단일 유저의 데이터를 비동기적으로 처리"""
-    # 1. Service server에서 정보 불러오기(parsed 웹페이지, user_id, collection_id)
-    # 2. user_info DB에서 호출
-    # 3. 문서 요약
-    # 4. 문서 인덱스 생성
-    # 5. 질문 쿼리 생성
-    # 6. 추천 문서 retrieve
-    # 7. User_info DB에 저장
-    # 8. IndexPage DB에 저장
-    
-    # DataInfo 인스턴스 생성 (처리된 데이터는 None으로 초기화)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """서버 시작/종료 시 공유 리소스 관리"""
+    # 프롬프트 템플릿 컴파일 (없으면 여기서 바로 실패)
+    prompt_registry.load()
+    # LLM provider 및 커넥션 풀은 프로세스 전체에서 재사용
+    await init_clients()
+    # DB 커넥션 풀 + write-behind 버퍼
+    await init_db()
+    tracer.start()
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    # 남은 쓰기를 flush한 뒤 종료
+    await close_db()
+    await tracer.stop()
+    await close_clients()
+    await natural_search.aclose()
+    keyword_search.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+def _metric_path(path: str) -> str:
+    """지표 label용 경로 (job id 등은 묶어서 label 수가 늘어나지 않게)"""
+    if path.startswith("/jobs/"):
+        return "/jobs/{job_id}"
+    if path in {route.path for route in app.routes}:
+        return path
+    return "other"
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    """HTTP 요청 처리 시간 / 진행 중 요청 수 기록"""
+    path = _metric_path(request.url.path)
+    in_flight = HTTP_IN_FLIGHT.labels(path)
+    in_flight.inc()
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        in_flight.dec()
+        HTTP_DURATION.labels(path, request.method, status).observe(time.perf_counter() - start)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """처리 요청(/process*)마다 trace 시작 - 응답 헤더 X-Trace-Id로 trace id 전달"""
+    if not request.url.path.startswith("/process"):
+        return await call_next(request)
+    with start_trace(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get("traceparent"),
+    ) as root:
+        response = await call_next(request)
+        root.set_attribute("http.status_code", response.status_code)
+    response.headers["X-Trace-Id"] = root.trace_id
+    return response
+
+def create_data_instance(request: ProcessRequest) -> DataInfo:
+    """요청으로부터 DataInfo 인스턴스 생성 (처리된 데이터는 None으로 초기화)"""
     data = DataInfo(
         doc_input=request.doc_input,
         #collection=request.collection,
@@ -37,31 +100,90 @@ async def process_user_data(request: ProcessRequest) -> DataInfo:
         user_id=request.user_id,
         # 처리된 데이터들은 기본값 None으로 자동 초기화됨
 
-        # 임시(나중엔 UserInfo DB에서 불러오게 될 부분)
+        # 없으면 get_user_info에서 저장소(read-through 캐시)로부터 불러옴
         doc_summarized=request.doc_summarized,
     )
+    return data
+
+def assign_summary_id(data: DataInfo) -> None:
+    """새 요약의 id 부여 (동시 요청끼리도 겹치지 않는 고유 id)"""
+    data.doc_summarized_new_id = index_page_repo.new_summary_id(data.collection_id)
+
+async def process_user_data(request: ProcessRequest, data: Optional[DataInfo] = None) -> DataInfo:
+    """단일 유저의 데이터를 비동기적으로 처리"""
+    # 1. Service server에서 정보 불러오기(parsed 웹페이지, user_id, collection_id)
+    # 2. user_info DB에서 호출
+    # 3. 문서 요약
+    # 4. 문서 인덱스 생성
+    # 5. 질문 쿼리 생성
+    # 6. 추천 문서 retrieve
+    # 7. User_info DB에 저장
+    # 8. IndexPage DB에 저장
+    
+    # DataInfo 인스턴스 생성 (job 모드에서는 미리 생성된 인스턴스를 사용)
+    if data is None:
+        data = create_data_instance(request)
     
     # User_info에서 데이터 호출
-    #await get_user_info(data)
+    with span("get_user_info", collection_id=data.collection_id):
+        await get_user_info(data)
+    if data.doc_summarized_new_id is None:
+        assign_summary_id(data)
+
+    # 근사 중복 문서면 기존 요약/질문을 재사용하고 LLM 호출 생략
+    reused = apply_near_duplicate(data)
 
-    # 처리 작업들 정의
+    # 처리 작업들 정의 - 실행 순서는 각 stage의 reads/writes 선언으로 결정됨
     process_tasks = [
-        [doc_summary, expand_collection_query, search_docs], 
-        doc_indexing
+        doc_summary,
+        doc_indexing,
+        expand_collection_query,
+        search_docs,
+        search_collections,
         ]
     
     # 비동기 처리 실행
     await scheduler.scheduler(process_tasks, data, data._field_locks)
+
+    await save_processed_data(data, reused)
+    return data
+
+def apply_near_duplicate(data: DataInfo) -> bool:
+    """
+    근사 중복 문서의 결과를 미리 채움 (출력 필드가 채워진 stage는 스케쥴러가 건너뜀)
+    질문은 같은 유저 + 같은 collection_memo에서 만든 것만 재사용 (없으면 doc_indexing 실행)
+    요약과 질문을 모두 재사용했으면 True
+    """
+    duplicate = near_duplicate_index.lookup(data.doc_input, question_context(data.user_id, data.collection_memo))
+    if duplicate is None:
+        return False
+    data.doc_summarized_new = duplicate["doc_summarized_new"]
+    if "doc_input_question" not in duplicate:
+        return False
+    data.doc_input_question = duplicate["doc_input_question"]
+    return True
+
+async def save_processed_data(data: DataInfo, reused: bool = False) -> None:
+    """처리가 끝난 DataInfo를 로컬 인덱스와 DB에 반영"""
+    if not reused and data.doc_summarized_new is not None and data.doc_input_question is not None:
+        near_duplicate_index.add(
+            data.doc_input, data.doc_summarized_new, data.doc_input_question,
+            question_context(data.user_id, data.collection_memo),
+        )
+
+    # 로컬 인덱스(BM25, Vector)에 등록 (이후 같은 유저의 다른 컬렉션 요청에서 search_collections로 조회)
+    index_page(data)
     
     # DB에 저장
-    await send_to_db(data, {
-        'user_info': [
-            'collection_question', 'doc_retrieved', 'collection_retrieved'
-        ],
-        'index_page': [
-            'doc_summarized_new', 'doc_input_question'
-        ],
-    })
+    with track_stage("send_to_db"), span("send_to_db", user_id=data.user_id):
+        await send_to_db(data, {
+            'user_info': [
+                'collection_question', 'doc_retrieved', 'collection_retrieved'
+            ],
+            'index_page': [
+                'doc_summarized_new', 'doc_input_question'
+            ],
+        })
     #logging.info(f"DB에 저장 완료: \n"
     print(f"DB에 저장 완료: \n"
                 #f"user_id={data.user_id}, \n"
@@ -75,8 +197,6 @@ async def process_user_data(request: ProcessRequest) -> DataInfo:
                 f"doc_summarized_new={data.doc_summarized_new}, \n"
                 #f"doc_input={data.doc_input}"
                 )
-    
-    return data
 
 @app.post("/process")
 async def process_document(request: ProcessRequest):
@@ -88,6 +208,228 @@ async def process_document(request: ProcessRequest):
         logging.error(f"처리 중 오류 발생: {str(e)}")
         raise HTTPException(status_code=500, detail=f"처리 중 오류 발생: {str(e)}")
 
+def _merge_summaries(members: List[DataInfo]) -> List[Dict[str, str]]:
+    """같은 컬렉션 요청들의 기존 요약 목록을 summary_id 기준으로 합침 (순서 유지)"""
+    merged, seen = [], set()
+    for data in members:
+        for summary in data.doc_summarized or []:
+            key = summary.get("summary_id") or summary.get("summary")
+            if key not in seen:
+                seen.add(key)
+                merged.append(summary)
+    return merged
+
+async def run_collection_stages(members: List[DataInfo]) -> None:
+    """
+    컬렉션 단위 stage(expand_collection_query -> search_docs, search_collections)를 한 번만 실행하고
+    결과를 컬렉션의 모든 문서에 반영
+    """
+    last = members[-1]
+    new_summaries = [
+        {"summary": d.doc_summarized_new, "summary_id": d.doc_summarized_new_id}
+        for d in members
+    ]
+    collection_data = DataInfo(
+        doc_input=last.doc_input,
+        collection_id=last.collection_id,
+        collection_name=last.collection_name,
+        collection_memo=last.collection_memo,
+        user_id=last.user_id,
+        # 마지막 문서를 "새 요약"으로, 나머지 새 요약은 기존 요약 뒤에 붙임
+        doc_summarized=_merge_summaries(members) + new_summaries[:-1],
+        doc_summarized_new=last.doc_summarized_new,
+        doc_summarized_new_id=last.doc_summarized_new_id,
+    )
+    await scheduler.scheduler(
+        [expand_collection_query, search_docs, search_collections], collection_data, collection_data._field_locks
+    )
+    for data in members:
+        data.doc_summarized = list(collection_data.doc_summarized)
+        await data.parallel_update_fields({
+            "collection_question": collection_data.collection_question,
+            "doc_retrieved": collection_data.doc_retrieved,
+            "collection_retrieved": collection_data.collection_retrieved,
+        })
+
+async def process_batch(documents: List[ProcessRequest]) -> List[dict]:
+    """
+    여러 문서 일괄 처리
+    1. 문서 단위 stage(doc_summary, doc_indexing)는 모든 문서에 대해 병렬 실행
+    2. 컬렉션 단위 stage는 collection_id 별로 한 번만 실행
+    """
+    datas: List[DataInfo] = []
+    groups: Dict[str, List[DataInfo]] = {}
+    for request in documents:
+        data = create_data_instance(request)
+        assign_summary_id(data)
+        groups.setdefault(data.collection_id, []).append(data)
+        datas.append(data)
+
+    async def load_group(members: List[DataInfo]) -> None:
+        """컬렉션의 기존 요약은 한 번만 불러와 멤버들에게 나눠줌 (요청에 직접 들어온 것은 그대로)"""
+        missing = [d for d in members if d.doc_summarized is None]
+        if not missing:
+            return
+        with span("get_user_info", collection_id=missing[0].collection_id):
+            await get_user_info(missing[0])
+        for data in missing[1:]:
+            data.doc_summarized = list(missing[0].doc_summarized)
+
+    await asyncio.gather(*(load_group(members) for members in groups.values()))
+
+    reused = [apply_near_duplicate(data) for data in datas]
+    errors: Dict[int, str] = {}
+
+    doc_results = await asyncio.gather(
+        *(scheduler.scheduler([doc_summary, doc_indexing], data, data._field_locks) for data in datas),
+        return_exceptions=True,
+    )
+    for i, result in enumerate(doc_results):
+        if isinstance(result, BaseException):
+            errors[id(datas[i])] = str(result)
+
+    async def run_group(members: List[DataInfo]) -> None:
+        members = [d for d in members if id(d) not in errors]
+        if not members:
+            return
+        try:
+            await run_collection_stages(members)
+        except Exception as e:
+            for data in members:
+                errors[id(data)] = str(e)
+
+    await asyncio.gather(*(run_group(members) for members in groups.values()))
+
+    await asyncio.gather(*(
+        save_processed_data(data, was_reused)
+        for data, was_reused in zip(datas, reused)
+        if id(data) not in errors
+    ))
+
+    results = []
+    for data in datas:
+        error = errors.get(id(data))
+        results.append({
+            "status": "error" if error else "success",
+            "error": error,
+            "user_id": data.user_id,
+            "collection_id": data.collection_id,
+            "summary_id": data.doc_summarized_new_id,
+            "fields": await data.get_updated_fields() if not error else {},
+        })
+    return results
+
+@app.post("/process/batch")
+async def process_document_batch(request: BatchProcessRequest):
+    """여러 문서 일괄 처리 - 컬렉션 단위 작업(쿼리 확장, 검색)은 컬렉션마다 한 번만 수행"""
+    try:
+        results = await process_batch(request.documents)
+    except Exception as e:
+        logging.error(f"일괄 처리 중 오류 발생: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"일괄 처리 중 오류 발생: {str(e)}")
+    n_failed = sum(1 for r in results if r["status"] != "success")
+    return {
+        "status": "success" if n_failed == 0 else "partial",
+        "total": len(results),
+        "failed": n_failed,
+        "results": results,
+    }
+
+def _format_event(payload: dict, fmt: str) -> str:
+    body = json.dumps(payload, ensure_ascii=False, default=str)
+    if fmt == "sse":
+        return f"event: {payload['event']}\ndata: {body}\n\n"
+    return body + "\n"
+
+@app.post("/process/stream")
+async def process_document_stream(request: ProcessRequest, fmt: str = Query("ndjson", alias="format")):
+    """
+    문서 처리 스트리밍 엔드포인트
+    scheduler가 DataInfo 필드를 쓰는 즉시 해당 필드를 전송 (NDJSON 기본, ?format=sse 지원)
+    """
+    if fmt not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 format: {fmt}")
+
+    data = create_data_instance(request)
+    events: asyncio.Queue = asyncio.Queue()
+    data.add_field_listener(lambda field, value: events.put_nowait((field, value)))
+    task = asyncio.create_task(process_user_data(request, data))
+    task.add_done_callback(lambda _: events.put_nowait(None))
+
+    async def stream():
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                field, value = item
+                yield _format_event({"event": "field", "field": field, "value": value}, fmt)
+
+            if task.cancelled() or task.exception() is not None:
+                message = "취소됨" if task.cancelled() else str(task.exception())
+                yield _format_event({"event": "error", "message": f"처리 중 오류 발생: {message}"}, fmt)
+            else:
+                yield _format_event({"event": "done", "status": "success", "user_id": data.user_id}, fmt)
+        finally:
+            # 클라이언트가 연결을 끊으면 처리도 중단
+            if not task.done():
+                task.cancel()
+
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
+
+async def run_job(job: Job) -> None:
+    """job worker에서 실행 - 처리 중에도 필드별 결과를 조회할 수 있도록 DataInfo를 먼저 연결"""
+    job.data = create_data_instance(job.request)
+    # worker task는 요청의 trace 밖에서 실행되므로 job 단위로 새 trace 시작
+    with start_trace("job", job_id=job.job_id, user_id=job.request.user_id) as root:
+        job.trace_id = root.trace_id
+        await process_user_data(job.request, job.data)
+
+# 비동기 job 모드용 큐 (worker는 lifespan에서 시작)
+job_queue = JobQueue(run_job)
+JOBS_QUEUED.set_function(job_queue.queue_size)
+
+@app.post("/process/async", status_code=202)
+async def process_document_async(request: ProcessRequest):
+    """문서 처리를 큐에 등록하고 즉시 job id 반환 - 결과는 GET /jobs/{job_id}로 조회"""
+    try:
+        job = job_queue.submit(request)
+    except QueueFullError as e:
+        # 큐가 가득 차면 명시적으로 거절 (클라이언트는 Retry-After 이후 재시도)
+        return JSONResponse(
+            status_code=503,
+            content={"status": "rejected", "message": str(e)},
+            headers={"Retry-After": "5"},
+        )
+    return JSONResponse(
+        status_code=202,
+        content={"status": "accepted", "job_id": job.job_id, "user_id": request.user_id},
+        headers={"Location": f"/jobs/{job.job_id}"},
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """job 상태 및 지금까지 갱신된 필드 조회"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"존재하지 않는 job: {job_id}")
+    return await job.to_dict()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 지표"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """최근 샘플링된 trace 조회 (span 목록)"""
+    trace = tracer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"보관 중인 trace가 없습니다: {trace_id}")
+    return trace
+
 @app.get("/health")
 async def health_check():
     """서버 상태 확인"""
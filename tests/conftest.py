@@ -0,0 +1,9 @@
+"""
+테스트 공통 설정
+app 모듈은 import 시 환경변수를 읽으므로 import 전에 테스트용 값을 채운다.
+"""
+import os
+
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("PROMPT_STRICT", "false")
+os.environ.setdefault("TRACE_EXPORTER", "none")
@@ -0,0 +1,56 @@
+"""app.retrieve.fusion - 가중 RRF / URL 정규화"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.retrieve.fusion import canonicalize_url, fuse_search_results, reciprocal_rank_fusion
+
+
+def test_scores_follow_rrf_formula():
+    fused = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], weights=[1.0, 2.0], k=60)
+    scores = {item.id: item.score for item in fused}
+    assert scores["b"] == pytest.approx(1 / 62 + 2 / 61)
+    assert scores["a"] == pytest.approx(1 / 61)
+    assert scores["c"] == pytest.approx(2 / 62)
+    assert [item.id for item in fused] == ["b", "c", "a"]
+
+
+def test_duplicate_urls_are_merged_after_canonicalization():
+    fused = reciprocal_rank_fusion(
+        [["https://www.Example.com/post/?utm_source=x"], ["http://example.com/post#top"]],
+        sources=["ddgs", "perplexity"],
+    )
+    assert len(fused) == 1
+    assert fused[0].id == "https://www.Example.com/post/?utm_source=x"  # 처음 등장한 표기 유지
+    assert fused[0].sources == ["ddgs", "perplexity"]
+
+
+def test_duplicate_within_one_list_counts_once():
+    fused = reciprocal_rank_fusion([["a", "a", "b"]], k=60)
+    assert fused[0].score == pytest.approx(1 / 61)
+
+
+def test_kinds_are_kept_apart():
+    fused = reciprocal_rank_fusion([["same"], ["same"]], kinds=["url", "local"])
+    assert sorted((item.id, item.kind) for item in fused) == [("same", "local"), ("same", "url")]
+
+
+def test_top_k_and_empty_input():
+    assert reciprocal_rank_fusion([]) == []
+    assert len(reciprocal_rank_fusion([list("abcdef")], top_k=3)) == 3
+
+
+def test_canonicalize_url_keeps_meaningful_query():
+    assert canonicalize_url("https://a.com/x?b=2&a=1&fbclid=z") == "https://a.com/x?a=1&b=2"
+    assert canonicalize_url("not a url") == "not a url"
+
+
+def test_fuse_search_results_weights_by_retriever_and_skips_empty():
+    results = [
+        SimpleNamespace(urls=["https://a.com"], model="ddgs", kind="url"),
+        SimpleNamespace(urls=["https://b.com"], model="perplexity/sonar", kind="url"),
+        SimpleNamespace(urls=[], model="ddgs", kind="url"),
+        None,
+    ]
+    fused = fuse_search_results(results, weights={"ddgs": 1.0, "perplexity": 3.0})
+    assert [item.id for item in fused] == ["https://b.com", "https://a.com"]
@@ -0,0 +1,62 @@
+"""app.llm.parser - tolerant_parser / JSONRepairParser"""
+import json
+import os
+from typing import List
+
+import pytest
+from pydantic import BaseModel, Field, ValidationError
+
+from app.llm.parser import JSONRepairParser, repair_json, tolerant_parser
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "..", "input_sample", "malformed_json_corpus.jsonl")
+with open(CORPUS_PATH, encoding="utf-8") as f:
+    CORPUS = [json.loads(line) for line in f if line.strip()]
+
+
+class Question(BaseModel):
+    question: str
+    approach: int
+
+
+class Questions(BaseModel):
+    questions: List[Question] = Field(min_length=2)
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["name"] for case in CORPUS])
+def test_corpus(case):
+    assert tolerant_parser(case["input"]) == case["expected"]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7])
+@pytest.mark.parametrize("case", CORPUS, ids=[case["name"] for case in CORPUS])
+def test_incremental_feed_matches_whole_input(case, size):
+    """청크 단위로 넣어도 한 번에 넣은 것과 같은 결과 (스트리밍 경로)"""
+    whole = JSONRepairParser().feed(case["input"]).close()
+    parser = JSONRepairParser()
+    for i in range(0, len(case["input"]), size):
+        parser.feed(case["input"][i:i + size])
+    assert parser.close() == whole
+
+
+def test_complete_flag_set_when_top_level_closes():
+    parser = JSONRepairParser().feed('{"a": [1, 2')
+    assert not parser.complete
+    parser.feed("]}")
+    assert parser.complete
+
+
+def test_truncated_output_drops_partial_item():
+    text = '{"questions": [{"question": "A", "approach": 1}, {"question": "B", "approach": 2}, {"question": "C", "appro'
+    result = tolerant_parser(text, Questions)
+    assert [q.question for q in result.questions] == ["A", "B"]
+
+
+def test_schema_violation_is_raised_when_not_truncated():
+    with pytest.raises(ValidationError):
+        tolerant_parser('{"questions": [{"question": "A", "approach": 1}]}', Questions)
+
+
+def test_repair_json_without_bracket_raises():
+    with pytest.raises(ValueError):
+        repair_json("JSON이 없는 응답")
@@ -0,0 +1,61 @@
+"""app.llm.rate_limit - token bucket / RateLimiter"""
+import asyncio
+
+import pytest
+
+from app.llm import rate_limit
+from app.llm.rate_limit import RateLimiter, RateLimitTimeout, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_refills_over_time(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock[0] += 1
+    assert bucket.wait_time(1) == 0.0
+
+
+def test_token_bucket_lets_oversized_request_through_when_full(clock):
+    bucket = TokenBucket(per_minute=100)
+    assert bucket.wait_time(1000) == 0.0
+
+
+def test_unlimited_model_needs_no_limiter():
+    limiter = RateLimiter(limits={}, default_rpm=0, default_tpm=0)
+    reservation = asyncio.run(limiter.acquire("google/gemma", 10))
+    assert reservation._limiters == []
+
+
+def test_timeout_refunds_already_acquired_share():
+    async def run():
+        limiter = RateLimiter(limits={"provider:google": {"rpm": 60}, "google/gemma": {"rpm": 1}})
+        await limiter.acquire("google/gemma", 0)
+        provider = limiter._get("provider:google")
+        level = provider.requests.level
+        with pytest.raises(RateLimitTimeout):
+            await limiter.acquire("google/gemma", 0, timeout=0.01)
+        assert provider.requests.level == pytest.approx(level, abs=0.1)
+        assert limiter.timeouts == {"google/gemma": 1}
+
+    asyncio.run(run())
+
+
+def test_settle_refunds_unused_tokens(clock):
+    async def run():
+        limiter = RateLimiter(limits={"m": {"tpm": 1000}})
+        reservation = await limiter.acquire("m", 600)
+        bucket = limiter._get("m").tokens
+        assert bucket.level == pytest.approx(400)
+        reservation.settle(100)
+        assert bucket.level == pytest.approx(900)
+        reservation.settle(None)  # 사용량을 모르면 그대로
+        assert bucket.level == pytest.approx(900)
+
+    asyncio.run(run())
@@ -0,0 +1,115 @@
+"""app.resilience - CircuitBreaker 상태 전환 / call_with_retry"""
+import asyncio
+
+import httpx
+import pytest
+
+from app import resilience
+from app.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic을 직접 움직이는 가짜 시계"""
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(breaker.before_call())
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker("t", failure_threshold=3, recovery_time=10)
+    for _ in range(2):
+        breaker.record_failure(breaker.before_call())
+    assert breaker.state == "closed"
+    breaker.record_failure(breaker.before_call())
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, recovery_time=10)
+    open_breaker(breaker)
+    clock[0] += 10
+    assert breaker.state == "half_open"
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, recovery_time=10)
+    open_breaker(breaker)
+    clock[0] += 10
+    breaker.record_success(breaker.before_call())
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_probe_failure_reopens(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, recovery_time=10)
+    open_breaker(breaker)
+    clock[0] += 10
+    breaker.record_failure(breaker.before_call())
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+
+
+def test_stale_caller_cannot_free_probe_slot(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, recovery_time=10)
+    stale = breaker.before_call()  # closed일 때 시작한 호출
+    open_breaker(breaker)
+    clock[0] += 10
+    probe = breaker.before_call()
+
+    breaker.release(stale)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success(stale)
+    breaker.record_failure(stale)
+    assert breaker.state == "half_open"
+
+    breaker.record_success(probe)
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_releases_slot(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, recovery_time=10)
+    open_breaker(breaker)
+    clock[0] += 10
+    breaker.release(breaker.before_call())
+    assert breaker.before_call() is True
+
+
+def test_call_with_retry_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("reset")
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)
+    assert asyncio.run(call_with_retry("test:flaky", flaky, policy)) == "ok"
+    assert len(attempts) == 3
+
+
+def test_call_with_retry_does_not_retry_fatal(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    attempts = []
+
+    async def broken():
+        attempts.append(1)
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retry("test:fatal", broken, RetryPolicy(max_attempts=3, base_delay=0)))
+    assert len(attempts) == 1
+    assert resilience.get_breaker("test:fatal").failures == 0
@@ -0,0 +1,112 @@
+"""app.scheduler - DAG 구성, 건너뛰기, 실패 시 취소"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.scheduler import _flatten, build_dag, scheduler, stage
+
+
+def make_data(**fields):
+    defaults = {"doc_input": "doc", "a": None, "b": None, "c": None}
+    return SimpleNamespace(**{**defaults, **fields})
+
+
+@stage(reads=["doc_input"], writes="a")
+async def stage_a(data):
+    await asyncio.sleep(0.01)
+    return "A"
+
+
+@stage(reads=["a"], writes="b")
+async def stage_b(data):
+    return data.a + "B"
+
+
+@stage(reads=["a", "b"], writes="c")
+async def stage_c(data):
+    return data.b + "C"
+
+
+def test_build_dag_from_reads_and_writes():
+    dependencies = build_dag(_flatten([stage_c, stage_b, stage_a]))
+    assert dependencies == {"stage_a": (), "stage_b": ("stage_a",), "stage_c": ("stage_a", "stage_b")}
+
+
+def test_build_dag_rejects_cycle():
+    @stage(reads=["y"], writes="x")
+    async def make_x(data): ...
+
+    @stage(reads=["x"], writes="y")
+    async def make_y(data): ...
+
+    with pytest.raises(ValueError, match="순환 의존성"):
+        build_dag(_flatten([make_x, make_y]))
+
+
+def test_build_dag_rejects_two_writers():
+    @stage(writes="a")
+    async def other_a(data): ...
+
+    with pytest.raises(ValueError, match="여러 개"):
+        build_dag(_flatten([stage_a, other_a]))
+
+
+def test_legacy_chain_runs_in_order():
+    order = []
+
+    async def first(data):
+        await asyncio.sleep(0.01)
+        order.append("first")
+
+    async def second(data):
+        order.append("second")
+
+    asyncio.run(scheduler([[first, second]], make_data()))
+    assert order == ["first", "second"]
+
+
+def test_runs_stages_in_dependency_order():
+    data = make_data()
+    report = asyncio.run(scheduler([stage_c, stage_b, stage_a], data))
+    assert data.c == "ABC"
+    assert [t.name for t in report.critical_path()] == ["stage_a", "stage_b", "stage_c"]
+
+
+def test_skips_stage_whose_output_exists():
+    calls = []
+
+    @stage(reads=["doc_input"], writes="a")
+    async def counted_a(data):
+        calls.append("a")
+        return "new"
+
+    data = make_data(a="reused")
+    report = asyncio.run(scheduler([counted_a, stage_b], data))
+    assert calls == []
+    assert data.a == "reused" and data.b == "reusedB"
+    assert report.timings["counted_a"].skipped
+
+
+def test_failure_cancels_other_stages():
+    cancelled = asyncio.Event()
+
+    @stage(writes="a")
+    async def failing(data):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    @stage(writes="b")
+    async def slow(data):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def run():
+        with pytest.raises(RuntimeError, match="boom"):
+            await scheduler([failing, slow], make_data())
+        assert cancelled.is_set()
+
+    asyncio.run(run())
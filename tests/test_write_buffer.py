@@ -0,0 +1,128 @@
+"""app.db.repository.WriteBehindBuffer - flush 실패 / 재시도 / dead-letter / backpressure"""
+import asyncio
+
+import pytest
+
+from app.db.backend import MemoryBackend
+from app.db.repository import IndexPageRepository, WriteBehindBuffer, WriteBufferFull
+
+
+class FlakyBackend(MemoryBackend):
+    """fail_times번 실패한 뒤 정상 동작, bad_ids가 포함된 배치는 항상 실패"""
+
+    def __init__(self, fail_times: int = 0, bad_ids=()):
+        super().__init__()
+        self.fail_times = fail_times
+        self.bad_ids = set(bad_ids)
+        self.batches = []
+
+    async def upsert_many(self, table, rows):
+        self.batches.append([row.get("summary_id") for row in rows])
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError("db down")
+        if any(row.get("summary_id") in self.bad_ids for row in rows):
+            raise ValueError("constraint violation")
+        await super().upsert_many(table, rows)
+
+
+def page(summary_id, summary="s"):
+    return {"summary_id": summary_id, "collection_id": "c", "summary": summary}
+
+
+async def stored_ids(backend):
+    return sorted(row["summary_id"] for row in await backend.fetch("index_page"))
+
+
+def test_failed_flush_requeues_and_retries():
+    async def run():
+        backend = FlakyBackend(fail_times=1)
+        buffer = WriteBehindBuffer(backend)
+        buffer.add("index_page", page("c_1"))
+        await buffer.flush()
+        assert len(buffer) == 1 and await stored_ids(backend) == []
+        await buffer.flush()
+        assert len(buffer) == 0 and await stored_ids(backend) == ["c_1"]
+
+    asyncio.run(run())
+
+
+def test_newer_write_wins_over_requeued_row():
+    async def run():
+        backend = FlakyBackend(fail_times=1)
+        buffer = WriteBehindBuffer(backend)
+        buffer.add("index_page", page("c_1", "old"))
+        original = backend.upsert_many
+
+        async def upsert_with_concurrent_write(table, rows):
+            buffer.add("index_page", page("c_1", "new"))
+            await original(table, rows)
+
+        backend.upsert_many = upsert_with_concurrent_write
+        await buffer.flush()
+        backend.upsert_many = original
+        await buffer.flush()
+        assert (await backend.fetch("index_page"))[0]["summary"] == "new"
+
+    asyncio.run(run())
+
+
+def test_inflight_rows_stay_visible_to_reads():
+    async def run():
+        backend = MemoryBackend()
+        buffer = WriteBehindBuffer(backend)
+        repo = IndexPageRepository(backend, buffer)
+        gate = asyncio.Event()
+        original = backend.upsert_many
+
+        async def slow_upsert(table, rows):
+            await gate.wait()
+            await original(table, rows)
+
+        backend.upsert_many = slow_upsert
+        repo.upsert(page("c_1"))
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+        assert buffer.has_inflight("index_page", collection_id="c")
+        assert [row["summary_id"] for row in await repo.list_by_collection("c")] == ["c_1"]
+        gate.set()
+        await flush
+        assert [row["summary_id"] for row in await repo.list_by_collection("c")] == ["c_1"]
+
+    asyncio.run(run())
+
+
+def test_poison_row_is_dead_lettered_without_dropping_its_batch():
+    async def run():
+        backend = FlakyBackend(bad_ids={"c_bad"})
+        buffer = WriteBehindBuffer(backend, max_attempts=3)
+        for summary_id in ("c_1", "c_bad", "c_2"):
+            buffer.add("index_page", page(summary_id))
+        for _ in range(3):
+            await buffer.flush()
+        assert len(buffer) == 0
+        assert await stored_ids(backend) == ["c_1", "c_2"]
+        assert buffer.stats()["dead_letters"] == 1
+
+    asyncio.run(run())
+
+
+def test_wait_for_capacity_applies_backpressure():
+    async def run():
+        buffer = WriteBehindBuffer(FlakyBackend(), max_pending=2)
+        buffer.add("index_page", page("c_1"))
+        await buffer.wait_for_capacity(timeout=0.01)  # 아직 자리 있음
+        buffer.add("index_page", page("c_2"))
+        with pytest.raises(WriteBufferFull):
+            await buffer.wait_for_capacity(timeout=0.01)
+
+        async def flush_later():
+            await asyncio.sleep(0.01)
+            await buffer.flush()
+
+        flusher = asyncio.create_task(flush_later())
+        await buffer.wait_for_capacity(timeout=1)
+        await flusher
+        assert len(buffer) == 0
+
+    asyncio.run(run())